@@ -0,0 +1 @@
+"""Development tools for PCXCogs (benchmarks and the like). Not a cog, and never loaded by Red."""
@@ -0,0 +1,460 @@
+"""Benchmarks for the RemindMe cog, run against synthetic reminder datasets without Discord.
+
+Run from the repository root:
+
+    python -m devtools.benchmark --sizes 10k,100k,1M --output results.json
+    python -m devtools.benchmark --sizes 10k --compare results.json --max-regression 0.2
+
+Each benchmark reports how many operations it did and how long they took, and (where every operation
+is timed on its own) the median, 99th percentile and worst latency. Results can be written out as JSON,
+and compared against the JSON of an earlier run (say, the last release) with --compare.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import discord
+from dateutil.relativedelta import relativedelta
+from pyparsing import ParseException
+
+from remindme.index import ReminderIndex
+from remindme.pcx_lib import split_embed
+from remindme.reminder_parse import ReminderParser
+from remindme.remindme import RemindMe
+from remindme.scheduler import ReminderSchedule, RetryQueue
+from remindme.store import BufferedReminderStore, SqliteReminderStore
+
+from .datasets import ReminderDataset
+
+# What people type, and roughly how often. The last few can't be parsed, or need the pyparsing fallback.
+PARSE_CORPUS = (
+    ("1d", 30),
+    ("8h", 25),
+    ("every 1 week", 20),
+    ("in 30 minutes to stretch", 15),
+    ("2h take out the trash", 15),
+    ("1 day, 4 hours and 30 minutes", 8),
+    ("every 1 day to drink some water in 8h", 6),
+    ("every 2 weeks pay rent", 6),
+    ("to check the oven in 45m", 6),
+    ("call mom every 1 month in 3 days", 4),
+    ("in 1y renew passport", 3),
+    ("tomorrow", 3),
+    ("remind me later", 2),
+    ("2h go to the straße", 1),
+)
+PARSE_OPERATIONS = 20_000
+STORE_BATCH_SIZE = 10_000
+SEARCH_OPERATIONS = 20_000
+CHURN_OPERATIONS = 20_000
+DISPATCH_OPERATIONS = 5_000
+LIST_USERS = 50
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    """Get a percentile of some sorted values."""
+    return sorted_values[
+        min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    ]
+
+
+def result(
+    name: str,
+    dataset_size: int | None,
+    operations: int,
+    seconds: float,
+    latencies_ns: list[int] | None = None,
+) -> dict[str, Any]:
+    """Make the result of a benchmark."""
+    benchmark_result: dict[str, Any] = {
+        "name": name,
+        "dataset_size": dataset_size,
+        "operations": operations,
+        "seconds": round(seconds, 6),
+        "ops_per_second": round(operations / seconds, 1) if seconds else None,
+    }
+    if latencies_ns:
+        latencies_ns.sort()
+        benchmark_result["p50_us"] = round(percentile(latencies_ns, 0.5) / 1000, 2)
+        benchmark_result["p99_us"] = round(percentile(latencies_ns, 0.99) / 1000, 2)
+        benchmark_result["max_us"] = round(latencies_ns[-1] / 1000, 2)
+    return benchmark_result
+
+
+def bare_cog(
+    reminder_store: BufferedReminderStore,
+    schedule: ReminderSchedule,
+    reminder_index: ReminderIndex,
+) -> RemindMe:
+    """Get a RemindMe that was never given a bot, with just enough set up for its rendering and rescheduling code."""
+    cog = RemindMe.__new__(RemindMe)
+    cog.reminder_store = reminder_store
+    cog.schedule = schedule
+    cog.reminder_index = reminder_index
+    cog.retry_queue = RetryQueue()
+    return cog
+
+
+#
+# Benchmarks that don't need a dataset
+#
+
+
+def bench_parse(seed: int) -> list[dict[str, Any]]:
+    """Time ReminderParser.parse() with and without its result cache, and humanize_relativedelta()."""
+    rng = random.Random(seed)
+    texts, weights = zip(*PARSE_CORPUS, strict=True)
+    corpus = rng.choices(texts, weights, k=PARSE_OPERATIONS)
+    results = []
+    for name, cache_size in (
+        ("parse_uncached", 0),
+        ("parse_cached", ReminderParser.MAX_CACHED_RESULTS),
+    ):
+        parser = ReminderParser()
+        parser.MAX_CACHED_RESULTS = cache_size
+        parser.parse(texts[-1])  # Build the shared grammar first, so that isn't timed
+        latencies = []
+        for text in corpus:
+            started = time.perf_counter_ns()
+            with contextlib.suppress(ParseException):
+                parser.parse(text)
+            latencies.append(time.perf_counter_ns() - started)
+        results.append(result(name, None, len(corpus), sum(latencies) / 1e9, latencies))
+
+    deltas = [
+        relativedelta(seconds=rng.randrange(1, 10 * 365 * 24 * 60 * 60))
+        for _ in range(PARSE_OPERATIONS)
+    ]
+    latencies = []
+    for delta in deltas:
+        started = time.perf_counter_ns()
+        RemindMe.humanize_relativedelta(delta)
+        latencies.append(time.perf_counter_ns() - started)
+    results.append(
+        result(
+            "humanize_relativedelta", None, len(deltas), sum(latencies) / 1e9, latencies
+        )
+    )
+    return results
+
+
+#
+# Benchmarks against a dataset
+#
+
+
+async def bench_dataset(
+    dataset: ReminderDataset, directory: Path
+) -> list[dict[str, Any]]:
+    """Run every dataset benchmark against one dataset."""
+    size = dataset.size
+    results = []
+    reminder_store = BufferedReminderStore(
+        SqliteReminderStore(
+            directory / f"reminders-{size}.db", RemindMe.default_reminder_settings
+        )
+    )
+    await reminder_store.initialize()
+    try:
+        # Loading the reminder store
+        started = time.perf_counter()
+        batch = []
+        for reminder in dataset.reminders():
+            batch.append(reminder)
+            if len(batch) == STORE_BATCH_SIZE:
+                await reminder_store.set_many(batch)
+                batch = []
+        if batch:
+            await reminder_store.set_many(batch)
+        results.append(result("store_write", size, size, time.perf_counter() - started))
+
+        # Building the schedule and index, as is done when the cog loads
+        entries = list(dataset.schedule_entries())
+        schedule = ReminderSchedule()
+        started = time.perf_counter()
+        schedule.build(entries)
+        results.append(
+            result("schedule_build", size, size, time.perf_counter() - started)
+        )
+        reminder_index = ReminderIndex()
+        started = time.perf_counter()
+        reminder_index.build(entries)
+        results.append(result("index_build", size, size, time.perf_counter() - started))
+
+        results.append(bench_scheduler_search(entries, size))
+        results.append(bench_schedule_churn(entries, size, dataset.seed))
+        results.extend(
+            await bench_dispatch(
+                bare_cog(reminder_store, schedule, reminder_index), size
+            )
+        )
+        results.append(
+            await bench_list_render(
+                bare_cog(reminder_store, schedule, reminder_index), dataset
+            )
+        )
+    finally:
+        await reminder_store.close()
+    return results
+
+
+def bench_scheduler_search(
+    entries: list[tuple[int, int, int]], size: int
+) -> dict[str, Any]:
+    """Time what the background loop does each time it wakes up: find the next reminder, and take everything that is due."""
+    schedule = ReminderSchedule()
+    schedule.build(entries)
+    latencies = []
+    while len(latencies) < SEARCH_OPERATIONS:
+        started = time.perf_counter_ns()
+        entry = schedule.peek()
+        if entry is None:
+            break
+        schedule.pop_due(entry[0])
+        latencies.append(time.perf_counter_ns() - started)
+    return result(
+        "scheduler_search", size, len(latencies), sum(latencies) / 1e9, latencies
+    )
+
+
+def bench_schedule_churn(
+    entries: list[tuple[int, int, int]], size: int, seed: int
+) -> dict[str, Any]:
+    """Time rescheduling and removing random reminders, as modifying and deleting them does (compactions included)."""
+    rng = random.Random(seed)
+    schedule = ReminderSchedule()
+    schedule.build(entries)
+    latencies = []
+    for _ in range(CHURN_OPERATIONS):
+        expires, user_id, user_reminder_id = rng.choice(entries)
+        reschedule = rng.random() < 0.5  # noqa: PLR2004
+        started = time.perf_counter_ns()
+        if reschedule:
+            schedule.push(
+                user_id, user_reminder_id, expires + rng.randrange(60, 24 * 60 * 60)
+            )
+        else:
+            schedule.remove(user_id, user_reminder_id)
+        latencies.append(time.perf_counter_ns() - started)
+    return result(
+        "schedule_churn", size, len(latencies), sum(latencies) / 1e9, latencies
+    )
+
+
+async def bench_dispatch(cog: RemindMe, size: int) -> list[dict[str, Any]]:
+    """Time the send path for the soonest reminders, minus the DM itself: load, render, reschedule, and the group commit."""
+    # Hold the group commit until the end, so it can be timed on its own
+    cog.reminder_store.GROUP_COMMIT_SECONDS = 24 * 60 * 60
+    latencies = []
+    for _ in range(min(DISPATCH_OPERATIONS, size)):
+        started = time.perf_counter_ns()
+        _, user_id, user_reminder_id = cog.schedule.pop()
+        full_reminder = await cog._get_full_reminder(user_id, user_reminder_id)
+        embed = discord.Embed(color=discord.Color.red())
+        on_time = datetime.datetime.fromtimestamp(
+            full_reminder["expires"], datetime.UTC
+        )
+        embed.add_field(**cog._generate_reminder_field(on_time, full_reminder))
+        cog._mark_reminder_delayed(embed, full_reminder)
+        cog.reminder_store.stage(
+            cog._sent_reminder_changes(full_reminder, delete=False)
+        )
+        latencies.append(time.perf_counter_ns() - started)
+    results = [
+        result("dispatch", size, len(latencies), sum(latencies) / 1e9, latencies)
+    ]
+    started = time.perf_counter()
+    await cog.reminder_store.flush()
+    results.append(
+        result(
+            "dispatch_group_commit", size, len(latencies), time.perf_counter() - started
+        )
+    )
+    return results
+
+
+async def bench_list_render(cog: RemindMe, dataset: ReminderDataset) -> dict[str, Any]:
+    """Time [p]reminder list (minus sending it) for the users with the most reminders."""
+    user_ids = [
+        user_id
+        for user_id, _ in sorted(
+            dataset.user_counts(), key=lambda user_count: -user_count[1]
+        )[:LIST_USERS]
+    ]
+    latencies = []
+    for user_id in user_ids:
+        started = time.perf_counter_ns()
+        user_reminders = []
+        for user_reminder_id in cog.reminder_index.ids_by_expiry(user_id):
+            reminder = await cog.reminder_store.get(user_id, user_reminder_id)
+            if reminder and reminder["expires"]:
+                reminder.update({"user_reminder_id": user_reminder_id})
+                user_reminders.append(reminder)
+        embed = discord.Embed(
+            title="Reminders for Benchmark", color=discord.Color.red()
+        )
+        cog._add_reminder_list_fields(embed, user_reminders)
+        split_embed(embed)
+        latencies.append(time.perf_counter_ns() - started)
+    return result(
+        "list_render", dataset.size, len(latencies), sum(latencies) / 1e9, latencies
+    )
+
+
+#
+# Running and comparing
+#
+
+
+def parse_size(text: str) -> int:
+    """Parse a dataset size like 10000, 10k or 1M."""
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    return int(text[:-1] if multiplier > 1 else text) * multiplier
+
+
+def metadata(arguments: argparse.Namespace) -> dict[str, Any]:
+    """Describe the run, so results from different releases and machines can be told apart."""
+    try:
+        commit = subprocess.run(  # noqa: S603
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": arguments.seed,
+        "repeat_ratio": arguments.repeat_ratio,
+    }
+
+
+def print_results(results: Iterable[dict[str, Any]]) -> None:
+    """Print results as a table."""
+    print(
+        f"{'benchmark':<24}{'dataset':>10}{'ops':>10}{'ops/s':>14}{'p50 us':>11}{'p99 us':>11}{'max us':>11}"
+    )
+    for benchmark_result in results:
+        print(
+            f"{benchmark_result['name']:<24}{benchmark_result['dataset_size'] or '-':>10}{benchmark_result['operations']:>10}"
+            f"{benchmark_result['ops_per_second'] or 0:>14,.1f}{benchmark_result.get('p50_us', '-'):>11}"
+            f"{benchmark_result.get('p99_us', '-'):>11}{benchmark_result.get('max_us', '-'):>11}"
+        )
+
+
+def compare(
+    baseline: dict[str, Any],
+    results: list[dict[str, Any]],
+    max_regression: float | None,
+) -> bool:
+    """Print how results compare to a baseline run. Returns False if anything got slower by more than max_regression."""
+    baseline_results = {
+        (benchmark_result["name"], benchmark_result["dataset_size"]): benchmark_result
+        for benchmark_result in baseline["results"]
+    }
+    print(
+        f"\nCompared to {baseline['metadata'].get('commit') or 'baseline'} ({baseline['metadata'].get('timestamp')}):"
+    )
+    passed = True
+    for benchmark_result in results:
+        baseline_result = baseline_results.get(
+            (benchmark_result["name"], benchmark_result["dataset_size"])
+        )
+        if (
+            not baseline_result
+            or not baseline_result["ops_per_second"]
+            or not benchmark_result["ops_per_second"]
+        ):
+            continue
+        ratio = benchmark_result["ops_per_second"] / baseline_result["ops_per_second"]
+        regressed = max_regression is not None and ratio < 1 - max_regression
+        passed = passed and not regressed
+        print(
+            f"{benchmark_result['name']:<24}{benchmark_result['dataset_size'] or '-':>10}"
+            f"{baseline_result['ops_per_second']:>14,.1f} -> {benchmark_result['ops_per_second']:<14,.1f}{ratio:>6.2f}x"
+            f"{'  REGRESSED' if regressed else ''}"
+        )
+    return passed
+
+
+async def run(arguments: argparse.Namespace) -> list[dict[str, Any]]:
+    """Run all of the benchmarks."""
+    results = bench_parse(arguments.seed)
+    now = int(time.time())
+    with tempfile.TemporaryDirectory(prefix="remindme-benchmark-") as directory:
+        for size in arguments.sizes:
+            dataset = ReminderDataset(
+                size, now=now, seed=arguments.seed, repeat_ratio=arguments.repeat_ratio
+            )
+            results.extend(await bench_dataset(dataset, Path(directory)))
+    return results
+
+
+def main() -> int:
+    """Run the benchmarks from the command line."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument(
+        "--sizes",
+        type=lambda text: [parse_size(size) for size in text.split(",")],
+        default="10k,100k,1M",
+        help="dataset sizes to run (default: 10k,100k,1M)",
+    )
+    argument_parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed for the synthetic datasets (default: 0)",
+    )
+    argument_parser.add_argument(
+        "--repeat-ratio",
+        type=float,
+        default=0.2,
+        help="fraction of reminders that repeat (default: 0.2)",
+    )
+    argument_parser.add_argument(
+        "--output", type=Path, help="write the results to this JSON file"
+    )
+    argument_parser.add_argument(
+        "--compare",
+        type=Path,
+        help="compare against the results JSON of an earlier run",
+    )
+    argument_parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="with --compare, exit with an error if anything has this fraction fewer ops/s (0.2 is 20%% slower)",
+    )
+    arguments = argument_parser.parse_args()
+
+    results = asyncio.run(run(arguments))
+    print_results(results)
+    if arguments.output:
+        arguments.output.write_text(
+            json.dumps({"metadata": metadata(arguments), "results": results}, indent=2)
+            + "\n"
+        )
+    if arguments.compare and not compare(
+        json.loads(arguments.compare.read_text()), results, arguments.max_regression
+    ):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Synthetic reminder datasets, shaped like the RemindMe cog's REMINDER custom group."""
+
+import random
+from collections.abc import Iterator
+from typing import Any
+
+WORDS = (
+    "take",
+    "out",
+    "the",
+    "trash",
+    "call",
+    "mom",
+    "check",
+    "oven",
+    "feed",
+    "cat",
+    "water",
+    "plants",
+    "pay",
+    "rent",
+    "meeting",
+    "with",
+    "team",
+    "stand",
+    "up",
+    "stretch",
+    "drink",
+    "some",
+    "homework",
+    "dentist",
+    "appointment",
+    "renew",
+    "passport",
+    "start",
+    "raid",
+    "stream",
+    "birthday",
+    "party",
+)
+REPEATS = (
+    {"days": 1},
+    {"days": 7},
+    {"days": 14},
+    {"months": 1},
+    {"years": 1},
+    {"hours": 36},
+)
+# When reminders expire, relative to now: mostly soon, some far off, a few already overdue
+OVERDUE_SECONDS = 60 * 60
+HORIZON_SECONDS = 30 * 24 * 60 * 60
+
+
+class ReminderDataset:
+    """A reproducible set of synthetic reminders.
+
+    Per-user reminder counts are heavily skewed (Pareto distributed, capped at max_per_user), the
+    way real traffic is: most users have one or two reminders, and a handful have hundreds.
+    repeat_ratio of the reminders repeat. Everything comes from the seed, so the same arguments
+    always make the same reminders.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        *,
+        now: int,
+        seed: int = 0,
+        repeat_ratio: float = 0.2,
+        max_per_user: int = 200,
+        skew: float = 1.2,
+    ) -> None:
+        """Init."""
+        self.size = size
+        self.now = now
+        self.seed = seed
+        self.repeat_ratio = repeat_ratio
+        self.max_per_user = max_per_user
+        self.skew = skew
+
+    def user_counts(self) -> Iterator[tuple[int, int]]:
+        """Get the (user_id, reminder count) of every user, adding up to size reminders."""
+        rng = random.Random(self.seed)
+        remaining = self.size
+        user_id = 100_000_000_000_000_000
+        while remaining:
+            user_id += rng.randrange(1, 1 << 20)
+            count = min(remaining, self.max_per_user, int(rng.paretovariate(self.skew)))
+            remaining -= count
+            yield user_id, count
+
+    def reminders(self) -> Iterator[tuple[int, int, dict[str, Any]]]:
+        """Get every (user_id, user_reminder_id, reminder), one user at a time, in creation order."""
+        rng = random.Random(self.seed + 1)
+        for user_id, count in self.user_counts():
+            for user_reminder_id in range(1, count + 1):
+                yield user_id, user_reminder_id, self._reminder(rng)
+
+    def schedule_entries(self) -> Iterator[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, as ReminderSchedule.build() takes them."""
+        for user_id, user_reminder_id, reminder in self.reminders():
+            yield reminder["expires"], user_id, user_reminder_id
+
+    def _reminder(self, rng: random.Random) -> dict[str, Any]:
+        """Make a single reminder."""
+        expires = self.now + int(rng.triangular(-OVERDUE_SECONDS, HORIZON_SECONDS, 0))
+        reminder: dict[str, Any] = {
+            "text": " ".join(rng.choices(WORDS, k=rng.randint(0, 12))),
+            "created": expires - rng.randint(60, HORIZON_SECONDS),
+            "expires": expires,
+            "jump_link": None,
+        }
+        if rng.random() < 0.5:  # noqa: PLR2004
+            reminder["jump_link"] = (
+                f"https://discord.com/channels/{rng.getrandbits(60)}/{rng.getrandbits(60)}/{rng.getrandbits(60)}"
+            )
+        if rng.random() < self.repeat_ratio:
+            reminder["repeat"] = dict(rng.choice(REPEATS))
+        return reminder
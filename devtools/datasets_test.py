@@ -0,0 +1,86 @@
+"""Tests for the synthetic reminder datasets."""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Loaded as a package, from the repository root, like the other devtools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from devtools import datasets
+
+NOW = 1_700_000_000
+
+
+class TestReminderDataset(unittest.TestCase):
+    def test_size_and_shape(self):
+        dataset = datasets.ReminderDataset(5000, now=NOW, max_per_user=50)
+        reminders = list(dataset.reminders())
+        assert len(reminders) == 5000
+        assert (
+            len(
+                {
+                    (user_id, user_reminder_id)
+                    for user_id, user_reminder_id, _ in reminders
+                }
+            )
+            == 5000
+        )
+        for _, _, reminder in reminders:
+            assert set(reminder) <= {
+                "text",
+                "created",
+                "expires",
+                "jump_link",
+                "repeat",
+            }
+            assert reminder["created"] < reminder["expires"]
+            assert (
+                NOW - datasets.OVERDUE_SECONDS
+                <= reminder["expires"]
+                <= NOW + datasets.HORIZON_SECONDS
+            )
+
+    def test_user_counts_are_skewed(self):
+        counts = sorted(
+            (
+                count
+                for _, count in datasets.ReminderDataset(
+                    20000, now=NOW, max_per_user=100
+                ).user_counts()
+            ),
+            reverse=True,
+        )
+        assert sum(counts) == 20000
+        assert counts[0] == 100
+        # Most users have only a reminder or two
+        assert counts[len(counts) // 2] <= 2
+
+    def test_repeat_ratio(self):
+        reminders = list(
+            datasets.ReminderDataset(10000, now=NOW, repeat_ratio=0.3).reminders()
+        )
+        repeating = sum(1 for _, _, reminder in reminders if reminder.get("repeat"))
+        assert 2700 < repeating < 3300
+
+    def test_reproducible(self):
+        assert list(
+            datasets.ReminderDataset(1000, now=NOW, seed=4).reminders()
+        ) == list(datasets.ReminderDataset(1000, now=NOW, seed=4).reminders())
+        assert list(
+            datasets.ReminderDataset(1000, now=NOW, seed=4).reminders()
+        ) != list(datasets.ReminderDataset(1000, now=NOW, seed=5).reminders())
+        schedule_entries = list(
+            datasets.ReminderDataset(1000, now=NOW).schedule_entries()
+        )
+        assert schedule_entries == [
+            (reminder["expires"], user_id, user_reminder_id)
+            for user_id, user_reminder_id, reminder in datasets.ReminderDataset(
+                1000, now=NOW
+            ).reminders()
+        ]
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
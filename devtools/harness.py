@@ -0,0 +1,826 @@
+"""Run cogs without Discord or a real Red instance, on a virtual clock.
+
+    with Harness() as harness:
+        harness.run(scenario(harness))
+
+    async def scenario(harness: Harness) -> None:
+        remindme = await harness.bot.load("remindme")
+        user = harness.bot.add_user(1)
+        await harness.invoke(remindme, "remindme", user, time_and_optional_text="in 1 day to stretch")
+        await asyncio.sleep(2 * 24 * 60 * 60)  # Takes no time at all
+        assert len(user.sent) == 2
+
+Cogs get the real Red Config, backed by an in-memory driver, so custom groups, nested_update()
+and everything else behave exactly as they do on a real bot. The bot is a FakeBot, with FakeUsers
+that record everything sent to them, and can be told to fail, rate limit, or refuse DMs.
+
+Everything runs on a VirtualClockEventLoop. Whenever every task is waiting on a timer, the clock
+jumps straight to the soonest one, so days of traffic can be simulated in seconds (or, given a
+speed, it waits in real time too, at that many virtual seconds per real second). time.time(),
+time.monotonic() and datetime.datetime.now() follow the virtual clock for as long as the harness
+is open. Work handed off to a thread pool takes no virtual time: the clock stands still until it
+is done.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import copy
+import datetime
+import importlib
+import itertools
+import json
+import selectors
+import tempfile
+import time
+import weakref
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Coroutine, Iterator
+from types import TracebackType
+from typing import Any, TypeVar
+from unittest import mock
+
+import discord
+from discord.ext.commands.view import StringView
+from redbot.core import commands, data_manager
+from redbot.core._drivers import BaseDriver, IdentifierData
+
+T = TypeVar("T")
+
+_snowflakes = itertools.count(1 << 40)
+
+
+def snowflake() -> int:
+    """Make up a new, unique Discord ID."""
+    return next(_snowflakes)
+
+
+#
+# Virtual time
+#
+
+
+class VirtualClock:
+    """A wall clock and a monotonic clock that only move forward when told to."""
+
+    def __init__(self, start: float | None = None) -> None:
+        """Init. The wall clock starts at start (or the real time right now)."""
+        self.start = float(int(time.time()) if start is None else start)
+        self.elapsed = 0.0
+
+    def time(self) -> float:
+        """Get the virtual wall clock time, like time.time()."""
+        return self.start + self.elapsed
+
+    def monotonic(self) -> float:
+        """Get the virtual monotonic time, like time.monotonic()."""
+        return self.elapsed
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.elapsed += max(0.0, seconds)
+
+    @contextlib.contextmanager
+    def patched(self) -> Iterator[None]:
+        """Make time.time(), time.monotonic() and datetime.datetime.now() follow this clock."""
+        clock = self
+
+        class VirtualDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz: datetime.tzinfo | None = None) -> datetime.datetime:
+                return cls.fromtimestamp(clock.time(), tz)
+
+        with mock.patch("time.time", self.time), mock.patch(
+            "time.monotonic", self.monotonic
+        ), mock.patch("datetime.datetime", VirtualDatetime):
+            yield
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """A selector that, rather than blocking until the next timer, jumps the virtual clock forward to it."""
+
+    def __init__(self, clock: VirtualClock, speed: float | None) -> None:
+        super().__init__()
+        self.clock = clock
+        self.speed = speed
+        self.executor_jobs = 0
+
+    def select(
+        self, timeout: float | None = None
+    ) -> list[tuple[selectors.SelectorKey, int]]:
+        if timeout is None or timeout <= 0 or self.executor_jobs:
+            # Nothing scheduled, nothing to wait for, or a thread that we have to actually wait on
+            return super().select(timeout)
+        if not self.speed:
+            ready = super().select(0)
+            if not ready:
+                self.clock.advance(timeout)
+            return ready
+        started = time.perf_counter()
+        ready = super().select(timeout / self.speed)
+        self.clock.advance(
+            min(timeout, (time.perf_counter() - started) * self.speed)
+            if ready
+            else timeout
+        )
+        return ready
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """An event loop that runs on a VirtualClock, skipping over any time where it would just be waiting."""
+
+    def __init__(self, clock: VirtualClock, speed: float | None = None) -> None:
+        """Init. With a speed, timers are waited on in real time too, at that many virtual seconds per real second."""
+        self.clock = clock
+        self._virtual_selector = _VirtualSelector(clock, speed)
+        super().__init__(self._virtual_selector)
+
+    # Real time never stands still, but a float can: a day in, a sleep of a few picoseconds rounds
+    # away to nothing, and whatever is waiting on it would spin forever. So sleeps take at least this long.
+    MIN_DELAY_SECONDS = 1e-6
+
+    def time(self) -> float:
+        """Get the loop's time, which is the virtual monotonic time."""
+        return self.clock.monotonic()
+
+    def call_later(
+        self,
+        delay: float,
+        callback: Callable[..., object],
+        *args: Any,  # noqa: ANN401
+        context: contextvars.Context | None = None,
+    ) -> asyncio.TimerHandle:
+        """Call callback after delay seconds (of virtual time)."""
+        if delay > 0:
+            delay = max(delay, self.MIN_DELAY_SECONDS)
+        return super().call_later(delay, callback, *args, context=context)
+
+    def run_in_executor(
+        self, executor: Any, func: Callable[..., T], *args: Any  # noqa: ANN401
+    ) -> asyncio.Future[T]:
+        """Run func in a thread pool, holding the clock still until it is done."""
+        future = super().run_in_executor(executor, func, *args)
+        self._virtual_selector.executor_jobs += 1
+
+        def done(_: asyncio.Future) -> None:
+            self._virtual_selector.executor_jobs -= 1
+
+        future.add_done_callback(done)
+        return future
+
+
+#
+# Config
+#
+
+
+class MemoryDriver(BaseDriver):
+    """A Config driver that keeps everything in a dict (shared by every driver for the same harness).
+
+    Values are copied in and out through JSON, like the JSON driver does, so cogs see exactly
+    what they would on a real bot (string keys and all).
+    """
+
+    def __init__(
+        self,
+        cog_name: str,
+        identifier: str,
+        data: dict[str, Any],
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Init."""
+        super().__init__(cog_name, identifier, **kwargs)
+        self.data = data.setdefault(cog_name, {})
+
+    @classmethod
+    async def initialize(cls, **storage_details: Any) -> None:  # noqa: ANN401
+        """Nothing to set up."""
+
+    @classmethod
+    async def teardown(cls) -> None:
+        """Nothing to tear down."""
+
+    @staticmethod
+    def get_config_details() -> dict[str, Any]:
+        """Nothing to configure."""
+        return {}
+
+    async def get(self, identifier_data: IdentifierData) -> Any:  # noqa: ANN401
+        """Get a value (raising KeyError if it isn't set)."""
+        partial = self.data
+        for identifier in identifier_data.to_tuple()[1:]:
+            partial = partial[identifier]
+        return copy.deepcopy(partial)
+
+    async def set(
+        self, identifier_data: IdentifierData, value: Any = None  # noqa: ANN401
+    ) -> None:
+        """Set a value."""
+        identifiers = identifier_data.to_tuple()[1:]
+        partial = self.data
+        for identifier in identifiers[:-1]:
+            partial = partial.setdefault(identifier, {})
+        partial[identifiers[-1]] = json.loads(json.dumps(value))
+
+    async def clear(self, identifier_data: IdentifierData) -> None:
+        """Clear a value, if it is set."""
+        identifiers = identifier_data.to_tuple()[1:]
+        partial = self.data
+        with contextlib.suppress(KeyError):
+            for identifier in identifiers[:-1]:
+                partial = partial[identifier]
+            del partial[identifiers[-1]]
+
+    @classmethod
+    async def aiter_cogs(cls) -> AsyncIterator[tuple[str, str]]:
+        """Not needed by cogs."""
+        return
+        yield
+
+
+#
+# Discord
+#
+
+
+class _FakeResponse:
+    """Just enough of an aiohttp response to make discord.py's HTTP exceptions."""
+
+    def __init__(
+        self, status: int, reason: str, headers: dict[str, str] | None = None
+    ) -> None:
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+
+def http_error(
+    status: int = 500, message: str = "Internal Server Error"
+) -> discord.HTTPException:
+    """Make the exception discord.py raises for a failed request."""
+    return discord.HTTPException(_FakeResponse(status, message), message)
+
+
+def rate_limited_error(retry_after: float = 1.0) -> discord.HTTPException:
+    """Make the exception discord.py raises when Discord rate limits a request (with a 429)."""
+    return discord.HTTPException(
+        _FakeResponse(429, "Too Many Requests", {"Retry-After": str(retry_after)}),
+        "You are being rate limited.",
+    )
+
+
+class FakeMessage:
+    """A message that was sent (or received), recording what happened to it afterwards."""
+
+    def __init__(
+        self,
+        channel: "FakeMessageable",
+        author: "FakeUser | None",
+        content: str | None,
+        embed: discord.Embed | None,
+        sent_at: float,
+    ) -> None:
+        """Init."""
+        self.id = snowflake()
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.embed = embed
+        self.sent_at = sent_at
+        self.guild = getattr(channel, "guild", None)
+        self.reactions: list[str] = []
+        self.deleted = False
+
+    @property
+    def jump_url(self) -> str:
+        """Get a link to the message."""
+        guild_id = self.guild.id if self.guild else "@me"
+        return f"https://discord.com/channels/{guild_id}/{self.channel.id}/{self.id}"
+
+    async def add_reaction(self, emoji: str) -> None:
+        """React to the message."""
+        self.reactions.append(str(emoji))
+
+    async def delete(self, *, delay: float | None = None) -> None:
+        """Delete the message."""
+        if delay:
+            await asyncio.sleep(delay)
+        self.deleted = True
+
+
+class FakeMessageable:
+    """Something that can be sent messages, which records them, and can be told to fail.
+
+    send() fails with each exception in failures (oldest first) before it starts succeeding
+    again. Every send takes latency seconds (of virtual time).
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        """Init."""
+        self.id = snowflake()
+        self.clock = clock
+        self.sent: list[FakeMessage] = []
+        self.failures: deque[discord.HTTPException] = deque()
+        self.latency = 0.0
+
+    def fail_next(
+        self, count: int = 1, exception: discord.HTTPException | None = None
+    ) -> None:
+        """Make the next count sends fail (with a 500 error, unless given something else)."""
+        self.failures.extend(exception or http_error() for _ in range(count))
+
+    def rate_limit_next(self, count: int = 1, retry_after: float = 1.0) -> None:
+        """Make the next count sends get rate limited."""
+        self.fail_next(count, rate_limited_error(retry_after))
+
+    async def send(
+        self,
+        content: str | None = None,
+        *,
+        embed: discord.Embed | None = None,
+        **_: Any,  # noqa: ANN401
+    ) -> FakeMessage:
+        """Send a message."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures:
+            raise self.failures.popleft()
+        message = FakeMessage(self, None, content, embed, self.clock.time())
+        self.sent.append(message)
+        return message
+
+
+class FakeUser(FakeMessageable):
+    """A user (or member, or bot), that is also its own DM channel."""
+
+    def __init__(
+        self,
+        clock: VirtualClock,
+        user_id: int | None = None,
+        name: str | None = None,
+        *,
+        bot: bool = False,
+    ) -> None:
+        """Init."""
+        super().__init__(clock)
+        self.id = user_id or self.id
+        self.name = name or f"user{self.id}"
+        self.display_name = self.name
+        self.bot = bot
+        self.avatar = None
+        self.default_avatar = "https://cdn.discordapp.com/embed/avatars/0.png"
+        self.dm_channel: FakeUser | None = None
+        self.dms_closed = False
+
+    def __str__(self) -> str:
+        """Get the user's name."""
+        return self.name
+
+    @property
+    def mention(self) -> str:
+        """Get a mention of the user."""
+        return f"<@{self.id}>"
+
+    async def create_dm(self) -> "FakeUser":
+        """Open a DM channel with the user."""
+        self.dm_channel = self
+        return self
+
+    async def send(
+        self,
+        content: str | None = None,
+        *,
+        embed: discord.Embed | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> FakeMessage:
+        """DM the user."""
+        if self.dms_closed:
+            raise discord.Forbidden(
+                _FakeResponse(403, "Forbidden"), "Cannot send messages to this user"
+            )
+        return await super().send(content, embed=embed, **kwargs)
+
+
+class FakeChannel(FakeMessageable):
+    """A text channel in a guild, where the bot can do anything."""
+
+    def __init__(self, clock: VirtualClock, guild: "FakeGuild") -> None:
+        """Init."""
+        super().__init__(clock)
+        self.guild = guild
+
+    def permissions_for(self, _: Any) -> discord.Permissions:  # noqa: ANN401
+        """Get someone's permissions in the channel."""
+        return discord.Permissions.all()
+
+
+class FakeGuild:
+    """A guild with a single text channel."""
+
+    def __init__(self, clock: VirtualClock, me: FakeUser) -> None:
+        """Init."""
+        self.id = snowflake()
+        self.me = me
+        self.members: dict[int, FakeUser] = {me.id: me}
+        self.channel = FakeChannel(clock, self)
+
+    def get_member(self, user_id: int) -> FakeUser | None:
+        """Get a member of the guild."""
+        return self.members.get(user_id)
+
+
+class FakeReactionPayload:
+    """The parts of discord.RawReactionActionEvent that cogs use."""
+
+    def __init__(self, message: FakeMessage, user: FakeUser, emoji: str) -> None:
+        """Init."""
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id if message.guild else None
+        self.user_id = user.id
+        self.member = message.guild.get_member(user.id) if message.guild else None
+        self.emoji = discord.PartialEmoji(name=emoji)
+        self.event_type = "REACTION_ADD"
+
+
+class FakeBot:
+    """A stand-in for Red, with a user cache, guilds, owners, loaded cogs and events.
+
+    Users added with cached=False aren't in the bot's cache, so they have to be fetched (as
+    happens on bots without the members intent). fetch_failures are raised by fetch_user()
+    (oldest first) before it starts succeeding again.
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        """Init."""
+        self.clock = clock
+        self.user = FakeUser(clock, name="Red", bot=True)
+        self.users: dict[int, FakeUser] = {}
+        self.uncached_user_ids: set[int] = set()
+        self.fetched_user_ids: list[int] = []
+        self.fetch_failures: deque[discord.HTTPException] = deque()
+        self.guilds: dict[int, FakeGuild] = {}
+        self.owner_ids: set[int] = set()
+        self.owner_messages: list[str] = []
+        self.cogs: dict[str, commands.Cog] = {}
+        self.disabled_cogs: set[tuple[str, int]] = set()
+        self.embed_color = discord.Color.red()
+        self._waiters: list[tuple[str, Callable[..., bool], asyncio.Future]] = []
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Get the event loop."""
+        return asyncio.get_running_loop()
+
+    def add_user(
+        self,
+        user_id: int | None = None,
+        name: str | None = None,
+        *,
+        cached: bool = True,
+    ) -> FakeUser:
+        """Make a user that the bot can see."""
+        user = FakeUser(self.clock, user_id, name)
+        self.users[user.id] = user
+        if not cached:
+            self.uncached_user_ids.add(user.id)
+        return user
+
+    def add_guild(self, *members: FakeUser) -> FakeGuild:
+        """Make a guild with the bot and some users in it."""
+        guild = FakeGuild(self.clock, self.user)
+        guild.members.update((member.id, member) for member in members)
+        self.guilds[guild.id] = guild
+        return guild
+
+    def add_owner(self, user: FakeUser) -> None:
+        """Make a user one of the bot owners."""
+        self.owner_ids.add(user.id)
+
+    def get_user(self, user_id: int) -> FakeUser | None:
+        """Get a user from the cache."""
+        return None if user_id in self.uncached_user_ids else self.users.get(user_id)
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        """Fetch a user from the API."""
+        self.fetched_user_ids.append(user_id)
+        if self.fetch_failures:
+            raise self.fetch_failures.popleft()
+        user = self.users.get(user_id)
+        if not user:
+            raise discord.NotFound(_FakeResponse(404, "Not Found"), "Unknown User")
+        return user
+
+    def get_guild(self, guild_id: int) -> FakeGuild | None:
+        """Get a guild."""
+        return self.guilds.get(guild_id)
+
+    async def is_owner(self, user: FakeUser) -> bool:
+        """Check if a user is a bot owner."""
+        return user.id in self.owner_ids
+
+    async def send_to_owners(
+        self, content: str | None = None, **_: Any  # noqa: ANN401
+    ) -> None:
+        """Send a message to the bot owners."""
+        self.owner_messages.append(content)
+
+    async def get_embed_color(self, _: Any) -> discord.Color:  # noqa: ANN401
+        """Get the color to use for embeds."""
+        return self.embed_color
+
+    async def cog_disabled_in_guild_raw(self, cog_name: str, guild_id: int) -> bool:
+        """Check if a cog has been disabled in a guild."""
+        return (cog_name, guild_id) in self.disabled_cogs
+
+    async def wait_until_ready(self) -> None:
+        """Return straight away, as the bot is always ready."""
+
+    async def load(self, package: str) -> commands.Cog:
+        """Load a cog package the same way Red does (through its setup() function), returning the cog."""
+        before = set(self.cogs)
+        await importlib.import_module(package).setup(self)
+        (cog_name,) = set(self.cogs) - before
+        return self.cogs[cog_name]
+
+    async def add_cog(self, cog: commands.Cog) -> None:
+        """Add a cog."""
+        self.cogs[cog.qualified_name] = cog
+
+    async def remove_cog(self, cog_name: str) -> None:
+        """Remove (unload) a cog."""
+        cog = self.cogs.pop(cog_name, None)
+        if cog:
+            await cog.cog_unload()
+
+    def get_cog(self, cog_name: str) -> commands.Cog | None:
+        """Get a loaded cog."""
+        return self.cogs.get(cog_name)
+
+    async def close(self) -> None:
+        """Unload every cog."""
+        for cog_name in list(self.cogs):
+            await self.remove_cog(cog_name)
+
+    async def dispatch(self, event: str, *args: Any) -> None:  # noqa: ANN401
+        """Dispatch an event to anything waiting for it, and every cog listening for it (waiting for them to finish)."""
+        for waiter in list(self._waiters):
+            waiter_event, check, future = waiter
+            if waiter_event == event and not future.done() and check(*args):
+                future.set_result(args[0] if len(args) == 1 else args)
+                self._waiters.remove(waiter)
+        listeners = [
+            listener
+            for cog in self.cogs.values()
+            for name, listener in cog.get_listeners()
+            if name == f"on_{event}"
+        ]
+        await asyncio.gather(*(listener(*args) for listener in listeners))
+
+    async def wait_for(
+        self,
+        event: str,
+        *,
+        check: Callable[..., bool] | None = None,
+        timeout: float | None = None,  # noqa: ASYNC109
+    ) -> Any:  # noqa: ANN401
+        """Wait for an event to be dispatched."""
+        future = asyncio.get_running_loop().create_future()
+        waiter = (event, check or (lambda *_: True), future)
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def react(self, message: FakeMessage, user: FakeUser, emoji: str) -> None:
+        """Have a user react to a message."""
+        await message.add_reaction(emoji)
+        await self.dispatch(
+            "raw_reaction_add", FakeReactionPayload(message, user, emoji)
+        )
+
+    async def say(
+        self, user: FakeUser, content: str, channel: FakeMessageable | None = None
+    ) -> FakeMessage:
+        """Have a user send a message (to answer a question a command asked, say)."""
+        message = FakeMessage(channel or user, user, content, None, self.clock.time())
+        await self.dispatch("message", message)
+        return message
+
+
+class FakeContext:
+    """The parts of a command context that cogs use. Everything the bot sends goes to the channel."""
+
+    def __init__(
+        self,
+        bot: FakeBot,
+        author: FakeUser,
+        guild: FakeGuild | None = None,
+        content: str = "",
+    ) -> None:
+        """Init."""
+        self.bot = bot
+        self.author = author
+        self.guild = guild
+        self.channel: FakeMessageable = guild.channel if guild else author
+        self.me = guild.me if guild else bot.user
+        self.message = FakeMessage(
+            self.channel, author, content, None, bot.clock.time()
+        )
+        self.prefix = self.clean_prefix = "[p]"
+        self.command: commands.Command | None = None
+        self.invoked_subcommand: commands.Command | None = None
+        # What is left of the message after the command's name
+        self.view = StringView("")
+        self.cog: commands.Cog | None = None
+        self.args: list[Any] = []
+        self.kwargs: dict[str, Any] = {}
+        self.help_sent = False
+        self.ticked = False
+
+    async def send(
+        self, content: str | None = None, **kwargs: Any  # noqa: ANN401
+    ) -> FakeMessage:
+        """Send a message to the channel."""
+        return await self.channel.send(content, **kwargs)
+
+    async def reply(
+        self, content: str | None = None, **kwargs: Any  # noqa: ANN401
+    ) -> FakeMessage:
+        """Reply to the command message."""
+        return await self.channel.send(content, **kwargs)
+
+    async def tick(self) -> bool:
+        """React to the command message with a checkmark."""
+        self.ticked = True
+        return True
+
+    async def send_help(self, *_: Any) -> None:  # noqa: ANN401
+        """Send the command's help."""
+        self.help_sent = True
+
+    async def embed_color(self) -> discord.Color:
+        """Get the color to use for embeds."""
+        return await self.bot.get_embed_color(self.channel)
+
+    @contextlib.asynccontextmanager
+    async def typing(self) -> AsyncIterator[None]:
+        """Show that the bot is typing."""
+        yield
+
+
+#
+# Putting it all together
+#
+
+
+class Harness:
+    """A FakeBot with in-memory Config, a scratch data folder and a virtual clock, ready to load cogs into.
+
+    Use it as a context manager: Config, the data folder and the clock are only swapped in while it is open.
+    """
+
+    def __init__(self, start: float | None = None, speed: float | None = None) -> None:
+        """Init. The virtual wall clock starts at start (or the real time right now).
+
+        Virtual time runs as fast as possible, unless given a speed (in virtual seconds per real second).
+        """
+        self.clock = VirtualClock(start)
+        self.speed = speed
+        self.bot = FakeBot(self.clock)
+        self.config_data: dict[str, Any] = {}
+        self._exit_stack = contextlib.ExitStack()
+
+    def __enter__(self) -> "Harness":
+        """Swap in the in-memory Config, a temporary data folder, and the virtual clock."""
+        data_path = self._exit_stack.enter_context(
+            tempfile.TemporaryDirectory(prefix="pcxcogs-harness-")
+        )
+        basic_config = {
+            **data_manager.basic_config_default,
+            "DATA_PATH": data_path,
+            "STORAGE_TYPE": "JSON",
+            "STORAGE_DETAILS": {},
+        }
+        self._exit_stack.enter_context(
+            mock.patch.object(data_manager, "basic_config", basic_config)
+        )
+        self._exit_stack.enter_context(
+            mock.patch("redbot.core.config.get_driver", self._get_driver)
+        )
+        # Red hands out the same Config for the same cog for as long as it is alive, which could be an earlier harness's
+        self._exit_stack.enter_context(
+            mock.patch(
+                "redbot.core.config._config_cache", weakref.WeakValueDictionary()
+            )
+        )
+        self._exit_stack.enter_context(self.clock.patched())
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Put everything back."""
+        self._exit_stack.close()
+
+    def _get_driver(
+        self,
+        cog_name: str,
+        identifier: str,
+        _storage_type: Any = None,  # noqa: ANN401
+        *,
+        allow_old: bool = False,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> MemoryDriver:
+        return MemoryDriver(cog_name, identifier, self.config_data, **kwargs)
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on a VirtualClockEventLoop, unloading every cog once it is done."""
+
+        async def run_then_close() -> T:
+            try:
+                return await coroutine
+            finally:
+                await self.bot.close()
+
+        with asyncio.Runner(
+            loop_factory=lambda: VirtualClockEventLoop(self.clock, self.speed)
+        ) as runner:
+            return runner.run(run_then_close())
+
+    def context(
+        self, author: FakeUser, guild: FakeGuild | None = None, content: str = ""
+    ) -> FakeContext:
+        """Make a context for a command run by author (in a guild, or in DMs)."""
+        return FakeContext(self.bot, author, guild, content)
+
+    async def invoke(
+        self,
+        cog: commands.Cog,
+        command_name: str,
+        author: FakeUser,
+        *args: Any,  # noqa: ANN401
+        guild: FakeGuild | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> FakeContext:
+        """Run a cog's command (by its full name, like "reminder list") the way Red would, returning the context it ran with.
+
+        Like discord.py's Group.invoke, every group on the way to the command runs first (hooks,
+        callback and all), then hands off to the next. Checks and argument parsing are skipped.
+        """
+        command = next(
+            (
+                command
+                for command in cog.walk_commands()
+                if command.qualified_name == command_name
+            ),
+            None,
+        )
+        if command is None:
+            msg = f"{cog.qualified_name} has no command named {command_name!r}"
+            raise ValueError(msg)
+        ctx = self.context(author, guild, f"[p]{command_name}")
+        ctx.cog = cog
+        chain = [*reversed(command.parents), command]
+        words = command_name.split()
+        for depth, current in enumerate(chain):
+            subcommand = chain[depth + 1] if current is not command else None
+            if subcommand and current.invoke_without_command:
+                continue
+            current_args, current_kwargs = ((), {}) if subcommand else (args, kwargs)
+            ctx.command = current
+            if isinstance(current, commands.Group):
+                ctx.invoked_subcommand = None
+            ctx.view = StringView(" ".join(words[depth + 1 :]))
+            ctx.args, ctx.kwargs = [cog, ctx, *current_args], current_kwargs
+            await cog.cog_before_invoke(ctx)
+            ctx.invoked_subcommand = subcommand
+            try:
+                await current.callback(cog, ctx, *current_args, **current_kwargs)
+            finally:
+                await cog.cog_after_invoke(ctx)
+        return ctx
+
+    async def sleep_until(self, timestamp: float) -> None:
+        """Let everything run until the virtual wall clock reaches timestamp."""
+        await asyncio.sleep(max(0.0, timestamp - self.clock.time()))
+
+    async def settle(self, seconds: float = 1.0) -> None:
+        """Let everything run for a little while (of virtual time), so that anything due right now gets done."""
+        await asyncio.sleep(seconds)
+
+
+def lateness(
+    messages: list[FakeMessage], due: Callable[[FakeMessage], float | None]
+) -> list[float]:
+    """Get how late each message was sent (sent_at minus when it was due), skipping any due() returns None for."""
+    return [
+        message.sent_at - due_at
+        for message in messages
+        if (due_at := due(message)) is not None
+    ]
@@ -0,0 +1,500 @@
+"""Tests for the fake bot harness, run against the real RemindMe and Todo cogs."""
+
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import harness
+from redbot.core import commands
+
+# The cogs are loaded as packages, from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DAY = 24 * 60 * 60
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_sleeping_takes_no_real_time(self):
+        async def scenario() -> float:
+            started = time.monotonic()
+            await asyncio.gather(asyncio.sleep(DAY), asyncio.sleep(7 * DAY))
+            return time.monotonic() - started
+
+        real_started = time.perf_counter()
+        with harness.Harness(start=1_700_000_000) as h:
+            assert time.time() == 1_700_000_000
+            assert h.run(scenario()) == 7 * DAY
+            assert h.clock.time() == 1_700_000_000 + 7 * DAY
+        assert time.perf_counter() - real_started < 5
+        assert time.time() > 1_700_000_000 + 365 * DAY
+
+    def test_executor_work_takes_no_virtual_time(self):
+        async def scenario(h: harness.Harness) -> float:
+            started = h.clock.monotonic()
+            await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.05)
+            return h.clock.monotonic() - started
+
+        with harness.Harness() as h:
+            assert h.run(scenario(h)) == 0
+
+
+class HookRecorder(commands.Cog):
+    """Records when its command hooks and callbacks run."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.calls: list[tuple[str, str, str | None]] = []
+
+    def _record(self, call: str, ctx: commands.Context) -> None:
+        subcommand = ctx.invoked_subcommand
+        self.calls.append(
+            (call, ctx.command.qualified_name, subcommand and subcommand.name)
+        )
+
+    @commands.group()
+    async def outer(self, ctx: commands.Context) -> None:
+        """Group."""
+        self._record("callback", ctx)
+
+    @outer.group()
+    async def inner(self, ctx: commands.Context) -> None:
+        """Nested group."""
+        self._record("callback", ctx)
+
+    @inner.command()
+    async def leaf(self, ctx: commands.Context, value: int) -> None:
+        """Subcommand."""
+        self._record(f"callback {value}", ctx)
+
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        """Record the hook."""
+        self._record("before", ctx)
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        """Record the hook."""
+        self._record("after", ctx)
+
+
+class TestInvoke(unittest.TestCase):
+    def test_groups_run_like_discord_py_runs_them(self):
+        async def scenario(h: harness.Harness) -> list[tuple[str, str, str | None]]:
+            cog = HookRecorder()
+            await h.invoke(cog, "outer inner leaf", h.bot.add_user(), 5)
+            return cog.calls
+
+        with harness.Harness() as h:
+            assert h.run(scenario(h)) == [
+                ("before", "outer", None),
+                ("callback", "outer", "inner"),
+                ("after", "outer", "inner"),
+                ("before", "outer inner", None),
+                ("callback", "outer inner", "leaf"),
+                ("after", "outer inner", "leaf"),
+                ("before", "outer inner leaf", "leaf"),
+                ("callback 5", "outer inner leaf", None),
+                ("after", "outer inner leaf", None),
+            ]
+
+
+class TestRemindMe(unittest.TestCase):
+    def test_reminder_sent_on_time(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user(1)
+            await h.invoke(
+                remindme, "remindme", user, time_and_optional_text="in 1 day to stretch"
+            )
+            assert "in 1 day" in user.sent[0].content
+            reminder = (await remindme.reminder_store.get_user(user.id))[1]
+            assert reminder["text"] == "stretch"
+            await h.sleep_until(reminder["expires"] + DAY)
+            assert len(user.sent) == 2
+            assert "stretch" in user.sent[1].embed.fields[0].value
+            (late,) = harness.lateness(user.sent[1:], lambda _: reminder["expires"])
+            assert 0 <= late < 60
+            assert not await remindme.reminder_store.get_user(user.id)
+            # Saved through the real Config, into the harness
+            assert (
+                "REMINDER" not in h.config_data["RemindMe"]
+                or str(user.id) not in h.config_data["RemindMe"]["REMINDER"]
+            )
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_reminder_rescheduled_while_waiting_to_be_sent(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            users = [h.bot.add_user() for _ in range(31)]
+            for user in users:
+                await h.invoke(
+                    remindme, "remindme", user, time_and_optional_text="in 1 minute"
+                )
+            remindme.send_limiter.set_rate(1)
+            last = users[-1]
+            reminder = (await remindme.reminder_store.get_user(last.id))[1]
+            # The reminders go out one a second, so the last one is still waiting to be sent
+            await h.sleep_until(reminder["expires"] + 2)
+            assert (last.id, 1) in remindme.sending
+            await h.invoke(remindme, "reminder modify time", last, 1, time="in 1 day")
+            assert "in 1 day" in last.sent[-1].content
+            await h.settle(60)
+            assert all(len(user.sent) == 2 for user in users[:-1])
+            assert len(last.sent) == 2
+            rescheduled = (await remindme.reminder_store.get_user(last.id))[1]
+            assert rescheduled["expires"] >= reminder["expires"] + DAY
+            await h.sleep_until(rescheduled["expires"] + 60)
+            assert len(last.sent) == 3
+            assert last.sent[-1].embed
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_burst_of_commands_is_not_held_up(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            users = [h.bot.add_user() for _ in range(60)]
+            started = h.clock.monotonic()
+            await asyncio.gather(
+                *(h.invoke(remindme, "reminder list", user) for user in users)
+            )
+            # Nothing is being sent, so nothing should be waiting for the send rate
+            assert h.clock.monotonic() == started
+            assert all(len(user.sent) == 1 for user in users)
+            lane = remindme.send_lanes.stats[remindme.send_lanes.INTERACTIVE]
+            assert (lane.sent, lane.max_wait) == (60, 0)
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_reminder_list_reads_the_store_once(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user(1)
+            for text, days in (("a", 3), ("b", 1), ("c", 2)):
+                await h.invoke(
+                    remindme,
+                    "remindme",
+                    user,
+                    time_and_optional_text=f"in {days} days to {text}",
+                )
+            store = remindme.reminder_store
+            with (
+                mock.patch.object(store, "get", wraps=store.get) as get,
+                mock.patch.object(store, "get_user", wraps=store.get_user) as get_user,
+            ):
+                await h.invoke(remindme, "reminder list", user)
+                await h.invoke(remindme, "reminder list", user, "added")
+            assert not get.called
+            assert get_user.call_count == 2
+            by_time, by_added = (
+                [field.value.split("\n")[0] for field in message.embed.fields]
+                for message in user.sent[-2:]
+            )
+            assert by_time == ["b", "c", "a"]
+            assert by_added == ["a", "b", "c"]
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_prerendered_reminder_is_sent(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user()
+            await h.invoke(
+                remindme,
+                "remindme",
+                user,
+                time_and_optional_text="in 1 hour to stretch",
+            )
+            reminder = (await remindme.reminder_store.get_user(user.id))[1]
+            await h.sleep_until(reminder["expires"] - 30)
+            assert (user.id, 1) in remindme.prerendered
+            with mock.patch.object(
+                remindme,
+                "_generate_reminder_embed",
+                wraps=remindme._generate_reminder_embed,
+            ) as generate:
+                await h.sleep_until(reminder["expires"] + 60)
+            assert not generate.called
+            assert "stretch" in user.sent[-1].embed.fields[0].value
+            assert not remindme.prerendered
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_prerendered_reminder_changed_before_it_is_sent(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user()
+            await h.invoke(
+                remindme,
+                "remindme",
+                user,
+                time_and_optional_text="in 1 hour to stretch",
+            )
+            reminder = (await remindme.reminder_store.get_user(user.id))[1]
+            await h.sleep_until(reminder["expires"] - 30)
+            assert (user.id, 1) in remindme.prerendered
+            await h.invoke(
+                remindme, "reminder modify text", user, 1, text="drink some water"
+            )
+            await h.sleep_until(reminder["expires"] + 60)
+            assert "drink some water" in user.sent[-1].embed.fields[0].value
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_prerendered_reminder_forgotten_once_no_longer_due(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user()
+            await h.invoke(
+                remindme,
+                "remindme",
+                user,
+                time_and_optional_text="in 1 hour to stretch",
+            )
+            reminder = (await remindme.reminder_store.get_user(user.id))[1]
+            await h.sleep_until(reminder["expires"] - 30)
+            assert (user.id, 1) in remindme.prerendered
+            await h.invoke(remindme, "reminder modify time", user, 1, time="in 1 day")
+            await h.settle(remindme.PRERENDER_INTERVAL_SECONDS)
+            assert not remindme.prerendered
+            await h.sleep_until(reminder["expires"] + 60)
+            assert len(user.sent) == 2
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_rate_limited_send_is_retried(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            user = h.bot.add_user(1, cached=False)
+            await h.invoke(
+                remindme,
+                "remindme",
+                user,
+                time_and_optional_text="in 1 hour to stretch",
+            )
+            user.rate_limit_next(2, retry_after=5)
+            await h.settle(2 * 60 * 60)
+            assert len(user.sent) == 2
+            assert user.id in h.bot.fetched_user_ids
+            assert not user.failures
+            retries = remindme.metrics.histograms["send_retries"]
+            assert (retries.count, retries.max) == (1, 2)
+            h.bot.add_owner(user)
+            await h.invoke(remindme, "remindmeset stats", user)
+            assert "Retries per reminder" in user.sent[-1].content
+            assert "remindme_send_retries_count 1" in await remindme.render_metrics()
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_repeating_reminders_over_a_week(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            users = [h.bot.add_user() for _ in range(20)]
+            for user in users:
+                await h.invoke(
+                    remindme,
+                    "remindme",
+                    user,
+                    time_and_optional_text="every 1 day to drink some water",
+                )
+            await h.settle(7 * DAY + 60)
+            for user in users:
+                # The confirmation, then one a day
+                assert len(user.sent) == 8
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_config_access_is_counted(self):
+        async def scenario(h: harness.Harness) -> None:
+            remindme = await h.bot.load("remindme")
+            owner = h.bot.add_user(1)
+            h.bot.add_owner(owner)
+            await h.invoke(remindme, "remindmeset configstats", owner, enabled=True)
+            for _ in range(2):
+                await h.invoke(
+                    remindme,
+                    "remindme",
+                    owner,
+                    time_and_optional_text="in 1 hour to stretch",
+                )
+            await h.settle(2 * 60 * 60)
+            totals = remindme.config_access.totals
+            assert totals["remindme"].runs == 2
+            assert totals["remindme"].reads > 0
+            assert totals["remindme"].bytes_written > 0
+            assert totals["send reminder"].runs == 2
+            await h.invoke(remindme, "reminder list", owner)
+            assert totals["reminder list"].runs == 1
+            await h.invoke(remindme, "remindmeset configstats", owner)
+            # Only the commands that ran, not the groups on the way to them
+            assert "reminder" not in totals
+            assert "remindmeset" not in totals
+            assert "remindme:" in owner.sent[-1].content
+            assert "send reminder:" in owner.sent[-1].content
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+
+async def load_after_downtime(
+    h: harness.Harness, reminders: dict[harness.FakeUser, list[dict]]
+) -> commands.Cog:
+    """Create reminders, then keep RemindMe unloaded until they are all overdue, returning it loaded (and caught up) again."""
+    remindme = await h.bot.load("remindme")
+    await remindme.config.max_user_reminders.set(100)
+    now = int(h.clock.time())
+    for user, user_reminders in reminders.items():
+        for reminder in user_reminders:
+            assert await remindme.insert_reminder(
+                user.id,
+                {
+                    "text": "",
+                    "created": now,
+                    "expires": now + 60 * 60,
+                    "jump_link": None,
+                    "repeat": {},
+                    **reminder,
+                },
+            )
+    await h.bot.remove_cog(remindme.qualified_name)
+    await h.sleep_until(now + DAY / 2)
+    remindme = await h.bot.load("remindme")
+    await h.settle(60)
+    return remindme
+
+
+def reminder_texts(message: harness.FakeMessage) -> list[str]:
+    """Get the text of every reminder in a reminder DM (or digest of them)."""
+    return [field.value.split("\n\n")[1] for field in message.embed.fields]
+
+
+class TestCatchUp(unittest.TestCase):
+    def test_one_digest_per_user(self):
+        async def scenario(h: harness.Harness) -> None:
+            many, few, one = (h.bot.add_user() for _ in range(3))
+            remindme = await load_after_downtime(
+                h,
+                {
+                    many: [
+                        {"text": "a"},
+                        {"text": "b", "repeat": {"days": 1}},
+                        {"text": "c"},
+                    ],
+                    few: [{"text": "d"}, {"text": "e"}],
+                    one: [{"text": "f"}],
+                },
+            )
+            (digest,) = many.sent
+            assert "3 reminders" in digest.embed.description
+            assert reminder_texts(digest) == ["a", "b", "c"]
+            assert len(few.sent[0].embed.fields) == 2
+            # Users with just the one are left to the send workers, as usual
+            (reminder,) = one.sent
+            assert reminder.embed.description is None
+            # Only the repeating reminder is left, moved on to its next time
+            stored = await remindme.reminder_store.get_all()
+            assert {
+                user_id: list(users_reminders)
+                for user_id, users_reminders in stored.items()
+                if users_reminders
+            } == {many.id: [2]}
+            assert stored[many.id][2]["expires"] > h.clock.time()
+            assert len(remindme.schedule) == 1
+            assert (many.id, 2) in remindme.schedule
+            assert not remindme.sending
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_big_digest_is_split(self):
+        async def scenario(h: harness.Harness) -> None:
+            user = h.bot.add_user()
+            remindme = await load_after_downtime(
+                h, {user: [{"text": str(number)} for number in range(25)]}
+            )
+            assert [len(message.embed.fields) for message in user.sent] == [20, 5]
+            assert not await remindme.reminder_store.get_user(user.id)
+            assert not remindme.schedule
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_forbidden_digest_deletes_the_reminders(self):
+        async def scenario(h: harness.Harness) -> None:
+            user = h.bot.add_user()
+            user.dms_closed = True
+            remindme = await load_after_downtime(
+                h, {user: [{"text": "a"}, {"text": "b", "repeat": {"days": 1}}]}
+            )
+            assert not user.sent
+            assert not await remindme.reminder_store.get_user(user.id)
+            assert not remindme.schedule
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_failed_digest_is_sent_one_by_one(self):
+        async def scenario(h: harness.Harness) -> None:
+            user = h.bot.add_user()
+            user.fail_next(1, harness.http_error(500))
+            remindme = await load_after_downtime(
+                h, {user: [{"text": "a"}, {"text": "b"}]}
+            )
+            # Put back in the schedule, then sent by the send workers instead
+            assert [reminder_texts(message) for message in user.sent] == [["a"], ["b"]]
+            assert all(message.embed.description is None for message in user.sent)
+            assert not await remindme.reminder_store.get_user(user.id)
+            assert not remindme.schedule
+            assert not remindme.retry_queue
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+
+class TestTodo(unittest.TestCase):
+    def test_create_and_list(self):
+        async def scenario(h: harness.Harness) -> None:
+            todo = await h.bot.load("todo")
+            user = h.bot.add_user(1)
+            guild = h.bot.add_guild(user)
+            await h.invoke(
+                todo, "todo create", user, todo_list="groceries", guild=guild
+            )
+            await h.invoke(todo, "todo list", user, "groceries", guild=guild)
+            assert guild.channel.sent
+            assert h.config_data["Todo"]
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+    def test_config_access_is_counted(self):
+        async def scenario(h: harness.Harness) -> None:
+            todo = await h.bot.load("todo")
+            user = h.bot.add_user(1)
+            todo.config_access.start()
+            await h.invoke(todo, "todo create", user, todo_list="buy milk")
+            await h.invoke(todo, "todo create", user, todo_list="buy eggs")
+            totals = todo.config_access.totals["todo create"]
+            assert totals.runs == 2
+            assert totals.reads >= 2
+            assert totals.writes >= 2
+            assert totals.most_accesses * totals.runs >= totals.accesses
+            assert "todo" not in todo.config_access.totals
+
+        with harness.Harness() as h:
+            h.run(scenario(h))
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
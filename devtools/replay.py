@@ -0,0 +1,343 @@
+"""Replay a trace recorded by RemindMe or Todo (with [p]remindmeset trace or [p]todoset trace) against the harness.
+
+Run from the repository root:
+
+    python -m devtools.replay trace-1700000000.jsonl
+    python -m devtools.replay trace-1700000000.jsonl --speed 1 --profile replay.prof
+
+Commands are invoked at the same times (relative to the start of the trace) as they originally
+were, by pseudonymous users, with made up text of the same length as what was originally typed.
+Bell reactions are replayed on the matching "me too" messages, and sends that failed in the trace
+fail the same way again. Reminders that were created before the trace started, but sent while
+it was being recorded, are created up front, so that the send traffic matches too. By default
+this all runs as fast as possible; --speed 1 replays in real time.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterable
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+from redbot.core import commands  # noqa: TC002
+
+from .harness import (
+    FakeGuild,
+    FakeMessage,
+    FakeUser,
+    Harness,
+    http_error,
+    rate_limited_error,
+)
+
+log = logging.getLogger("red.pcxcogs.replay")
+
+PACKAGES = {"RemindMe": "remindme", "Todo": "todo"}
+# Give things this long to finish up after the last event in the trace
+SETTLE_SECONDS = 60.0
+# Failures are armed this long before the send they happened to was due
+ARM_FAILURE_SECONDS = 1.0
+# Made up text for the replayed commands
+FILLER = "x"
+# Commands that replaying would be a bad idea
+SKIPPED_COMMANDS = ("remindmeset trace", "todoset trace", "remindmeset storage")
+
+
+def read_trace(path: Path) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Read a trace, returning its header and its events (in time order)."""
+    with path.open(encoding="utf-8") as trace_file:
+        lines = [json.loads(line) for line in trace_file if line.strip()]
+    if not lines or lines[0]["e"] != "trace":
+        msg = f"{path} is not a trace"
+        raise ValueError(msg)
+    return lines[0], sorted(lines[1:], key=lambda event: event["t"])
+
+
+def time_expression(parsed: dict[str, Any]) -> str:
+    """Turn a traced reminder time (like {"in": {"days": 1}, "len": 5}) back into something the parser understands."""
+    parts = [
+        keyword
+        + " "
+        + " ".join(f"{amount} {unit}" for unit, amount in parsed[keyword].items())
+        for keyword in ("in", "every")
+        if parsed.get(keyword)
+    ]
+    if parsed.get("len"):
+        parts.append("to " + FILLER * parsed["len"])
+    return " ".join(parts)
+
+
+def command_arguments(command_name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+    """Turn traced (scrubbed) command arguments back into something to invoke the command with."""
+    result = {}
+    for argument, value in arguments.items():
+        if isinstance(value, dict) and ("in" in value or "every" in value):
+            result[argument] = time_expression(value)
+        elif isinstance(value, dict) and "len" in value:
+            result[argument] = FILLER * value["len"]
+        else:
+            result[argument] = value
+    if command_name == "todo create":
+        # The todo list name goes back in quotes at the start of the todo item
+        todo_list, note = result.pop("todo_list", "main"), result.pop("note", "")
+        result["todo_list"] = note if todo_list == "main" else f'"{todo_list}" {note}'
+    return result
+
+
+class Replay:
+    """Replays the events of a trace against a cog loaded into a harness."""
+
+    def __init__(
+        self, harness: Harness, header: dict[str, Any], events: list[dict[str, Any]]
+    ) -> None:
+        """Init."""
+        self.harness = harness
+        self.header = header
+        self.events = events
+        self.cog: commands.Cog | None = None
+        self.users: dict[int, FakeUser] = {}
+        self.guilds: dict[int, FakeGuild] = {}
+        # Guild -> traced me too message pseudonyms, in order
+        self.me_too_messages: dict[int, list[int]] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.counts: Counter[str] = Counter()
+
+    def user(self, pseudonym: int) -> FakeUser:
+        """Get the stand in for a traced user."""
+        if pseudonym not in self.users:
+            self.users[pseudonym] = self.harness.bot.add_user(pseudonym)
+        return self.users[pseudonym]
+
+    def guild(self, pseudonym: int | None, member: FakeUser) -> FakeGuild | None:
+        """Get the stand in for a traced guild, making sure member is in it."""
+        if pseudonym is None:
+            return None
+        if pseudonym not in self.guilds:
+            self.guilds[pseudonym] = self.harness.bot.add_guild()
+        guild = self.guilds[pseudonym]
+        guild.members[member.id] = member
+        return guild
+
+    async def run(self) -> Counter[str]:
+        """Replay the whole trace, returning counts of what happened."""
+        self.cog = await self.harness.bot.load(PACKAGES[self.header["cog"]])
+        await self._enable_me_too()
+        await self._create_earlier_reminders()
+        total_sent = getattr(self.cog, "total_sent", None)
+        sent_before = await total_sent.get() if total_sent else 0
+        start = self.harness.clock.time()
+        for event in self.events:
+            if event["e"] == "send" and event["o"] != "sent":
+                self._spawn(self._arm_failure(start, event))
+        for event in self.events:
+            await self.harness.sleep_until(start + event["t"])
+            handler = getattr(self, f"_replay_{event['e']}", None)
+            if handler:
+                self.counts[event["e"]] += 1
+                handler(event)
+        if self.events:
+            await self.harness.sleep_until(
+                start + self.events[-1]["t"] + SETTLE_SECONDS
+            )
+        for task in self.tasks:
+            task.cancel()
+        if total_sent:
+            self.counts["sent"] = await total_sent.get() - sent_before
+        return self.counts
+
+    def _spawn(self, coroutine: Any) -> None:  # noqa: ANN401
+        """Run something in the background, counting it as an error if it raises (like Red would log it)."""
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self.tasks.discard(task)
+            if not task.cancelled() and task.exception():
+                self.counts["errors"] += 1
+                log.warning(
+                    "Replayed event raised an exception", exc_info=task.exception()
+                )
+
+        task.add_done_callback(done)
+
+    async def _enable_me_too(self) -> None:
+        """Turn "me too" on in any guild where it was used."""
+        for event in self.events:
+            if (
+                event["e"] == "me_too"
+                and "g" in event
+                and event["g"] not in self.guilds
+            ):
+                self.guilds[event["g"]] = self.harness.bot.add_guild()
+                await self.cog.config.guild(self.guilds[event["g"]]).me_too.set(True)
+
+    async def _create_earlier_reminders(self) -> None:
+        """Create the reminders that were created before the trace started, but sent while it was being recorded."""
+        sends = [
+            event
+            for event in self.events
+            if event["e"] == "send" and event.get("c", 0) < 0
+        ]
+        if not sends:
+            return
+        # The trace doesn't say what the limit was, and these were allowed at the time
+        maximum = await self.cog.config.max_user_reminders()
+        await self.cog.config.max_user_reminders.set(sys.maxsize)
+        start = self.harness.clock.time()
+        created = set()
+        for event in sends:
+            if (event["u"], event["r"]) in created:
+                continue
+            created.add((event["u"], event["r"]))
+            reminder = {
+                "text": FILLER * event.get("n", 0),
+                "created": int(start + event["c"]),
+                "expires": int(start + event["t"] - event["late"]),
+                "jump_link": None,
+                "repeat": event.get("rep", {}),
+            }
+            await self.cog.insert_reminder(self.user(event["u"]).id, reminder)
+            self.counts["created earlier"] += 1
+        await self.cog.config.max_user_reminders.set(maximum)
+
+    def _replay_command(self, event: dict[str, Any]) -> None:
+        if event["c"] in SKIPPED_COMMANDS:
+            self.counts["skipped"] += 1
+            return
+        self.counts[f"command {event['c']}"] += 1
+        user = self.user(event["u"])
+        guild = self.guild(event.get("g"), user)
+        arguments = command_arguments(event["c"], event.get("a", {}))
+        self._spawn(
+            self.harness.invoke(self.cog, event["c"], user, guild=guild, **arguments)
+        )
+        if arguments.get("index") == "all" or event["c"] == "forgetme":
+            self._spawn(self._confirm(user, guild.channel if guild else user))
+
+    async def _confirm(self, user: FakeUser, channel: Any) -> None:  # noqa: ANN401
+        """Say yes to a command asking if they are sure (the trace doesn't say, but it's the more expensive answer)."""
+        await asyncio.sleep(1)
+        await self.harness.bot.say(user, "yes", channel)
+
+    def _replay_me_too(self, event: dict[str, Any]) -> None:
+        self.me_too_messages.setdefault(event.get("g"), []).append(event["m"])
+
+    def _replay_react(self, event: dict[str, Any]) -> None:
+        user = self.user(event["u"])
+        guild = self.guild(event.get("g"), user)
+        message = self._me_too_message(event.get("g"), event["m"])
+        if guild is None or message is None:
+            self.counts["unmatched react"] += 1
+            return
+        self._spawn(self.harness.bot.react(message, user, self.cog.reminder_emoji))
+
+    def _me_too_message(
+        self, guild_pseudonym: int | None, message_pseudonym: int
+    ) -> FakeMessage | None:
+        """Find the replayed "me too" message standing in for a traced one."""
+        traced = self.me_too_messages.get(guild_pseudonym, [])
+        if guild_pseudonym not in self.guilds or message_pseudonym not in traced:
+            return None
+        replayed = [
+            message
+            for message in self.guilds[guild_pseudonym].channel.sent
+            if self.cog.reminder_emoji in message.reactions
+        ]
+        index = traced.index(message_pseudonym)
+        return replayed[index] if index < len(replayed) else None
+
+    def _replay_send(self, event: dict[str, Any]) -> None:
+        # Sends happen by themselves (and any failures were armed up front)
+        pass
+
+    async def _arm_failure(self, start: float, event: dict[str, Any]) -> None:
+        """Make a send that failed in the trace fail again, arming it just before the reminder was due."""
+        await self.harness.sleep_until(
+            start + event["t"] - event["late"] - ARM_FAILURE_SECONDS
+        )
+        user = self.user(event["u"])
+        if event["o"] == "error":
+            status = event.get("status", 500)
+            user.fail_next(
+                1,
+                (
+                    rate_limited_error(event.get("retry_after") or 1.0)
+                    if status == HTTPStatus.TOO_MANY_REQUESTS
+                    else http_error(status)
+                ),
+            )
+        elif event["o"] == "forbidden":
+            user.dms_closed = True
+        elif event["o"] == "unreachable":
+            self.harness.bot.users.pop(user.id, None)
+        self.counts[f"failure {event['o']}"] += 1
+
+
+def summarize(
+    header: dict[str, Any],
+    events: list[dict[str, Any]],
+    counts: Counter[str],
+    real_seconds: float,
+) -> Iterable[str]:
+    """Describe how a replay went."""
+    span = events[-1]["t"] if events else 0.0
+    yield f"Replayed {len(events)} events ({span:.0f}s of {header['cog']} {header.get('version') or ''} traffic) in {real_seconds:.1f}s ({span / real_seconds if real_seconds else 0:.0f}x)"
+    for name, count in sorted(counts.items()):
+        yield f"  {name}: {count}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the replay."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", 1)[0])
+    parser.add_argument("trace", type=Path, help="the trace file to replay")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=None,
+        help="virtual seconds per real second (default: as fast as possible)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="write cProfile stats of the replay to this file",
+    )
+    args = parser.parse_args(argv)
+
+    header, events = read_trace(args.trace)
+    if header.get("cog") not in PACKAGES:
+        print(
+            f"Don't know how to replay a trace of {header.get('cog')}", file=sys.stderr
+        )
+        return 1
+    profiler = cProfile.Profile() if args.profile else None
+    with Harness(start=header["start"], speed=args.speed) as harness:
+        replay = Replay(harness, header, events)
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            counts = harness.run(replay.run())
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+        real_seconds = time.perf_counter() - started
+    for line in summarize(header, events, counts, real_seconds):
+        print(line)
+    if args.profile:
+        print(
+            f"Profile written to {args.profile} (view it with: python -m pstats {args.profile})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Tests for recording traces, and replaying them against the harness."""
+
+import asyncio
+import json
+import sys
+import time
+import unittest
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from redbot.core import commands
+
+# The cogs (and replay, which imports the harness relatively) are loaded as packages, from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from devtools import harness, replay
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+def record(
+    scenario: Callable[
+        [harness.Harness, commands.Cog, harness.FakeUser], Awaitable[None]
+    ],
+) -> list[dict]:
+    """Run scenario(harness, cog, owner) with RemindMe recording a trace, returning the trace."""
+
+    async def run(h: harness.Harness) -> str:
+        remindme = await h.bot.load("remindme")
+        owner = h.bot.add_user()
+        h.bot.add_owner(owner)
+        await scenario(h, remindme, owner)
+        await h.invoke(remindme, "remindmeset trace", owner, enabled=False)
+        return remindme.trace.path.read_text()
+
+    with harness.Harness() as h:
+        return [json.loads(line) for line in h.run(run(h)).splitlines()]
+
+
+class TestRecording(unittest.TestCase):
+    def test_nothing_typed_is_recorded(self):
+        async def scenario(
+            h: harness.Harness, remindme: commands.Cog, owner: harness.FakeUser
+        ) -> None:
+            await h.invoke(remindme, "remindmeset trace", owner, enabled=True)
+            user = h.bot.add_user(1234567890)
+            await h.invoke(
+                remindme,
+                "remindme",
+                user,
+                time_and_optional_text="in 2 hours to pick up the secret package",
+            )
+            await h.invoke(
+                remindme, "reminder modify text", user, 1, text="another secret"
+            )
+            await h.settle(3 * HOUR)
+
+        trace = record(scenario)
+        text = json.dumps(trace)
+        assert "secret" not in text
+        assert "1234567890" not in text
+        assert trace[0]["e"] == "trace"
+        create = next(
+            event
+            for event in trace
+            if event["e"] == "command" and event["c"] == "remindme"
+        )
+        assert create["a"] == {
+            "time_and_optional_text": {"in": {"hours": 2}, "len": 26}
+        }
+        send = next(event for event in trace if event["e"] == "send")
+        assert send["u"] == create["u"]
+        assert send["o"] == "sent"
+        assert send["n"] == len("another secret")
+
+    def test_not_recording_by_default(self):
+        async def scenario(
+            h: harness.Harness, remindme: commands.Cog, owner: harness.FakeUser
+        ) -> None:
+            await h.invoke(
+                remindme,
+                "remindme",
+                h.bot.add_user(),
+                time_and_optional_text="in 1 hour",
+            )
+            await h.invoke(remindme, "remindmeset trace", owner, enabled=True)
+
+        trace = record(scenario)
+        assert [event["e"] for event in trace] == ["trace", "command"]
+
+
+class TestReplay(unittest.TestCase):
+    def test_time_expression(self):
+        assert (
+            replay.time_expression(
+                {"in": {"days": 3, "hours": 2}, "every": {"weeks": 1}, "len": 3}
+            )
+            == "in 3 days 2 hours every 1 weeks to xxx"
+        )
+        assert replay.command_arguments(
+            "todo create", {"todo_list": "n1234abcd", "note": {"len": 2}}
+        ) == {"todo_list": '"n1234abcd" xx'}
+        assert replay.command_arguments(
+            "todo create", {"todo_list": "main", "note": {"len": 2}}
+        ) == {"todo_list": "xx"}
+
+    def test_replay_matches_trace(self):
+        async def scenario(
+            h: harness.Harness, remindme: commands.Cog, owner: harness.FakeUser
+        ) -> None:
+            # Created before recording started, so the replay has to create it up front
+            early = h.bot.add_user()
+            await h.invoke(
+                remindme,
+                "remindme",
+                early,
+                time_and_optional_text="in 3 hours to stretch every 1 day",
+            )
+            await h.settle(60)
+            await h.invoke(remindme, "remindmeset trace", owner, enabled=True)
+            users = [h.bot.add_user() for _ in range(10)]
+            for index, user in enumerate(users):
+                await h.invoke(
+                    remindme,
+                    "remindme",
+                    user,
+                    time_and_optional_text=f"in {index + 1} hours to do thing {index}",
+                )
+            users[0].rate_limit_next(2, retry_after=5)
+            await h.invoke(remindme, "reminder remove", users[9], "last")
+            await h.settle(2 * DAY)
+
+        trace = record(scenario)
+        path = Path(self.id() + ".jsonl")
+        self.addCleanup(path.unlink)
+        path.write_text("\n".join(json.dumps(event) for event in trace))
+        header, events = replay.read_trace(path)
+        with harness.Harness(start=header["start"]) as h:
+            counts = h.run(replay.Replay(h, header, events).run())
+        assert counts["created earlier"] == 1
+        assert counts["command remindme"] == 10
+        assert counts["failure error"] == 2
+        assert counts["sent"] == sum(
+            1 for event in events if event["e"] == "send" and event["o"] == "sent"
+        )
+        assert not counts["errors"]
+
+
+class TestSpeed(unittest.TestCase):
+    def test_real_time(self):
+        async def scenario() -> None:
+            await asyncio.sleep(10)
+
+        with harness.Harness(speed=100) as h:
+            real_started = time.perf_counter()
+            h.run(scenario())
+            assert 0.09 < time.perf_counter() - real_started < 1
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
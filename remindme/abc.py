@@ -1,11 +1,19 @@
 """ABC for the RemindMe Cog."""
+import asyncio
 import discord
 
 from abc import ABC, abstractmethod
 from dateutil.relativedelta import relativedelta
 from redbot.core import Config, commands
 
+from .delivery import SendLanes, TokenBucket
+from .index import ReminderIndex
+from .metrics import DeliveryMetrics, MetricsExporter
+from .migration import LegacyMigration
+from .pcx_lib import BufferedCounter, ConfigAccessStats, TraceRecorder
 from .reminder_parse import ReminderParser
+from .scheduler import ReminderSchedule, RetryQueue
+from .store import BufferedReminderStore
 
 class MixinMeta(ABC):
     """Base class for well-behaved type hint detection with composite class.
@@ -14,7 +22,20 @@ class MixinMeta(ABC):
     """
 
     config: Config
+    reminder_store: BufferedReminderStore
+    reminder_index: ReminderIndex
+    legacy_migration: LegacyMigration | None
+    total_sent: BufferedCounter
+    send_limiter: TokenBucket
+    send_lanes: SendLanes
     reminder_parser: ReminderParser
+    trace: TraceRecorder
+    config_access: ConfigAccessStats
+    metrics: DeliveryMetrics
+    metrics_exporter: MetricsExporter
+    schedule: ReminderSchedule
+    retry_queue: RetryQueue
+    send_queue: asyncio.Queue
     me_too_reminders: dict[int, dict]
     clicked_me_too_reminder: dict[int, set[int]]
     reminder_emoji: str
@@ -34,6 +55,18 @@ class MixinMeta(ABC):
     def relativedelta_to_dict(relative_delta: relativedelta) -> dict[str, int]:
         raise NotImplementedError()
 
+    @abstractmethod
+    async def switch_reminder_store(self, backend: str) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def configure_metrics_exporter(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def resize_send_workers(self, count: int) -> None:
+        raise NotImplementedError
+
     @abstractmethod
     async def send_too_many_message(self, ctx_or_user: commands.Context | discord.User, maximum: int = -1) -> None:
         raise NotImplementedError
@@ -8,13 +8,14 @@ from contextlib import suppress
 from dateutil.relativedelta import relativedelta
 from pyparsing import ParseException
 from redbot.core import commands
-from redbot.core.config import Group
 from redbot.core.utils.chat_formatting import error
 from redbot.core.utils.predicates import MessagePredicate
 from typing import Any, Optional
 
 from .abc import MixinMeta
 from .pcx_lib import delete, embed_splitter, reply
+from .reminder_parse import ReminderParseTooExpensiveError
+from .store import ReminderChanges
 
 class ReminderCommands(MixinMeta, ABC):
     """Commands for the average user."""
@@ -32,30 +33,32 @@ class ReminderCommands(MixinMeta, ABC):
         `added` for ordering by when the reminder was added,
         `id` for ordering by ID
         """
-        # Grab users reminders and format them so that we can see the user_reminder_id
-        author = ctx.message.author
-        user_reminders = []
-        user_reminders_dict = await self.config.custom("REMINDER", str(author.id)).all()  # Does NOT return default values
-        for user_reminder_id, reminder in user_reminders_dict.items():
-            reminder.update({"user_reminder_id": int(user_reminder_id)})
-            user_reminders.append(reminder)
-
         # Check if they actually have any reminders
-        if not user_reminders:
+        author = ctx.message.author
+        if not self.reminder_index.count(author.id):
             await reply(ctx, "You don't have any upcoming reminders.")
             return
 
-        # Sort the reminders
+        # Get their reminder IDs in order (the index already has them sorted)
         if sort == "time":
-            user_reminders.sort(key=lambda reminder_info: reminder_info["expires"])
+            user_reminder_ids = self.reminder_index.ids_by_expiry(author.id)
         elif sort == "added":
-            pass
+            user_reminder_ids = self.reminder_index.ids(author.id)
         elif sort == "id":
-            user_reminders.sort(key=lambda reminder_info: reminder_info["user_reminder_id"])
+            user_reminder_ids = sorted(self.reminder_index.ids(author.id))
         else:
             await reply(ctx, "That is not a valid sorting option. Choose from `time` (default), `added`, or `id`.")
             return
 
+        # Grab users reminders (all at once) and format them so that we can see the user_reminder_id
+        users_reminders = await self.reminder_store.get_user(author.id)
+        user_reminders = []
+        for user_reminder_id in user_reminder_ids:
+            reminder = users_reminders.get(user_reminder_id)
+            if reminder and reminder["expires"]:
+                reminder.update({"user_reminder_id": user_reminder_id})
+                user_reminders.append(reminder)
+
         # Make a pretty embed listing the reminders
         embed = discord.Embed(title=f"Reminders for {author.display_name}", color=await ctx.embed_color())
         if author.avatar is None:
@@ -65,15 +68,7 @@ class ReminderCommands(MixinMeta, ABC):
             if author.avatar.is_animated() is False:
                 url += "&quality=lossless"
         embed.set_thumbnail(url=url)
-        for reminder in user_reminders:
-            reminder_title = (f"ID# {reminder['user_reminder_id']} — <t:{reminder['expires']}:f>")
-            if reminder.get("repeat"):
-                reminder_title += f", repeating every {self.humanize_relativedelta(reminder['repeat'])}"
-            reminder_text = reminder["text"]
-            if reminder.get("jump_link"):
-                reminder_text += f"\n([original message]({reminder['jump_link']}))"
-            reminder_text = reminder_text or "(no reminder text or jump link)"
-            embed.add_field(name=reminder_title, value=reminder_text, inline=False)
+        self._add_reminder_list_fields(embed, user_reminders)
         try:
             await embed_splitter(ctx, embed)
             if ctx.guild:
@@ -98,8 +93,8 @@ class ReminderCommands(MixinMeta, ABC):
     @modify.command()
     async def time(self, ctx: commands.Context, reminder_id: int, *, time: str) -> None:
         """Modify the time of an existing reminder."""
-        config_reminder = await self._get_reminder_config_group(ctx, ctx.message.author.id, reminder_id)
-        if not config_reminder:
+        reminder = await self._get_reminder(ctx, ctx.message.author.id, reminder_id)
+        if not reminder:
             return
 
         # Parse users reminder time and text
@@ -108,16 +103,17 @@ class ReminderCommands(MixinMeta, ABC):
             return
 
         # Save new values
-        await config_reminder.created.set(parse_result["created_timestamp_int"])
-        await config_reminder.expires.set(parse_result["expires_timestamp_int"])
+        changes = ReminderChanges(ctx.message.author.id, reminder_id).set(created=parse_result["created_timestamp_int"], expires=parse_result["expires_timestamp_int"])
         if parse_result["repeat_delta"]:
-            await config_reminder.repeat.set(self.relativedelta_to_dict(parse_result["repeat_delta"]))
+            changes.set(repeat=self.relativedelta_to_dict(parse_result["repeat_delta"]))
+        await self.reminder_store.apply([changes])
+        changes.apply_to(reminder)
 
         # Notify background task
-        await self.update_bg_task(ctx.message.author.id, reminder_id, await config_reminder.all())
+        await self.update_bg_task(ctx.message.author.id, reminder_id, reminder)
 
-        # Pull repeat dict from config in case we didn't update it
-        repeat_dict = await config_reminder.repeat()
+        # Use the existing repeat dict in case we didn't update it
+        repeat_dict = reminder["repeat"]
         # Send confirmation message
         message = f"Reminder with ID# **{reminder_id}** will remind you in {self.humanize_relativedelta(parse_result['expires_delta'])} from now (<t:{parse_result['expires_timestamp_int']}:f>)"
         if repeat_dict:
@@ -129,17 +125,17 @@ class ReminderCommands(MixinMeta, ABC):
     @modify.command()
     async def repeat(self, ctx: commands.Context, reminder_id: int, *, time: str) -> None:
         """Modify the repeating time of an existing reminder. Pass "0" to <time> in order to disable repeating."""
-        config_reminder = await self._get_reminder_config_group(ctx, ctx.message.author.id, reminder_id)
-        if not config_reminder:
+        reminder = await self._get_reminder(ctx, ctx.message.author.id, reminder_id)
+        if not reminder:
             return
 
         # Check for repeat cancel
         if time.lower() in ["0", "stop", "none", "false", "no", "cancel", "n"]:
-            await config_reminder.repeat.clear()
+            await self.reminder_store.update(ctx.message.author.id, reminder_id, repeat={})
             await reply(
                 ctx,
                 f"Reminder with ID# **{reminder_id}** will not repeat anymore. "
-                f"The final reminder will be sent <t:{await config_reminder.expires()}:f>.",
+                f"The final reminder will be sent <t:{reminder['expires']}:f>.",
             )
         else:
             # Parse users reminder time and text
@@ -148,20 +144,19 @@ class ReminderCommands(MixinMeta, ABC):
                 return
 
             # Save new value
-            await config_reminder.repeat.set(self.relativedelta_to_dict(parse_result["expires_delta"]))
+            await self.reminder_store.update(ctx.message.author.id, reminder_id, repeat=self.relativedelta_to_dict(parse_result["expires_delta"]))
 
             await reply(
                 ctx,
                 f"Reminder with ID# **{reminder_id}** will now remind you "
                 f"every {self.humanize_relativedelta(parse_result['expires_delta'])}, with the first reminder being sent "
-                f"<t:{await config_reminder.expires()}:f>.",
+                f"<t:{reminder['expires']}:f>.",
             )
 
     @modify.command()
     async def text(self, ctx: commands.Context, reminder_id: int, *, text: str) -> None:
         """Modify the text of an existing reminder."""
-        config_reminder = await self._get_reminder_config_group(ctx, ctx.message.author.id, reminder_id)
-        if not config_reminder:
+        if not await self._get_reminder(ctx, ctx.message.author.id, reminder_id):
             return
 
         text = text.strip()
@@ -169,7 +164,7 @@ class ReminderCommands(MixinMeta, ABC):
             await reply(ctx, "Your reminder text is too long.")
             return
 
-        await config_reminder.text.set(text)
+        await self.reminder_store.update(ctx.message.author.id, reminder_id, text=text)
         await reply(ctx, f"Reminder with ID# **{reminder_id}** has been edited successfully.")
 
     @reminder.command(aliases=["delete", "del"])
@@ -219,8 +214,7 @@ class ReminderCommands(MixinMeta, ABC):
         # Check that user is allowed to make a new reminder
         author = ctx.message.author
         maximum = await self.config.max_user_reminders()
-        users_reminders = await self.config.custom("REMINDER", str(author.id)).all()  # Does NOT return default values
-        if len(users_reminders) > maximum - 1:
+        if self.reminder_index.count(author.id) > maximum - 1:
             await self.send_too_many_message(ctx, maximum)
             return
 
@@ -267,6 +261,7 @@ class ReminderCommands(MixinMeta, ABC):
                 f"If anyone else would like {'these reminders' if parse_result['repeat_delta'] else 'to be reminded'} as well, "
                 "click the bell below!"
             )
+            self.trace.record("me_too", m=self.trace.pseudonym(query.id), g=self.trace.pseudonym(ctx.guild.id))
             self.me_too_reminders[query.id] = new_reminder
             self.clicked_me_too_reminder[query.id] = {author.id}
             await query.add_reaction(self.reminder_emoji)
@@ -282,8 +277,7 @@ class ReminderCommands(MixinMeta, ABC):
         author = ctx.message.author
 
         if index == "all":
-            all_users_reminders = self.config.custom("REMINDER", str(author.id))
-            if not await all_users_reminders.all():
+            if not self.reminder_index.count(author.id):
                 await reply(ctx, "You don't have any upcoming reminders.")
                 return
 
@@ -297,20 +291,19 @@ class ReminderCommands(MixinMeta, ABC):
             else:
                 await reply(ctx, "I have left your reminders alone.")
                 return
-            await all_users_reminders.clear()
+            await self.reminder_store.delete_user(author.id)
             # Notify background task
             await self.update_bg_task(author.id)
             await reply(ctx, "All of your reminders have been removed.")
             return
 
         if index == "last":
-            all_users_reminders_dict = await self.config.custom("REMINDER", str(author.id)).all()
-            if not all_users_reminders_dict:
+            reminder_id_to_delete = self.reminder_index.last_id(author.id)
+            if reminder_id_to_delete is None:
                 await reply(ctx, "You don't have any upcoming reminders.")
                 return
 
-            reminder_id_to_delete = int(list(all_users_reminders_dict)[-1])
-            await self.config.custom("REMINDER", str(author.id), str(reminder_id_to_delete)).clear()
+            await self.reminder_store.delete(author.id, reminder_id_to_delete)
             # Notify background task
             await self.update_bg_task(author.id, reminder_id_to_delete)
             await reply(ctx, f"Your most recently created reminder (ID# **{reminder_id_to_delete}**) has been removed.")
@@ -322,28 +315,42 @@ class ReminderCommands(MixinMeta, ABC):
             await ctx.send_help()
             return
 
-        config_reminder = await self._get_reminder_config_group(ctx, author.id, int_index)
-        if not config_reminder:
+        if not await self._get_reminder(ctx, author.id, int_index):
             return
-        await config_reminder.clear()
+        await self.reminder_store.delete(author.id, int_index)
         # Notify background task
         await self.update_bg_task(author.id, int_index)
         await reply(ctx, f"Reminder with ID# **{int_index}** has been removed.")
 
-    async def _get_reminder_config_group(self, ctx: commands.Context, user_id: int, user_reminder_id: int) -> Group | None:
-        config_reminder = self.config.custom("REMINDER", str(user_id), str(user_reminder_id))
-        if not await config_reminder.expires():
+    def _add_reminder_list_fields(self, embed: discord.Embed, user_reminders: list[dict[str, Any]]) -> None:
+        """Add a field to a reminder list embed for each reminder."""
+        for reminder in user_reminders:
+            reminder_title = (f"ID# {reminder['user_reminder_id']} — <t:{reminder['expires']}:f>")
+            if reminder.get("repeat"):
+                reminder_title += f", repeating every {self.humanize_relativedelta(reminder['repeat'])}"
+            reminder_text = reminder["text"]
+            if reminder.get("jump_link"):
+                reminder_text += f"\n([original message]({reminder['jump_link']}))"
+            reminder_text = reminder_text or "(no reminder text or jump link)"
+            embed.add_field(name=reminder_title, value=reminder_text, inline=False)
+
+    async def _get_reminder(self, ctx: commands.Context, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        reminder = await self.reminder_store.get(user_id, user_reminder_id)
+        if not reminder or not reminder["expires"]:
             await reply(
                 ctx,
                 f"Reminder with ID# **{user_reminder_id}** does not exist! "
                 "Check the reminder list and verify you typed the correct ID#.",
             )
             return None
-        return config_reminder
+        return reminder
 
     async def _parse_time_text(self, ctx: commands.Context, time_and_optional_text: str, *, validate_text: bool = True) -> dict[str, Any] | None:
         try:
-            parse_result = self.reminder_parser.parse(time_and_optional_text.strip())
+            parse_result = await self.reminder_parser.parse_guarded(time_and_optional_text.strip())
+        except ReminderParseTooExpensiveError as too_expensive:
+            await reply(ctx, error(str(too_expensive)))
+            return None
         except ParseException:
             await reply(ctx, error("I couldn't understand the format of your reminder time and text."))
             return None
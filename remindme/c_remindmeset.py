@@ -1,7 +1,8 @@
 """Commands for [p]remindmeset."""
 from abc import ABC
 from redbot.core import checks, commands
-from redbot.core.utils.chat_formatting import success
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import error, success
 
 from .abc import MixinMeta
 from .pcx_lib import SettingDisplay
@@ -31,19 +32,18 @@ class RemindMeSetCommands(MixinMeta, ABC):
         if await ctx.bot.is_owner(ctx.author):
             global_section = SettingDisplay("Global Settings")
             global_section.add("Maximum reminders per user", await self.config.max_user_reminders())
+            global_section.add("Concurrent reminder sends", await self.config.send_workers())
+            global_section.add("Reminder send rate", f"{await self.config.send_rate():g} per second")
+            global_section.add("Reminder storage", await self.config.storage_backend())
+            if self.trace.recording:
+                global_section.add("Recording trace", f"{self.trace.events} events to {self.trace.path}")
+            exporting = [f"http://{self.metrics_exporter.HOST}:{self.metrics_exporter.port}/metrics"] if self.metrics_exporter.port else []
+            if self.metrics_exporter.path:
+                exporting.append(str(self.metrics_exporter.path))
+            global_section.add("Prometheus metrics", ", ".join(exporting) or "Off")
 
-            non_repeating_reminders = 0
-            repeating_reminders = 0
-            all_reminders = await self.config.custom(
-                "REMINDER"
-            ).all()  # Does NOT return default values
-            for users_reminders in all_reminders.values():
-                for reminder in users_reminders.values():
-                    if reminder.get("repeat"):
-                        repeating_reminders += 1
-                    else:
-                        non_repeating_reminders += 1
-            pending_reminders_message = (f"{non_repeating_reminders + repeating_reminders}")
+            pending_reminders, repeating_reminders = await self.reminder_store.count()
+            pending_reminders_message = f"{pending_reminders}"
             if repeating_reminders:
                 pending_reminders_message += (
                     f" ({repeating_reminders} "
@@ -52,7 +52,33 @@ class RemindMeSetCommands(MixinMeta, ABC):
 
             stats_section = SettingDisplay("Stats")
             stats_section.add("Pending reminders", pending_reminders_message)
-            stats_section.add("Total reminders sent", await self.config.total_sent())
+            stats_section.add("Total reminders sent", await self.total_sent.get())
+
+            send_limiter = self.send_limiter
+            send_rate_message = f"{send_limiter.effective_rate:.3g} per second"
+            paused_for = send_limiter.paused_for()
+            if paused_for:
+                send_rate_message += f" (paused for {paused_for:.1f}s)"
+            stats_section.add("Current send rate", send_rate_message)
+            stats_section.add("Sends available", f"{max(0, int(send_limiter.tokens()))}/{int(send_limiter.capacity)}")
+            stats_section.add("Times rate limited", send_limiter.rate_limited_count)
+            for lane in self.send_lanes.LANES:
+                lane_stats = self.send_lanes.stats[lane]
+                stats_section.add(
+                    f"Waiting {lane} sends",
+                    f"{self.send_lanes.depth(lane)} (average wait {lane_stats.average_wait:.2f}s, longest {lane_stats.max_wait:.2f}s)",
+                )
+            parse_stats = self.reminder_parser.stats
+            for path in (parse_stats.FAST, parse_stats.PYPARSING):
+                stats_section.add(
+                    f"Parsed by {path} path",
+                    f"{parse_stats.count[path]} (average {parse_stats.average_seconds(path) * 1000:.2f}ms, longest {parse_stats.max_seconds[path] * 1000:.2f}ms)",
+                )
+            stats_section.add("Parses answered from cache", parse_stats.cache_hits)
+            stats_section.add(
+                "Rejected parses",
+                ", ".join(f"{count} {reason.replace('_', ' ')}" for reason, count in parse_stats.rejected.items()),
+            )
 
             await ctx.send(server_section.display(global_section, stats_section))
 
@@ -77,4 +103,144 @@ class RemindMeSetCommands(MixinMeta, ABC):
     async def set_max(self, ctx: commands.Context, maximum: int) -> None:
         """Global: Set the maximum number of reminders a user can create at one time."""
         await self.config.max_user_reminders.set(maximum)
-        await ctx.send(success(f"Maximum reminders per user is now set to {await self.config.max_user_reminders()}"))
\ No newline at end of file
+        await ctx.send(success(f"Maximum reminders per user is now set to {await self.config.max_user_reminders()}"))
+
+    @remindmeset.command(name="workers")
+    @checks.is_owner()
+    async def set_workers(self, ctx: commands.Context, workers: int) -> None:
+        """Global: Set how many reminders can be sent out at the same time."""
+        if workers < 1:
+            await ctx.send(error("There must be at least 1 reminder sender."))
+            return
+        await self.config.send_workers.set(workers)
+        self.resize_send_workers(workers)
+        await ctx.send(success(f"Up to {workers} reminder{'' if workers == 1 else 's'} will now be sent out at the same time."))
+
+    @remindmeset.command(name="rate")
+    @checks.is_owner()
+    async def set_rate(self, ctx: commands.Context, per_second: float) -> None:
+        """Global: Set how many reminders can be sent out per second.
+
+        If Discord starts rate limiting the bot anyway, reminders will automatically be sent out slower for a while.
+        """
+        if per_second <= 0:
+            await ctx.send(error("The send rate must be greater than 0."))
+            return
+        await self.config.send_rate.set(per_second)
+        self.send_limiter.set_rate(per_second)
+        await ctx.send(success(f"Up to {per_second:g} reminder{'' if per_second == 1 else 's'} will now be sent out per second."))
+
+    @remindmeset.command(name="storage")
+    @checks.is_owner()
+    async def set_storage(self, ctx: commands.Context, backend: str) -> None:
+        """Global: Choose where reminders are stored.
+
+        `<backend>` can either be:
+        `config` (default) to keep reminders in Red's config, alongside all of your other cog data
+        `sqlite` to keep reminders in their own SQLite database, which scales much better to large amounts of reminders
+
+        All existing reminders will be moved over to the new storage. Any that come due while that happens are sent once it is done.
+        """
+        backend = backend.lower()
+        if backend not in ("config", "sqlite"):
+            await ctx.send(error("That is not a valid storage backend. Choose from `config` or `sqlite`."))
+            return
+        if backend == await self.config.storage_backend():
+            await ctx.send(error(f"Reminders are already stored in `{backend}`."))
+            return
+        if self.legacy_migration:
+            await ctx.send(error("Reminders from an older version of RemindMe are still being migrated. Try again once that is done."))
+            return
+        async with ctx.typing():
+            moved = await self.switch_reminder_store(backend)
+        await ctx.send(success(f"Moved {moved} reminder{'' if moved == 1 else 's'} over to `{backend}` storage."))
+
+    @remindmeset.command(name="trace")
+    @checks.is_owner()
+    async def set_trace(self, ctx: commands.Context, enabled: bool) -> None:  # noqa: FBT001
+        """Global: Start or stop recording a trace of commands, reactions, and reminder sends.
+
+        The trace can be replayed offline (see the `devtools` folder in the repository) to profile real traffic.
+        Nothing users type is recorded: user IDs are swapped out for pseudonyms, and reminder text is left out.
+        A new trace file is started every time recording is turned on.
+        """
+        if enabled:
+            path = self.trace.start(cog_data_path(self) / "traces", self)
+            await ctx.send(success(f"Recording a trace to `{path}`."))
+            return
+        if not self.trace.recording:
+            await ctx.send(error("I am not recording a trace."))
+            return
+        self.trace.stop()
+        await ctx.send(success(f"Stopped recording. The trace ({self.trace.events} events) is at `{self.trace.path}`."))
+
+    @remindmeset.command()
+    @checks.is_owner()
+    async def stats(self, ctx: commands.Context) -> None:
+        """Global: Show how late and how slow sending reminders has been since the cog was loaded.
+
+        Lateness is how long after a reminder was due it actually got sent.
+        These are also available to Prometheus, see `[p]remindmeset metricsport` and `[p]remindmeset metricsfile`.
+        """
+        delivery_section = SettingDisplay("Delivery Stats")
+        for name, (title, _, _, _) in self.metrics.HISTOGRAMS.items():
+            delivery_section.add(title, self.metrics.summarize(name))
+        current_section = SettingDisplay("Right Now")
+        current_section.add("Reminders scheduled", len(self.schedule))
+        current_section.add("Waiting for a send worker", self.send_queue.qsize())
+        current_section.add("Waiting to be retried", len(self.retry_queue))
+        await ctx.send(delivery_section.display(current_section))
+
+    @remindmeset.command(name="metricsport")
+    @checks.is_owner()
+    async def set_metrics_port(self, ctx: commands.Context, port: int) -> None:
+        """Global: Serve metrics for Prometheus to scrape on this port (0 to turn it off).
+
+        Metrics are only served locally, at `http://127.0.0.1:<port>/metrics`.
+        """
+        if not 0 <= port <= 65535:  # noqa: PLR2004
+            await ctx.send(error("That is not a valid port."))
+            return
+        await self.config.metrics_port.set(port)
+        await self.configure_metrics_exporter()
+        if not port:
+            await ctx.send(success("I am no longer serving metrics."))
+        elif self.metrics_exporter.port != port:
+            await ctx.send(error(f"I couldn't listen on port {port}, check your logs for details. I will try again the next time I am loaded."))
+        else:
+            await ctx.send(success(f"Serving metrics at `http://{self.metrics_exporter.HOST}:{port}/metrics`."))
+
+    @remindmeset.command(name="metricsfile")
+    @checks.is_owner()
+    async def set_metrics_file(self, ctx: commands.Context, enabled: bool) -> None:  # noqa: FBT001
+        """Global: Toggle writing metrics to a file every so often, in the Prometheus text format.
+
+        Point node_exporter's textfile collector at the cog's data folder to pick it up.
+        """
+        await self.config.metrics_file.set(enabled)
+        await self.configure_metrics_exporter()
+        if enabled:
+            await ctx.send(success(f"Writing metrics to `{self.metrics_exporter.path}`."))
+        else:
+            await ctx.send(success("I am no longer writing metrics to a file."))
+
+    @remindmeset.command(name="configstats")
+    @checks.is_owner()
+    async def config_stats(self, ctx: commands.Context, enabled: bool | None = None) -> None:
+        """Global: Show which commands and background tasks read and write the most Config data.
+
+        `[p]remindmeset configstats on` starts counting (from zero), and `off` stops.
+        Without either, shows the ones making the most reads and writes each time they run.
+        Counting costs a little, since everything read and written has to be measured.
+        """
+        if enabled is None:
+            if not self.config_access.totals:
+                await ctx.send(error("Nothing has been counted. Start counting with `[p]remindmeset configstats on`."))
+                return
+            await ctx.send(str(self.config_access.report()))
+        elif enabled:
+            self.config_access.start()
+            await ctx.send(success("Counting Config reads and writes."))
+        else:
+            self.config_access.stop()
+            await ctx.send(success("Stopped counting Config reads and writes."))
@@ -0,0 +1,355 @@
+"""Pacing and addressing of outbound reminder DMs for the RemindMe cog."""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+
+import discord
+from redbot.core.bot import Red
+
+
+class TokenBucket:
+    """A token bucket that paces reminder sends to a configurable rate.
+
+    The bucket holds up to a second's worth of sends, so short bursts go out right away.
+    Whenever Discord rate limits us anyway, the rate we actually send at is halved (down to
+    MIN_RATE_FACTOR of the configured rate) and sending pauses for as long as Discord asked.
+    Every successful send after that creeps the rate back up by RECOVERY_STEP, so bulk sending
+    settles just under whatever Discord will tolerate instead of repeatedly slamming into it.
+    """
+
+    MIN_RATE_FACTOR = 1 / 32
+    RECOVERY_STEP = 1 / 64
+    DEFAULT_PAUSE_SECONDS = 1.0
+
+    def __init__(self, rate: float, clock: Callable[[], float] | None = None) -> None:
+        """Init.
+
+        clock defaults to whatever time.monotonic is when this is created.
+        """
+        self._clock = clock or time.monotonic
+        self.rate = rate
+        self.rate_factor = 1.0
+        self.rate_limited_count = 0
+        self._tokens = self.capacity
+        self._updated = self._clock()
+        self._paused_until = 0.0
+
+    @property
+    def capacity(self) -> float:
+        """Get how many sends can burst out at once."""
+        return max(1.0, self.rate)
+
+    @property
+    def effective_rate(self) -> float:
+        """Get the rate (sends per second) we are currently sending at, after any backoff."""
+        return self.rate * self.rate_factor
+
+    def set_rate(self, rate: float) -> None:
+        """Change the configured rate (sends per second)."""
+        self._refill()
+        self.rate = rate
+        self._tokens = min(self._tokens, self.capacity)
+
+    def paused_for(self) -> float:
+        """Get how many seconds sending is paused for after being rate limited."""
+        return max(0.0, self._paused_until - self._clock())
+
+    def tokens(self) -> float:
+        """Get how many sends could go out right now."""
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available, returning 0. Otherwise, return how long to wait before trying again."""
+        paused_for = self.paused_for()
+        if paused_for > 0:
+            return paused_for
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.effective_rate
+
+    def debit(self) -> None:
+        """Take a token without waiting, ignoring any rate limit pause.
+
+        If there isn't one, it is borrowed from the future, which pushes back everything else
+        instead. At most a full bucket is ever owed, so past that nothing more is pushed back.
+        """
+        self._refill()
+        self._tokens = max(-self.capacity, self._tokens - 1)
+
+    def reserve(self) -> float:
+        """Take a token right away (going into debt if there isn't one), returning how long to wait before using it.
+
+        Everyone after has to wait for the debt to be paid off first, so reserved sends still go
+        out in order, at the current rate.
+        """
+        self._refill()
+        self._tokens -= 1
+        return self.paused_for() + max(0.0, -self._tokens) / self.effective_rate
+
+    async def acquire(self) -> None:
+        """Wait until we are allowed to send."""
+        wait = self.reserve()
+        if not wait:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Give back the token we won't be using
+            self._tokens += 1
+            raise
+
+    def succeeded(self) -> None:
+        """Record a successful send, recovering the rate a bit if we had backed off."""
+        self.rate_factor = min(1.0, self.rate_factor + self.RECOVERY_STEP)
+
+    def rate_limited(self, retry_after: float | None = None) -> None:
+        """Record that Discord rate limited us, backing off and pausing for retry_after seconds."""
+        self.rate_limited_count += 1
+        self.rate_factor = max(self.MIN_RATE_FACTOR, self.rate_factor / 2)
+        self._refill()
+        # Any debt still has to be paid off after the pause
+        self._tokens = min(self._tokens, 0.0)
+        self._paused_until = max(
+            self._paused_until,
+            self._clock() + (retry_after or self.DEFAULT_PAUSE_SECONDS),
+        )
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last refill (none are earned while paused)."""
+        now = self._clock()
+        earning_since = max(self._updated, self._paused_until)
+        if now > earning_since:
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - earning_since) * self.effective_rate,
+            )
+        self._updated = now
+
+
+class LaneStats:
+    """How long sends have had to wait in a lane."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.sent = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        """Get the average time a send has waited in this lane."""
+        return self.total_wait / self.sent if self.sent else 0.0
+
+    def record(self, wait: float) -> None:
+        """Record a send that waited for wait seconds."""
+        self.sent += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class SendLanes:
+    """Hands out the token bucket's sends: right away for interactive senders, and in turn for bulk ones.
+
+    Interactive sends (command replies) never wait. They take a token if there is one, or
+    borrow it from the future (see TokenBucket.debit), which pushes back the bulk sends
+    (reminder DMs) instead. Bulk sends wait in line for the bucket, one after the other.
+    """
+
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+    LANES = (INTERACTIVE, BULK)
+
+    def __init__(
+        self, limiter: TokenBucket, clock: Callable[[], float] | None = None
+    ) -> None:
+        """Init.
+
+        clock defaults to whatever time.monotonic is when this is created.
+        """
+        self.limiter = limiter
+        self._clock = clock or time.monotonic
+        # Bulk sends waiting for the bucket, as (when they started waiting, waiter)
+        self._waiting: deque[tuple[float, asyncio.Future]] = deque()
+        self.stats = {lane: LaneStats() for lane in self.LANES}
+        self._dispatcher: asyncio.Task | None = None
+
+    def depth(self, lane: str) -> int:
+        """Get how many sends are waiting in a lane."""
+        return len(self._waiting) if lane == self.BULK else 0
+
+    async def acquire(self, lane: str) -> None:
+        """Wait until a send in this lane is allowed to go out."""
+        if lane == self.INTERACTIVE:
+            self.limiter.debit()
+            self.stats[lane].record(0.0)
+            return
+        enqueued = self._clock()
+        if not self._waiting and self.limiter.try_acquire() == 0:
+            self.stats[lane].record(0.0)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (enqueued, waiter)
+        self._waiting.append(entry)
+        if not self._dispatcher:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+            raise
+        self.stats[lane].record(self._clock() - enqueued)
+
+    def close(self) -> None:
+        """Stop handing out sends."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    async def _dispatch(self) -> None:
+        """Hand out sends to bulk waiters as the token bucket allows."""
+        try:
+            while self._waiting:
+                _, waiter = self._waiting[0]
+                if waiter.done():
+                    self._waiting.popleft()  # Cancelled
+                    continue
+                wait = self.limiter.try_acquire()
+                if wait > 0:
+                    # Interactive sends may borrow more in the meantime, so check again after
+                    await asyncio.sleep(wait)
+                    continue
+                self._waiting.popleft()
+                waiter.set_result(None)
+        finally:
+            self._dispatcher = None
+
+
+class UserResolver:
+    """Finds the users that reminders are for (and their DM channels) with as few API calls as possible.
+
+    Users are looked up in the bot's cache first. Bots without the members intent won't have
+    most users cached, so failing that, they are fetched from the API (a few at a time, paced by
+    their own token bucket) and kept in an LRU cache. DM channels are kept in an LRU cache too, so
+    sending to a user doesn't mean creating their DM channel again. Users that can't be reached
+    (they don't exist, or don't accept DMs from us) are remembered for UNREACHABLE_TTL_SECONDS,
+    so any other reminders for them fail right away without making any API calls.
+    """
+
+    MAX_USERS = 10000
+    MAX_DM_CHANNELS = 10000
+    MAX_UNREACHABLE = 10000
+    UNREACHABLE_TTL_SECONDS = 3600.0
+    MAX_CONCURRENT_FETCHES = 2
+    FETCH_RATE = 2.0
+
+    def __init__(self, bot: Red, clock: Callable[[], float] | None = None) -> None:
+        """Init.
+
+        clock defaults to whatever time.monotonic is when this is created.
+        """
+        self.bot = bot
+        self._clock = clock or time.monotonic
+        self._users: OrderedDict[int, discord.User] = OrderedDict()
+        self._dm_channels: OrderedDict[int, discord.DMChannel] = OrderedDict()
+        self._unreachable: OrderedDict[int, float] = OrderedDict()
+        self._fetch_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_FETCHES)
+        self._fetch_limiter = TokenBucket(self.FETCH_RATE, self._clock)
+        self.fetched = 0
+
+    def is_unreachable(self, user_id: int) -> bool:
+        """Check if a user was recently found to be unreachable."""
+        unreachable_until = self._unreachable.get(user_id)
+        if unreachable_until is None:
+            return False
+        if unreachable_until > self._clock():
+            return True
+        del self._unreachable[user_id]
+        return False
+
+    def mark_unreachable(self, user_id: int) -> None:
+        """Remember that a user can't be reached (for a while)."""
+        self._remember(
+            self._unreachable,
+            user_id,
+            self._clock() + self.UNREACHABLE_TTL_SECONDS,
+            self.MAX_UNREACHABLE,
+        )
+        self._users.pop(user_id, None)
+        self._dm_channels.pop(user_id, None)
+
+    def forget(self, user_id: int) -> None:
+        """Forget everything about a user."""
+        self._users.pop(user_id, None)
+        self._dm_channels.pop(user_id, None)
+        self._unreachable.pop(user_id, None)
+
+    async def resolve(self, user_id: int) -> discord.User | None:
+        """Get a user, or None if they can't be reached.
+
+        Raises discord.HTTPException if they had to be fetched, and fetching them failed.
+        """
+        if self.is_unreachable(user_id):
+            return None
+        user = self.bot.get_user(user_id) or self._cached_user(user_id)
+        if user:
+            return user
+        async with self._fetch_semaphore:
+            # Someone else may have fetched them while we were waiting
+            user = self._cached_user(user_id)
+            if user:
+                return user
+            if self.is_unreachable(user_id):
+                return None
+            await self._fetch_limiter.acquire()
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                self.mark_unreachable(user_id)
+                return None
+            self.fetched += 1
+        self._remember(self._users, user_id, user, self.MAX_USERS)
+        return user
+
+    async def dm_channel(self, user: discord.User) -> discord.DMChannel:
+        """Get the DM channel for a user, creating it if needed."""
+        channel = self._dm_channels.get(user.id)
+        if channel:
+            self._dm_channels.move_to_end(user.id)
+            return channel
+        channel = user.dm_channel or await user.create_dm()
+        self._remember(self._dm_channels, user.id, channel, self.MAX_DM_CHANNELS)
+        return channel
+
+    def _cached_user(self, user_id: int) -> discord.User | None:
+        """Get a previously fetched user."""
+        user = self._users.get(user_id)
+        if user:
+            self._users.move_to_end(user_id)
+        return user
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: int, value: object, maximum: int) -> None:
+        """Put something in an LRU cache, evicting the least recently used entries past maximum."""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > maximum:
+            cache.popitem(last=False)
+
+
+def rate_limit_retry_after(http_exception: discord.HTTPException) -> float | None:
+    """Check if an HTTPException is Discord rate limiting us.
+
+    Returns None if not, otherwise how many seconds Discord asked us to wait (0 if it didn't say).
+    """
+    if http_exception.status != 429:  # noqa: PLR2004
+        return None
+    try:
+        return float(http_exception.response.headers.get("Retry-After", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,227 @@
+"""Unit tests for reminder delivery pacing."""
+
+import asyncio
+import unittest
+
+import delivery
+import discord
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        """Init."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict | None = None) -> None:
+        """Init."""
+        self.status = status
+        self.reason = "Too Many Requests"
+        self.headers = headers or {}
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_paced(self):
+        clock = FakeClock()
+        bucket = delivery.TokenBucket(4, clock)
+        for _ in range(4):
+            assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0.25
+        clock.now += 0.25
+        assert bucket.try_acquire() == 0
+
+    def test_slow_rate_still_allows_one(self):
+        clock = FakeClock()
+        bucket = delivery.TokenBucket(0.5, clock)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 2
+        clock.now += 2
+        assert bucket.try_acquire() == 0
+
+    def test_rate_limited_pauses_and_backs_off(self):
+        clock = FakeClock()
+        bucket = delivery.TokenBucket(4, clock)
+        bucket.rate_limited(3)
+        assert bucket.effective_rate == 2
+        assert bucket.try_acquire() == 3
+        clock.now += 3
+        assert bucket.try_acquire() == 0.5
+        assert bucket.rate_limited_count == 1
+
+    def test_reserve_takes_tokens_on_credit(self):
+        clock = FakeClock()
+        bucket = delivery.TokenBucket(2, clock)
+        assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1]
+        assert bucket.try_acquire() == 1.5
+        bucket.rate_limited(2)
+        # Backed off to 1 per second, after the pause
+        assert bucket.reserve() == 2 + 3
+        clock.now += 5
+        assert bucket.try_acquire() == 1
+
+    def test_backoff_floor_and_recovery(self):
+        bucket = delivery.TokenBucket(4, FakeClock())
+        for _ in range(20):
+            bucket.rate_limited(0)
+        assert bucket.rate_factor == bucket.MIN_RATE_FACTOR
+        for _ in range(100):
+            bucket.succeeded()
+        assert bucket.rate_factor == 1
+
+    def test_set_rate_caps_tokens(self):
+        bucket = delivery.TokenBucket(10, FakeClock())
+        bucket.set_rate(2)
+        assert bucket.tokens() == 2
+
+    def test_debit_borrows_and_ignores_pause(self):
+        clock = FakeClock()
+        bucket = delivery.TokenBucket(2, clock)
+        bucket.rate_limited(5)
+        for _ in range(5):
+            bucket.debit()
+        # Never more than a full bucket is owed
+        assert bucket.tokens() == -2
+        clock.now += 5
+        assert bucket.try_acquire() == 3
+
+
+class TestSendLanes(unittest.IsolatedAsyncioTestCase):
+    async def test_interactive_never_waits(self):
+        lanes = delivery.SendLanes(delivery.TokenBucket(20))
+        order = []
+
+        async def send(lane: str, name: str) -> None:
+            await lanes.acquire(lane)
+            order.append(name)
+
+        bulk = [asyncio.create_task(send(lanes.BULK, f"bulk{i}")) for i in range(30)]
+        await asyncio.sleep(0)
+        await send(lanes.INTERACTIVE, "interactive")
+        assert order[-1] == "interactive"
+        assert len(order) < 30
+        await asyncio.wait_for(asyncio.gather(*bulk), 2)
+        assert lanes.stats[lanes.BULK].sent == 30
+        assert lanes.stats[lanes.INTERACTIVE].max_wait == 0
+        assert lanes.depth(lanes.BULK) == 0
+
+    async def test_interactive_pushes_bulk_back(self):
+        clock = FakeClock()
+        lanes = delivery.SendLanes(delivery.TokenBucket(2, clock), clock)
+        for _ in range(100):
+            await lanes.acquire(lanes.INTERACTIVE)
+        assert lanes.stats[lanes.INTERACTIVE].sent == 100
+        # Only a bucket's worth is owed, so bulk sends wait for 3 tokens at most
+        assert lanes.limiter.try_acquire() == 1.5
+
+    async def test_cancelled_waiter(self):
+        lanes = delivery.SendLanes(delivery.TokenBucket(1))
+        await lanes.acquire(lanes.BULK)
+        waiter = asyncio.create_task(lanes.acquire(lanes.BULK))
+        await asyncio.sleep(0)
+        assert lanes.depth(lanes.BULK) == 1
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert lanes.depth(lanes.BULK) == 0
+        lanes.close()
+
+
+class FakeUser:
+    def __init__(self, user_id: int) -> None:
+        """Init."""
+        self.id = user_id
+        self.dm_channel = None
+        self.created_dms = 0
+
+    async def create_dm(self) -> str:
+        self.created_dms += 1
+        return f"dm{self.id}"
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        """Init."""
+        self.cached = {1: FakeUser(1)}
+        self.fetchable = {2: FakeUser(2)}
+        self.fetches = 0
+
+    def get_user(self, user_id: int) -> FakeUser | None:
+        return self.cached.get(user_id)
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        self.fetches += 1
+        if user_id not in self.fetchable:
+            raise discord.NotFound(FakeResponse(404), "Unknown User")
+        return self.fetchable[user_id]
+
+
+class TestUserResolver(unittest.IsolatedAsyncioTestCase):
+    async def test_cache_then_fetch(self):
+        bot = FakeBot()
+        resolver = delivery.UserResolver(bot)
+        assert (await resolver.resolve(1)).id == 1
+        assert bot.fetches == 0
+        assert (await resolver.resolve(2)).id == 2
+        assert (await resolver.resolve(2)).id == 2
+        assert bot.fetches == 1
+
+    async def test_negative_cache(self):
+        bot = FakeBot()
+        clock = FakeClock()
+        resolver = delivery.UserResolver(bot, clock)
+        assert await resolver.resolve(3) is None
+        assert await resolver.resolve(3) is None
+        assert bot.fetches == 1
+        resolver.mark_unreachable(1)
+        assert await resolver.resolve(1) is None
+        clock.now += resolver.UNREACHABLE_TTL_SECONDS
+        assert (await resolver.resolve(1)).id == 1
+
+    async def test_concurrent_fetches_share(self):
+        bot = FakeBot()
+        resolver = delivery.UserResolver(bot)
+        users = await asyncio.gather(*(resolver.resolve(2) for _ in range(5)))
+        assert all(user.id == 2 for user in users)
+        assert bot.fetches == 1
+
+    async def test_dm_channel_lru(self):
+        resolver = delivery.UserResolver(FakeBot())
+        resolver.MAX_DM_CHANNELS = 2
+        users = [FakeUser(user_id) for user_id in range(3)]
+        assert await resolver.dm_channel(users[0]) == "dm0"
+        await resolver.dm_channel(users[0])
+        assert users[0].created_dms == 1
+        await resolver.dm_channel(users[1])
+        await resolver.dm_channel(users[2])
+        await resolver.dm_channel(users[0])
+        assert users[0].created_dms == 2
+
+
+class TestRateLimitRetryAfter(unittest.TestCase):
+    def test_not_rate_limited(self):
+        assert (
+            delivery.rate_limit_retry_after(
+                discord.HTTPException(FakeResponse(500), "boom")
+            )
+            is None
+        )
+
+    def test_rate_limited(self):
+        http_exception = discord.HTTPException(
+            FakeResponse(429, {"Retry-After": "1.5"}), "slow down"
+        )
+        assert delivery.rate_limit_retry_after(http_exception) == 1.5
+        assert (
+            delivery.rate_limit_retry_after(
+                discord.HTTPException(FakeResponse(429), "slow down")
+            )
+            == 0
+        )
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
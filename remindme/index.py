@@ -0,0 +1,161 @@
+"""In-memory per-user reminder index for the RemindMe cog."""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+
+
+class UserReminders:
+    """The reminder IDs of one user, in creation order and in expiry order, plus a free ID allocator.
+
+    Everything is kept in compact arrays rather than dicts and lists of ints, as there is one
+    of these for every user with reminders. Users only have a handful of reminders each, so the
+    linear searches this needs are cheap.
+    """
+
+    __slots__ = ("created_order", "expires", "holes", "ids", "next_id")
+
+    def __init__(self) -> None:
+        """Init."""
+        # Every user_reminder_id, in creation order (including ones still being created)
+        self.created_order = array("I")
+        # user_reminder_id and expires of every created reminder, soonest expiring first
+        self.ids = array("I")
+        self.expires = array("q")
+        # Unused IDs below next_id, lowest first (may contain IDs that have since been used again)
+        self.holes: list[int] | None = None
+        self.next_id = 1
+
+    def __len__(self) -> int:
+        """Count how many reminders there are."""
+        return len(self.created_order)
+
+    def __contains__(self, user_reminder_id: int) -> bool:
+        """Check if a reminder exists."""
+        return user_reminder_id in self.created_order
+
+    def allocate(self) -> int:
+        """Claim the lowest unused ID."""
+        while self.holes:
+            user_reminder_id = heapq.heappop(self.holes)
+            if user_reminder_id not in self.created_order:
+                self.created_order.append(user_reminder_id)
+                return user_reminder_id
+        user_reminder_id = self.next_id
+        self.next_id += 1
+        self.created_order.append(user_reminder_id)
+        return user_reminder_id
+
+    def set(self, user_reminder_id: int, expires: int | None) -> None:
+        """Add a reminder, or change when it expires."""
+        if user_reminder_id in self.created_order:
+            self._unsort(user_reminder_id)
+        else:
+            self.created_order.append(user_reminder_id)
+        if expires is not None:
+            position = bisect_left(self.expires, expires)
+            while (
+                position < len(self.ids)
+                and self.expires[position] == expires
+                and self.ids[position] < user_reminder_id
+            ):
+                position += 1
+            self.expires.insert(position, expires)
+            self.ids.insert(position, user_reminder_id)
+        if user_reminder_id > self.next_id:
+            self.holes = self.holes or []
+            for hole in range(self.next_id, user_reminder_id):
+                heapq.heappush(self.holes, hole)
+        self.next_id = max(self.next_id, user_reminder_id + 1)
+
+    def remove(self, user_reminder_id: int) -> bool:
+        """Remove a reminder, freeing up its ID. Returns True if it existed."""
+        if user_reminder_id not in self.created_order:
+            return False
+        self.created_order.remove(user_reminder_id)
+        self._unsort(user_reminder_id)
+        self.holes = self.holes or []
+        heapq.heappush(self.holes, user_reminder_id)
+        return True
+
+    def _unsort(self, user_reminder_id: int) -> None:
+        """Remove a reminder from the expiry ordered view."""
+        if user_reminder_id in self.ids:
+            position = self.ids.index(user_reminder_id)
+            del self.ids[position]
+            del self.expires[position]
+
+
+class ReminderIndex:
+    """Every user's reminder IDs, so that creating and listing reminders doesn't need to read all of a user's reminders."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self._users: dict[int, UserReminders] = {}
+
+    def build(self, entries: Iterable[tuple[int, int, int]]) -> None:
+        """Replace the whole index with (expires, user_id, user_reminder_id) entries, given in creation order."""
+        self._users = {}
+        for expires, user_id, user_reminder_id in entries:
+            self._users.setdefault(user_id, UserReminders()).set(
+                user_reminder_id, expires
+            )
+
+    def entries(self) -> Iterator[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, in creation order (as build() takes them)."""
+        for user_id, user_reminders in self._users.items():
+            expires = dict(zip(user_reminders.ids, user_reminders.expires, strict=True))
+            for user_reminder_id in user_reminders.created_order:
+                if user_reminder_id in expires:
+                    yield expires[user_reminder_id], user_id, user_reminder_id
+
+    def count(self, user_id: int) -> int:
+        """Count how many reminders a user has."""
+        user_reminders = self._users.get(user_id)
+        return len(user_reminders) if user_reminders else 0
+
+    def ids(self, user_id: int) -> list[int]:
+        """Get a users reminder IDs, in the order they were created."""
+        user_reminders = self._users.get(user_id)
+        return list(user_reminders.created_order) if user_reminders else []
+
+    def ids_by_expiry(self, user_id: int) -> list[int]:
+        """Get a users reminder IDs, soonest expiring first."""
+        user_reminders = self._users.get(user_id)
+        return list(user_reminders.ids) if user_reminders else []
+
+    def last_id(self, user_id: int) -> int | None:
+        """Get a users most recently created reminder ID."""
+        user_reminders = self._users.get(user_id)
+        if not user_reminders:
+            return None
+        return user_reminders.created_order[-1]
+
+    def allocate(self, user_id: int) -> int:
+        """Claim the lowest unused reminder ID for a user. Follow up with set() (or remove() if it wasn't used)."""
+        return self._users.setdefault(user_id, UserReminders()).allocate()
+
+    def reserve(self, user_id: int, user_reminder_id: int) -> None:
+        """Claim a specific reminder ID (if it isn't already taken) for a reminder that will be set() later."""
+        user_reminders = self._users.setdefault(user_id, UserReminders())
+        if user_reminder_id not in user_reminders:
+            user_reminders.set(user_reminder_id, None)
+
+    def set(self, user_id: int, user_reminder_id: int, expires: int | None) -> None:
+        """Add a reminder, or change when it expires."""
+        self._users.setdefault(user_id, UserReminders()).set(user_reminder_id, expires)
+
+    def remove(self, user_id: int, user_reminder_id: int) -> None:
+        """Remove a reminder."""
+        user_reminders = self._users.get(user_id)
+        if (
+            user_reminders
+            and user_reminders.remove(user_reminder_id)
+            and not user_reminders
+        ):
+            del self._users[user_id]
+
+    def remove_user(self, user_id: int) -> None:
+        """Remove all of a users reminders."""
+        self._users.pop(user_id, None)
@@ -0,0 +1,88 @@
+"""Unit tests for the per-user reminder index."""
+
+import unittest
+
+import index
+
+
+class TestReminderIndex(unittest.TestCase):
+    def test_empty(self):
+        reminder_index = index.ReminderIndex()
+        assert reminder_index.count(1) == 0
+        assert reminder_index.ids(1) == []
+        assert reminder_index.ids_by_expiry(1) == []
+        assert reminder_index.last_id(1) is None
+
+    def test_build(self):
+        reminder_index = index.ReminderIndex()
+        reminder_index.build([(300, 1, 3), (100, 1, 1), (200, 2, 1), (200, 1, 5)])
+        assert reminder_index.count(1) == 3
+        assert reminder_index.ids(1) == [3, 1, 5]
+        assert reminder_index.ids_by_expiry(1) == [1, 5, 3]
+        assert reminder_index.last_id(1) == 5
+        assert reminder_index.count(2) == 1
+
+    def test_entries_round_trip(self):
+        entries = [(300, 1, 3), (100, 1, 1), (200, 2, 1), (200, 1, 5)]
+        reminder_index = index.ReminderIndex()
+        reminder_index.build(entries)
+        reminder_index.allocate(1)
+        assert sorted(reminder_index.entries()) == sorted(entries)
+        rebuilt = index.ReminderIndex()
+        rebuilt.build(reminder_index.entries())
+        assert rebuilt.ids(1) == [3, 1, 5]
+        assert rebuilt.allocate(1) == 2
+
+    def test_allocate_fills_holes_lowest_first(self):
+        reminder_index = index.ReminderIndex()
+        reminder_index.build([(100, 1, 2), (100, 1, 5)])
+        assert [reminder_index.allocate(1) for _ in range(4)] == [1, 3, 4, 6]
+        reminder_index.remove(1, 3)
+        reminder_index.remove(1, 1)
+        assert reminder_index.allocate(1) == 1
+        assert reminder_index.allocate(1) == 3
+        assert reminder_index.allocate(1) == 7
+
+    def test_allocate_counts_and_set(self):
+        reminder_index = index.ReminderIndex()
+        user_reminder_id = reminder_index.allocate(1)
+        assert reminder_index.count(1) == 1
+        assert reminder_index.ids_by_expiry(1) == []
+        reminder_index.set(1, user_reminder_id, 100)
+        assert reminder_index.ids_by_expiry(1) == [user_reminder_id]
+
+    def test_reserve(self):
+        reminder_index = index.ReminderIndex()
+        reminder_index.build([(100, 1, 1)])
+        reminder_index.reserve(1, 1)
+        reminder_index.reserve(1, 3)
+        assert reminder_index.ids_by_expiry(1) == [1]
+        assert reminder_index.allocate(1) == 2
+        assert reminder_index.allocate(1) == 4
+
+    def test_reschedule_keeps_creation_order(self):
+        reminder_index = index.ReminderIndex()
+        reminder_index.build([(100, 1, 1), (200, 1, 2), (300, 1, 3)])
+        reminder_index.set(1, 1, 400)
+        assert reminder_index.ids(1) == [1, 2, 3]
+        assert reminder_index.ids_by_expiry(1) == [2, 3, 1]
+        reminder_index.set(1, 1, 400)
+        assert reminder_index.ids_by_expiry(1) == [2, 3, 1]
+
+    def test_remove(self):
+        reminder_index = index.ReminderIndex()
+        reminder_index.build([(100, 1, 1), (200, 1, 2), (100, 2, 1)])
+        reminder_index.remove(1, 2)
+        reminder_index.remove(1, 9)
+        assert reminder_index.ids(1) == [1]
+        assert reminder_index.ids_by_expiry(1) == [1]
+        assert reminder_index.last_id(1) == 1
+        reminder_index.remove(1, 1)
+        assert reminder_index.count(1) == 0
+        reminder_index.remove_user(2)
+        assert reminder_index.ids(2) == []
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+"""Delivery metrics for the RemindMe cog, and exporting them in the Prometheus text format."""
+
+import asyncio
+import bisect
+import logging
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from pathlib import Path
+
+from aiohttp import web
+
+log = logging.getLogger("red.pcxcogs.remindme")
+
+
+class Histogram:
+    """Counts of (non-negative) observations, by which of a fixed set of buckets they fell in.
+
+    bounds are the inclusive upper bounds of the buckets, in increasing order. Anything bigger
+    than the last one goes in an overflow bucket. Quantiles are estimated by interpolating within
+    the bucket they fall in, like Prometheus does, so they are only as precise as the buckets.
+    """
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        """Init."""
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self) -> float:
+        """Get the mean of the observations."""
+        return self.sum / self.count if self.count else 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, quantile: float) -> float:
+        """Estimate the value that this fraction (0 to 1) of the observations are less than or equal to."""
+        rank = quantile * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(
+                    self.max, lower + (upper - lower) * (rank - cumulative) / count
+                )
+            cumulative += count
+        return self.max
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        """Get (upper bound, count of observations less than or equal to it) for every bucket, ending with infinity."""
+        result = []
+        cumulative = 0
+        for bound, count in zip((*self.bounds, float("inf")), self.counts, strict=True):
+            cumulative += count
+            result.append((bound, cumulative))
+        return result
+
+
+class DeliveryMetrics:
+    """Histograms of how late, slow, and backed up sending reminders has been since the cog was loaded."""
+
+    SECONDS = "seconds"
+    COUNT = "count"
+    # name -> (title, description, unit, bucket bounds)
+    HISTOGRAMS: Mapping[str, tuple[str, str, str, tuple[float, ...]]] = {
+        "send_lateness_seconds": (
+            "Send lateness",
+            "How late reminders were sent (when they were sent, minus when they were due).",
+            SECONDS,
+            (1, 5, 15, 30, 60, 120, 300, 900, 1800, 3600, 6 * 3600, 24 * 3600),
+        ),
+        "send_latency_seconds": (
+            "Send latency",
+            "How long sending a reminder DM took.",
+            SECONDS,
+            (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+        ),
+        "send_retries": (
+            "Retries per reminder",
+            "How many times a reminder was retried before it was sent (or given up on).",
+            COUNT,
+            (0, 1, 2, 3, 5, 10, 20),
+        ),
+        "send_queue_depth": (
+            "Send queue depth",
+            "How many reminders were waiting for a send worker, each time more were handed off.",
+            COUNT,
+            (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+        ),
+        "schedule_search_seconds": (
+            "Schedule search time",
+            "How long finding the reminders that are due took.",
+            SECONDS,
+            (0.00001, 0.0001, 0.001, 0.01, 0.1, 1),
+        ),
+    }
+
+    def __init__(self) -> None:
+        """Init."""
+        self.histograms = {
+            name: Histogram(bounds)
+            for name, (_, _, _, bounds) in self.HISTOGRAMS.items()
+        }
+
+    def observe(self, name: str, value: float) -> None:
+        """Record an observation in a histogram."""
+        self.histograms[name].observe(value)
+
+    def summarize(self, name: str) -> str:
+        """Describe a histogram in a line, for humans."""
+        histogram = self.histograms[name]
+        if not histogram.count:
+            return "None yet"
+        unit = self.HISTOGRAMS[name][2]
+        return (
+            f"{histogram.count} observed, median {self.format_value(histogram.quantile(0.5), unit)}, "
+            f"p90 {self.format_value(histogram.quantile(0.9), unit)}, p99 {self.format_value(histogram.quantile(0.99), unit)}, "
+            f"max {self.format_value(histogram.max, unit)}"
+        )
+
+    @staticmethod
+    def format_value(value: float, unit: str) -> str:
+        """Format a value for humans."""
+        if unit == DeliveryMetrics.COUNT:
+            return f"{value:.3g}"
+        if value < 1:
+            return f"{value * 1000:.3g}ms"
+        return f"{value:.3g}s"
+
+    def render_prometheus(
+        self, prefix: str, others: Mapping[str, tuple[str, str, float]] | None = None
+    ) -> str:
+        """Render every histogram (and any other metrics, as name -> (type, description, value)) in the Prometheus text format."""
+        lines = []
+        for name, (_, description, _, _) in self.HISTOGRAMS.items():
+            metric = prefix + name
+            lines.extend(
+                (f"# HELP {metric} {description}", f"# TYPE {metric} histogram")
+            )
+            histogram = self.histograms[name]
+            for bound, count in histogram.cumulative_counts():
+                lines.append(
+                    f'{metric}_bucket{{le="{"+Inf" if bound == float("inf") else f"{bound:g}"}"}} {count}'
+                )
+            lines.extend(
+                (f"{metric}_sum {histogram.sum:g}", f"{metric}_count {histogram.count}")
+            )
+        for name, (metric_type, description, value) in (others or {}).items():
+            metric = prefix + name
+            lines.extend(
+                (
+                    f"# HELP {metric} {description}",
+                    f"# TYPE {metric} {metric_type}",
+                    f"{metric} {value:g}",
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Makes metrics available to Prometheus, on a local HTTP endpoint and/or as a file (for node_exporter's textfile collector).
+
+    Both are off until asked for. The file is rewritten (atomically) every FILE_INTERVAL_SECONDS.
+    """
+
+    FILE_INTERVAL_SECONDS = 15.0
+    HOST = "127.0.0.1"
+
+    def __init__(self, render: Callable[[], Awaitable[str]]) -> None:
+        """Init. render gets the current metrics, in the Prometheus text format."""
+        self.render = render
+        self.port = 0
+        self.path: Path | None = None
+        self._runner: web.AppRunner | None = None
+        self._file_task: asyncio.Task | None = None
+
+    async def serve(self, port: int) -> None:
+        """Serve metrics at http://127.0.0.1:port/metrics (or stop serving them, if port is 0).
+
+        Raises OSError if the port can't be listened on.
+        """
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            self.port = 0
+        if not port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.HOST, port).start()
+        except OSError:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+        self.port = port
+
+    def write_to(self, path: Path | None) -> None:
+        """Write metrics to path every so often (or stop writing them, if path is None)."""
+        if self._file_task:
+            self._file_task.cancel()
+            self._file_task = None
+        self.path = path
+        if path:
+            self._file_task = asyncio.create_task(self._write_loop(path))
+
+    async def close(self) -> None:
+        """Stop serving and writing metrics."""
+        self.write_to(None)
+        await self.serve(0)
+
+    async def _handle_metrics(self, _: web.Request) -> web.Response:
+        return web.Response(
+            text=await self.render(),
+            content_type="text/plain",
+            charset="utf-8",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def _write_loop(self, path: Path) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._write_file, path, await self.render())
+            except Exception:
+                log.exception("Failed to write metrics to %s: ", path)
+            await asyncio.sleep(self.FILE_INTERVAL_SECONDS)
+
+    @staticmethod
+    def _write_file(path: Path, text: str) -> None:
+        """Write the file in one go, so that nothing ever reads half of it."""
+        temporary_path = path.with_name(path.name + ".tmp")
+        temporary_path.write_text(text, encoding="utf-8")
+        temporary_path.replace(path)
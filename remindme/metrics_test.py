@@ -0,0 +1,123 @@
+"""Unit tests for delivery metrics."""
+
+import asyncio
+import socket
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+
+import metrics
+
+
+def get(url: str) -> bytes:
+    """Get a URL (blocking, so run it in a thread)."""
+    with urllib.request.urlopen(url) as response:  # noqa: S310
+        return response.read()
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = metrics.Histogram((1, 5, 10))
+        for value in (0, 1, 2, 5, 7, 100):
+            histogram.observe(value)
+        assert histogram.counts == [2, 2, 1, 1]
+        assert histogram.cumulative_counts() == [
+            (1, 2),
+            (5, 4),
+            (10, 5),
+            (float("inf"), 6),
+        ]
+        assert histogram.count == 6
+        assert histogram.sum == 115
+        assert histogram.max == 100
+
+    def test_quantile(self):
+        histogram = metrics.Histogram((10, 20))
+        for value in range(1, 21):
+            histogram.observe(value)
+        assert histogram.quantile(0.5) == 10
+        assert histogram.quantile(0.75) == 15
+        assert histogram.quantile(1) == 20
+
+    def test_quantile_capped_at_max(self):
+        histogram = metrics.Histogram((10, 1000))
+        histogram.observe(11)
+        assert histogram.quantile(0.99) == 11
+        histogram.observe(5000)
+        assert histogram.quantile(1) == 5000
+
+    def test_empty(self):
+        histogram = metrics.Histogram((1,))
+        assert histogram.quantile(0.5) == 0
+        assert histogram.mean == 0
+
+
+class TestDeliveryMetrics(unittest.TestCase):
+    def test_summarize(self):
+        delivery_metrics = metrics.DeliveryMetrics()
+        assert delivery_metrics.summarize("send_latency_seconds") == "None yet"
+        delivery_metrics.observe("send_latency_seconds", 0.2)
+        delivery_metrics.observe("send_retries", 2)
+        assert delivery_metrics.summarize("send_latency_seconds").endswith("max 200ms")
+        assert delivery_metrics.summarize("send_retries").endswith("max 2")
+
+    def test_render_prometheus(self):
+        delivery_metrics = metrics.DeliveryMetrics()
+        delivery_metrics.observe("send_lateness_seconds", 3)
+        delivery_metrics.observe("send_lateness_seconds", 90000)
+        text = delivery_metrics.render_prometheus(
+            "test_", {"sent_total": ("counter", "Sent.", 7)}
+        )
+        lines = text.splitlines()
+        assert "# TYPE test_send_lateness_seconds histogram" in lines
+        assert 'test_send_lateness_seconds_bucket{le="1"} 0' in lines
+        assert 'test_send_lateness_seconds_bucket{le="5"} 1' in lines
+        assert 'test_send_lateness_seconds_bucket{le="86400"} 1' in lines
+        assert 'test_send_lateness_seconds_bucket{le="+Inf"} 2' in lines
+        assert "test_send_lateness_seconds_sum 90003" in lines
+        assert "test_send_lateness_seconds_count 2" in lines
+        assert 'test_schedule_search_seconds_bucket{le="1e-05"} 0' in lines
+        assert "# TYPE test_sent_total counter" in lines
+        assert "test_sent_total 7" in lines
+        assert text.endswith("\n")
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def test_file(self):
+        async def run(path: Path) -> None:
+            exporter = metrics.MetricsExporter(render)
+            exporter.write_to(path)
+            await asyncio.sleep(0.1)
+            await exporter.close()
+
+        async def render() -> str:
+            return "test_metric 1\n"
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / "metrics.prom"
+            asyncio.run(run(path))
+            assert path.read_text(encoding="utf-8") == "test_metric 1\n"
+            assert not path.with_name("metrics.prom.tmp").exists()
+
+    def test_serve(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        async def render() -> str:
+            return "test_metric 1\n"
+
+        async def fetch() -> bytes:
+            exporter = metrics.MetricsExporter(render)
+            await exporter.serve(port)
+            try:
+                return await asyncio.to_thread(get, f"http://127.0.0.1:{port}/metrics")
+            finally:
+                await exporter.close()
+
+        assert asyncio.run(fetch()) == b"test_metric 1\n"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Background migration of reminders saved by old versions of the RemindMe cog."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from redbot.core import Config
+
+log = logging.getLogger("red.pcxcogs.remindme")
+
+
+class LegacyMigration:
+    """Moves reminders from the old global "reminders" list (schema versions 0 and 1) into the reminder store.
+
+    Legacy reminders are converted and saved CHUNK_SIZE at a time, with one bulk write per chunk.
+    After every chunk, how far along we are is saved to the migration_position global, so that if
+    the bot goes down partway through, the migration picks up where it left off. Saving a chunk
+    again is harmless, as it just replaces the same reminders.
+
+    Schema version 0 reminders have no user_reminder_id of their own, so they are numbered per user
+    in list order. This is worked out from the whole list every time, so the numbering never
+    changes between attempts. Reminders that are deleted before they are migrated are replaced in the
+    list with a FORGOTTEN placeholder (keeping their position and ID), so they can't come back later.
+    """
+
+    CHUNK_SIZE = 500
+    LOG_INTERVAL_SECONDS = 10.0
+
+    def __init__(
+        self,
+        config: Config,
+        convert: Callable[[dict[str, Any]], dict[str, Any]],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Init.
+
+        convert turns a schema version 1 legacy reminder into a reminder for the reminder store.
+        """
+        self.config = config
+        self._convert = convert
+        self._clock = clock
+        self._legacy: list[dict[str, Any]] = []
+        self._keys: list[tuple[int, int]] = []
+        self._lock = asyncio.Lock()
+        self.position = 0
+
+    def __len__(self) -> int:
+        """Count how many legacy reminders there are (including ones already migrated)."""
+        return len(self._legacy)
+
+    async def load(self) -> list[tuple[int, int]]:
+        """Read the legacy reminders, returning the (user_id, user_reminder_id) of every one still to be migrated."""
+        self._legacy = await self.config.get_raw("reminders", default=[])
+        self.position = await self.config.migration_position()
+        self._keys = []
+        next_ids: dict[int, int] = {}
+        for legacy_reminder in self._legacy:
+            if "USER_REMINDER_ID" in legacy_reminder:
+                user_id, user_reminder_id = (
+                    legacy_reminder["USER_ID"],
+                    legacy_reminder["USER_REMINDER_ID"],
+                )
+            else:
+                user_id = legacy_reminder["ID"]
+                user_reminder_id = next_ids.get(user_id, 1)
+            next_ids[user_id] = max(next_ids.get(user_id, 1), user_reminder_id + 1)
+            self._keys.append((user_id, user_reminder_id))
+        return [
+            self._keys[position]
+            for position in range(self.position, len(self._legacy))
+            if not self._legacy[position].get("FORGOTTEN")
+        ]
+
+    async def run(
+        self, save: Callable[[list[tuple[int, int, dict[str, Any]]]], Awaitable[None]]
+    ) -> int:
+        """Migrate every remaining legacy reminder, returning how many were migrated.
+
+        Each chunk of (user_id, user_reminder_id, reminder) is handed to save, which must
+        write them to the reminder store before returning.
+        """
+        started = last_logged = self._clock()
+        remaining = len(self._legacy) - self.position
+        done = 0
+        while self.position < len(self._legacy):
+            async with self._lock:
+                end = min(self.position + self.CHUNK_SIZE, len(self._legacy))
+                chunk = []
+                for position in range(self.position, end):
+                    legacy_reminder = self._legacy[position]
+                    if legacy_reminder.get("FORGOTTEN"):
+                        continue
+                    user_id, user_reminder_id = self._keys[position]
+                    chunk.append(
+                        (
+                            user_id,
+                            user_reminder_id,
+                            self._convert(
+                                self._schema_1(
+                                    legacy_reminder, user_id, user_reminder_id
+                                )
+                            ),
+                        )
+                    )
+                if chunk:
+                    await save(chunk)
+                done += end - self.position
+                self.position = end
+                await self.config.migration_position.set(end)
+            now = self._clock()
+            if now - last_logged >= self.LOG_INTERVAL_SECONDS:
+                last_logged = now
+                rate = done / (now - started)
+                log.info(
+                    "Migrated %d/%d legacy reminders (%.0f per second), about %d seconds to go.",
+                    done,
+                    remaining,
+                    rate,
+                    (remaining - done) / rate,
+                )
+            # Let everything else have a go between chunks
+            await asyncio.sleep(0)
+        await self.config.clear_raw("reminders")
+        await self.config.migration_position.clear()
+        await self.config.schema_version.set(2)
+        elapsed = self._clock() - started
+        log.info(
+            "Finished migrating %d legacy reminders in %.1f seconds.", done, elapsed
+        )
+        return done
+
+    async def forget(self, user_id: int, user_reminder_id: int | None = None) -> None:
+        """Make sure a user's legacy reminders (or just one of them) are never migrated, as they have been deleted.
+
+        Waits for any chunk that is being saved to finish first, so the caller should delete
+        the reminders from the reminder store again afterwards, in case that chunk had them.
+        """
+        async with self._lock:
+            forgotten = False
+            for position in range(self.position, len(self._legacy)):
+                key_user_id, key_user_reminder_id = self._keys[position]
+                if key_user_id != user_id or user_reminder_id not in (
+                    None,
+                    key_user_reminder_id,
+                ):
+                    continue
+                if not self._legacy[position].get("FORGOTTEN"):
+                    self._legacy[position] = {
+                        "USER_ID": user_id,
+                        "USER_REMINDER_ID": key_user_reminder_id,
+                        "FORGOTTEN": True,
+                    }
+                    forgotten = True
+            if forgotten:
+                await self.config.set_raw("reminders", value=self._legacy)
+
+    @staticmethod
+    def _schema_1(
+        legacy_reminder: dict[str, Any], user_id: int, user_reminder_id: int
+    ) -> dict[str, Any]:
+        """Get a legacy reminder in its schema version 1 form."""
+        if "USER_REMINDER_ID" in legacy_reminder:
+            return legacy_reminder
+        return {
+            "USER_REMINDER_ID": user_reminder_id,
+            "USER_ID": user_id,
+            "REMINDER": legacy_reminder["TEXT"],
+            "FUTURE": legacy_reminder["FUTURE"],
+            "FUTURE_TEXT": legacy_reminder["FUTURE_TEXT"],
+            "JUMP_LINK": None,
+        }
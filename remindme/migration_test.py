@@ -0,0 +1,116 @@
+"""Unit tests for the legacy reminder migration."""
+
+import unittest
+
+import migration
+
+
+class FakeValue:
+    def __init__(self, data: dict, name: str) -> None:
+        """Init."""
+        self.data = data
+        self.name = name
+
+    async def __call__(self) -> int:
+        return self.data.get(self.name, 0)
+
+    async def set(self, value: int) -> None:
+        self.data[self.name] = value
+
+    async def clear(self) -> None:
+        self.data.pop(self.name, None)
+
+
+class FakeConfig:
+    def __init__(self, reminders: list) -> None:
+        """Init."""
+        self.data = {"reminders": reminders}
+        self.migration_position = FakeValue(self.data, "migration_position")
+        self.schema_version = FakeValue(self.data, "schema_version")
+
+    async def get_raw(self, name: str, default: list | None = None) -> list:
+        return list(self.data.get(name, default))
+
+    async def set_raw(self, name: str, value: list) -> None:
+        self.data[name] = list(value)
+
+    async def clear_raw(self, name: str) -> None:
+        self.data.pop(name, None)
+
+
+def convert(reminder: dict) -> dict:
+    """Convert a legacy reminder the way RemindMe does, keeping only what the tests check."""
+    return {"text": reminder["REMINDER"], "expires": reminder["FUTURE"]}
+
+
+def schema_0(user_id: int, text: str) -> dict:
+    """Make a legacy reminder as schema 0 stored them."""
+    return {"ID": user_id, "TEXT": text, "FUTURE": 100, "FUTURE_TEXT": "1 hour"}
+
+
+class TestLegacyMigration(unittest.IsolatedAsyncioTestCase):
+    async def test_numbers_schema_0_per_user(self):
+        config = FakeConfig([schema_0(1, "a"), schema_0(2, "b"), schema_0(1, "c")])
+        legacy_migration = migration.LegacyMigration(config, convert)
+        assert await legacy_migration.load() == [(1, 1), (2, 1), (1, 2)]
+        saved = []
+
+        async def save(chunk: list) -> None:
+            saved.extend(chunk)
+
+        assert await legacy_migration.run(save) == 3
+        assert saved[2] == (1, 2, {"text": "c", "expires": 100})
+        assert config.data == {"schema_version": 2}
+
+    async def test_resumes_after_failure(self):
+        config = FakeConfig([schema_0(1, str(number)) for number in range(5)])
+        legacy_migration = migration.LegacyMigration(config, convert)
+        legacy_migration.CHUNK_SIZE = 2
+        await legacy_migration.load()
+        saved = []
+
+        async def save_then_fail(chunk: list) -> None:
+            if saved:
+                raise OSError
+            saved.extend(chunk)
+
+        with self.assertRaises(OSError):
+            await legacy_migration.run(save_then_fail)
+        assert config.data["migration_position"] == 2
+
+        resumed = migration.LegacyMigration(config, convert)
+        resumed.CHUNK_SIZE = 2
+        assert await resumed.load() == [(1, 3), (1, 4), (1, 5)]
+
+        async def save(chunk: list) -> None:
+            saved.extend(chunk)
+
+        await resumed.run(save)
+        assert [user_reminder_id for _, user_reminder_id, _ in saved] == [1, 2, 3, 4, 5]
+
+    async def test_forget(self):
+        config = FakeConfig(
+            [schema_0(1, "a"), schema_0(1, "b"), schema_0(2, "c"), schema_0(1, "d")]
+        )
+        legacy_migration = migration.LegacyMigration(config, convert)
+        await legacy_migration.load()
+        await legacy_migration.forget(1, 2)
+        await legacy_migration.forget(2)
+        # IDs stay the same after forgetting, even when loaded again
+        reloaded = migration.LegacyMigration(config, convert)
+        assert await reloaded.load() == [(1, 1), (1, 3)]
+        saved = []
+
+        async def save(chunk: list) -> None:
+            saved.extend(chunk)
+
+        await reloaded.run(save)
+        assert [
+            (user_id, user_reminder_id, reminder["text"])
+            for user_id, user_reminder_id, reminder in saved
+        ] == [(1, 1, "a"), (1, 3, "d")]
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
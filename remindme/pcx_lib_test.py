@@ -0,0 +1,58 @@
+"""Unit tests for the shared cog code."""
+
+import asyncio
+import unittest
+
+import pcx_lib
+
+
+class FakeValue:
+    def __init__(self) -> None:
+        """Init."""
+        self.value = 0
+        self.failures = 0
+        self._lock = asyncio.Lock()
+
+    async def __call__(self) -> int:
+        return self.value
+
+    async def set(self, value: int) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError
+        self.value = value
+
+    def get_lock(self) -> asyncio.Lock:
+        return self._lock
+
+
+class TestBufferedCounter(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_increments(self):
+        value = FakeValue()
+        counter = pcx_lib.BufferedCounter(value, flush_interval=0.01)
+        counter.increment()
+        counter.increment(2)
+        assert value.value == 0
+        assert await counter.get() == 3
+        await asyncio.sleep(0.05)
+        assert value.value == 3
+        await counter.close()
+
+    async def test_failed_flush_tries_again(self):
+        value = FakeValue()
+        value.failures = 2
+        counter = pcx_lib.BufferedCounter(value, flush_interval=0.01)
+        counter.increment(5)
+        with self.assertLogs(pcx_lib.log, "ERROR") as logs:
+            await asyncio.sleep(0.1)
+        assert len(logs.records) == 2
+        # Saved by itself, without waiting for another increment
+        assert value.value == 5
+        assert await counter.get() == 5
+        await counter.close()
+        assert value.value == 5
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Repeating reminder arithmetic."""
+
+import datetime
+
+from dateutil.relativedelta import relativedelta
+
+AVERAGE_MONTH_SECONDS = 365.2425 / 12 * 86400
+
+
+def approximate_seconds(repeat: relativedelta) -> float:
+    """Get roughly how many seconds a repeat interval is (months and years are averaged)."""
+    return (
+        (repeat.years * 12 + repeat.months) * AVERAGE_MONTH_SECONDS
+        + repeat.days * 86400
+        + repeat.hours * 3600
+        + repeat.minutes * 60
+        + repeat.seconds
+    )
+
+
+def occurrence(
+    start: datetime.datetime, repeat: relativedelta, index: int
+) -> datetime.datetime:
+    """Get the index'th occurrence of a repeating reminder (the 0th being start itself).
+
+    Occurrences are always calculated from start, so a reminder repeating monthly on the 31st
+    will come back to the 31st after shorter months instead of drifting to the 28th.
+    """
+    return start + repeat * index
+
+
+def next_occurrence_index(
+    start: datetime.datetime, repeat: relativedelta, after: datetime.datetime
+) -> int:
+    """Get the index of the first occurrence that is later than after.
+
+    Jumps straight there by estimating from the length of the repeat interval, rather than
+    stepping through every missed occurrence.
+    """
+    interval = approximate_seconds(repeat)
+    if interval <= 0:
+        msg = "Repeat interval must be positive"
+        raise ValueError(msg)
+    index = max(0, int((after - start).total_seconds() // interval))
+    # The estimate is off by at most a couple of occurrences (months and years aren't all the same length)
+    while occurrence(start, repeat, index) <= after:
+        index += 1
+    while index > 0 and occurrence(start, repeat, index - 1) > after:
+        index -= 1
+    return index
+
+
+def next_occurrence(
+    start: datetime.datetime, repeat: relativedelta, after: datetime.datetime
+) -> datetime.datetime:
+    """Get the first occurrence of a repeating reminder that is later than after.
+
+    Raises OverflowError or ValueError if that would be past the year 9999.
+    """
+    return occurrence(start, repeat, next_occurrence_index(start, repeat, after))
+
+
+def upcoming_occurrences(
+    start: datetime.datetime,
+    repeat: relativedelta,
+    after: datetime.datetime,
+    count: int,
+) -> list[datetime.datetime]:
+    """Get (up to) the next count occurrences of a repeating reminder that are later than after.
+
+    Fewer will be returned if the occurrences would go past the year 9999.
+    """
+    result: list[datetime.datetime] = []
+    try:
+        index = next_occurrence_index(start, repeat, after)
+        for offset in range(count):
+            result.append(occurrence(start, repeat, index + offset))  # noqa: PERF401
+    except (OverflowError, ValueError):
+        pass
+    return result
@@ -0,0 +1,127 @@
+"""Unit tests for repeating reminder arithmetic."""
+
+import datetime
+import unittest
+
+import recurrence
+from dateutil.relativedelta import relativedelta
+
+
+def utc(*args: int) -> datetime.datetime:
+    """Make a UTC datetime."""
+    return datetime.datetime(*args, tzinfo=datetime.UTC)
+
+
+def step_through(
+    start: datetime.datetime, repeat: relativedelta, after: datetime.datetime
+) -> datetime.datetime:
+    """Find the next occurrence the slow way, by stepping through every one."""
+    index = 0
+    while recurrence.occurrence(start, repeat, index) <= after:
+        index += 1
+    return recurrence.occurrence(start, repeat, index)
+
+
+class TestNextOccurrence(unittest.TestCase):
+    def test_matches_stepping_through(self):
+        start = utc(2020, 1, 31, 9, 30)
+        afters = [
+            start,
+            utc(2020, 2, 29),
+            utc(2021, 3, 1, 9, 29),
+            utc(2024, 2, 29, 23, 59),
+            utc(2031, 12, 31),
+        ]
+        repeats = [
+            relativedelta(days=1),
+            relativedelta(weeks=1),
+            relativedelta(days=3, hours=5),
+            relativedelta(months=1),
+            relativedelta(months=1, days=2),
+            relativedelta(months=5),
+            relativedelta(years=1),
+            relativedelta(years=1, months=1, days=1),
+        ]
+        for repeat in repeats:
+            for after in afters:
+                with self.subTest(repeat=repeat, after=after):
+                    assert recurrence.next_occurrence(
+                        start, repeat, after
+                    ) == step_through(start, repeat, after)
+
+    def test_strictly_after(self):
+        start = utc(2020, 1, 1)
+        assert recurrence.next_occurrence(start, relativedelta(days=1), start) == utc(
+            2020, 1, 2
+        )
+        assert recurrence.next_occurrence(
+            start, relativedelta(days=1), utc(2020, 1, 5)
+        ) == utc(2020, 1, 6)
+
+    def test_start_in_future(self):
+        start = utc(2020, 1, 1)
+        assert (
+            recurrence.next_occurrence(start, relativedelta(days=1), utc(2019, 1, 1))
+            == start
+        )
+
+    def test_month_end_does_not_drift(self):
+        start = utc(2021, 1, 31)
+        assert recurrence.next_occurrence(
+            start, relativedelta(months=1), utc(2021, 2, 1)
+        ) == utc(2021, 2, 28)
+        assert recurrence.next_occurrence(
+            start, relativedelta(months=1), utc(2021, 3, 1)
+        ) == utc(2021, 3, 31)
+
+    def test_leap_day(self):
+        start = utc(2020, 2, 29)
+        assert recurrence.next_occurrence(
+            start, relativedelta(years=1), utc(2021, 1, 1)
+        ) == utc(2021, 2, 28)
+        assert recurrence.next_occurrence(
+            start, relativedelta(years=1), utc(2023, 6, 1)
+        ) == utc(2024, 2, 29)
+
+    def test_long_outage(self):
+        start = utc(2000, 1, 1, 12)
+        assert recurrence.next_occurrence(
+            start, relativedelta(days=1), utc(2024, 6, 15, 13)
+        ) == utc(2024, 6, 16, 12)
+
+    def test_overflow(self):
+        start = utc(9999, 12, 1)
+        with self.assertRaises((OverflowError, ValueError)):
+            recurrence.next_occurrence(start, relativedelta(months=1), utc(9999, 12, 2))
+
+    def test_empty_repeat(self):
+        with self.assertRaises(ValueError):
+            recurrence.next_occurrence(
+                utc(2020, 1, 1), relativedelta(), utc(2020, 1, 2)
+            )
+
+
+class TestUpcomingOccurrences(unittest.TestCase):
+    def test_upcoming(self):
+        start = utc(2021, 1, 31)
+        assert recurrence.upcoming_occurrences(
+            start, relativedelta(months=1), utc(2021, 2, 1), 3
+        ) == [
+            utc(2021, 2, 28),
+            utc(2021, 3, 31),
+            utc(2021, 4, 30),
+        ]
+
+    def test_upcoming_stops_at_overflow(self):
+        start = utc(9999, 10, 1)
+        assert recurrence.upcoming_occurrences(
+            start, relativedelta(months=1), utc(9999, 10, 2), 5
+        ) == [
+            utc(9999, 11, 1),
+            utc(9999, 12, 1),
+        ]
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
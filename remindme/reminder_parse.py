@@ -1,59 +1,409 @@
 """A parser for remindme commands."""
-from pyparsing import CaselessLiteral, Group, Literal, Optional, ParserElement, SkipTo, StringEnd, Suppress, Word, ZeroOrMore, nums, tokenMap
-from typing import Any
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pyparsing import CaselessLiteral, Group, Literal, Optional, ParseException, ParserElement, SkipTo, StringEnd, Suppress, Word, ZeroOrMore, nums, tokenMap
+from typing import Any, ClassVar, NoReturn
 
 __author__ = "PhasecoreX"
 
+# The fast path matches against the upper cased text, the same way CaselessLiteral compares
+_WHITESPACE = re.compile(r"[ \n\r]*+")
+# Possessive quantifiers, so that long runs of whitespace can't cause catastrophic backtracking
+_TIME_UNIT = re.compile(
+    r"[ \n\r]*+([0-9]++)[ \n\r]*+"
+    r"(YEARS|YEAR|Y|MONTHS|MONTH|MO|WEEKS|WEEK|W|DAYS|DAY|D|HOURS|HOUR|HRS|HR|H|MINUTES|MINUTE|MINS|MIN|M|SECONDS|SECOND|SECS|SEC|S)"
+)
+_SEPARATED_TIME_UNIT = re.compile(r"[ \n\r]*+,?+[ \n\r]*+(?:AND)?+" + _TIME_UNIT.pattern)
+# Any of these unit letters after a number is a valid time unit, so this finds where "every ..." or "in ..." could parse
+_EVERY_OR_IN_TIME = re.compile(r"(?:EVERY|IN)[ \n\r]*+[0-9]++[ \n\r]*+[YMWDHS]")
+_UNIT_NAMES = {"Y": "years", "W": "weeks", "D": "days", "H": "hours", "M": "minutes", "S": "seconds"}
+# Anything that could be a time unit, for the shape guard
+_TIME_UNIT_LIKE = re.compile(r"[0-9]++[ \n\r]*+[YMWDHSymwdhs]")
+
+
+class _SharedState:
+    """The process wide state of the parser, shared by every ReminderParser."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.grammar: ParserElement | None = None
+        self.grammar_lock = threading.Lock()
+        # How many parses are using packrat caching, and whether it was us that turned it on
+        self.packrat_lock = threading.Lock()
+        self.packrat_users = 0
+        self.packrat_ours = False
+
+
+_shared = _SharedState()
+
+
+def _get_grammar() -> ParserElement:
+    """Get the pyparsing grammar, building it the first time it is needed.
+
+    It is the same for every ReminderParser, and most of them never need it (the fast path handles
+    nearly everything), so there is only ever one, and nothing is built when the cog loads.
+    """
+    with _shared.grammar_lock:
+        if _shared.grammar is None:
+            _shared.grammar = _build_grammar()
+        return _shared.grammar
+
+
+def _build_grammar() -> ParserElement:
+    """Build the pyparsing grammar."""
+    unit_years = (CaselessLiteral("years") | CaselessLiteral("year") | CaselessLiteral("y"))
+    years = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("years") + unit_years)
+    unit_months = (CaselessLiteral("months") | CaselessLiteral("month") | CaselessLiteral("mo"))
+    months = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("months") + unit_months)
+    unit_weeks = (CaselessLiteral("weeks") | CaselessLiteral("week") | CaselessLiteral("w"))
+    weeks = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("weeks") + unit_weeks)
+    unit_days = (CaselessLiteral("days") | CaselessLiteral("day") | CaselessLiteral("d"))
+    days = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("days") + unit_days)
+    unit_hours = (CaselessLiteral("hours") | CaselessLiteral("hour") | CaselessLiteral("hrs") | CaselessLiteral("hr") | CaselessLiteral("h"))
+    hours = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("hours") + unit_hours)
+    unit_minutes = (CaselessLiteral("minutes") | CaselessLiteral("minute") | CaselessLiteral("mins") | CaselessLiteral("min") | CaselessLiteral("m"))
+    minutes = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("minutes") + unit_minutes)
+    unit_seconds = (CaselessLiteral("seconds") | CaselessLiteral("second") | CaselessLiteral("secs") | CaselessLiteral("sec") | CaselessLiteral("s"))
+    seconds = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("seconds") + unit_seconds)
+
+    time_unit = years | months | weeks | days | hours | minutes | seconds
+    time_unit_separators = Optional(Literal(",")) + Optional(CaselessLiteral("and"))
+    full_time = time_unit + ZeroOrMore(Suppress(Optional(time_unit_separators)) + time_unit)
+
+    every_time = Group(CaselessLiteral("every") + full_time)("every")
+    in_opt_time = Group(Optional(CaselessLiteral("in")) + full_time)("in")
+    in_req_time = Group(CaselessLiteral("in") + full_time)("in")
+
+    reminder_text_capture = SkipTo(every_time | in_req_time | StringEnd()).setParseAction(tokenMap(str.strip))
+    reminder_text_optional_prefix = Optional(Suppress(CaselessLiteral("to")))
+    reminder_text = reminder_text_optional_prefix + reminder_text_capture("text")
+
+    in_every_text = in_opt_time + every_time + reminder_text
+    every_in_text = every_time + in_req_time + reminder_text
+    in_text_every = in_opt_time + reminder_text + every_time
+    every_text_in = every_time + reminder_text + in_req_time
+    text_in_every = reminder_text + in_req_time + every_time
+    text_every_in = reminder_text + every_time + in_req_time
+
+    in_text = in_opt_time + reminder_text
+    text_in = reminder_text + in_req_time
+    every_text = every_time + reminder_text
+    text_every = reminder_text + every_time
+
+    return (in_every_text | every_in_text | in_text_every | every_text_in | text_in_every | text_every_in | in_text | text_in | every_text | text_every)
+
+
+@contextmanager
+def _packrat() -> Iterator[None]:
+    """Turn on pyparsing's packrat caching while the grammar is parsing.
+
+    Packrat is a process wide pyparsing setting, so leaving it on would change how the grammars
+    of every other cog parse. It is turned off again once no parses are running, unless something
+    else had already turned it on. It can't be used alongside left recursion, so if something else
+    turned that on, parsing just goes ahead without packrat.
+    """
+    with _shared.packrat_lock:
+        if not _shared.packrat_users and not ParserElement._packratEnabled and not ParserElement._left_recursion_enabled:  # noqa: SLF001
+            ParserElement.enable_packrat()
+            _shared.packrat_ours = True
+        _shared.packrat_users += 1
+    try:
+        yield
+    finally:
+        with _shared.packrat_lock:
+            _shared.packrat_users -= 1
+            if not _shared.packrat_users and _shared.packrat_ours:
+                ParserElement.disable_memoization()
+                _shared.packrat_ours = False
+
+
+class ReminderParseTooExpensiveError(Exception):
+    """Raised when reminder text is too long or complicated to parse, or parsing it took too long.
+
+    reason is one of the REASONS, and str() of this is a message that can be shown to the user.
+    """
+
+    TOO_LONG = "too_long"
+    TOO_COMPLEX = "too_complex"
+    TIMED_OUT = "timed_out"
+    BUSY = "busy"
+    REASONS: ClassVar[dict[str, str]] = {
+        TOO_LONG: "Your reminder is too long.",
+        TOO_COMPLEX: "Your reminder has too many times in it.",
+        TIMED_OUT: "Your reminder took too long to understand, try simplifying it.",
+        BUSY: "I'm busy understanding other reminders right now, try again in a moment.",
+    }
+
+    def __init__(self, reason: str) -> None:
+        """Init."""
+        super().__init__(self.REASONS[reason])
+        self.reason = reason
+
+
+class ParseStats:
+    """How long parsing has taken, for each way of parsing."""
+
+    FAST = "fast"
+    PYPARSING = "pyparsing"
+
+    def __init__(self) -> None:
+        """Init."""
+        self.count = {self.FAST: 0, self.PYPARSING: 0}
+        self.total_seconds = {self.FAST: 0.0, self.PYPARSING: 0.0}
+        self.max_seconds = {self.FAST: 0.0, self.PYPARSING: 0.0}
+        self.rejected = dict.fromkeys(ReminderParseTooExpensiveError.REASONS, 0)
+        self.cache_hits = 0
+
+    def average_seconds(self, path: str) -> float:
+        """Get the average time a parse has taken."""
+        return self.total_seconds[path] / self.count[path] if self.count[path] else 0.0
+
+    def record(self, path: str, seconds: float) -> None:
+        """Record a parse (successful or not) that took this long."""
+        self.count[path] += 1
+        self.total_seconds[path] += seconds
+        self.max_seconds[path] = max(self.max_seconds[path], seconds)
+
+
 class ReminderParser:
-    """A parser for remindme commands."""
+    """A parser for remindme commands.
+
+    Nearly everything is parsed by a fast path that takes microseconds. The few things that can't
+    be are parsed by the pyparsing grammar, which can take a long time on long or adversarial text.
+    parse_guarded() keeps that off of the event loop: text that is too long or has too many time
+    units in it is rejected up front, and the grammar runs in a small thread pool with a time limit.
+
+    The same handful of times ("1d", "every 1 week", "8h") make up most reminders, so the results
+    of the most recent parses are kept in an LRU cache, keyed by the normalized text.
+    """
+
+    MAX_INPUT_LENGTH = 1000
+    MAX_TIME_UNITS = 32
+    PYPARSING_TIMEOUT_SECONDS = 2.0
+    MAX_PYPARSING_THREADS = 2
+    MAX_CACHED_RESULTS = 1024
 
     def __init__(self) -> None:
         """Set up the parser."""
-        ParserElement.enablePackrat()
-        unit_years = (CaselessLiteral("years") | CaselessLiteral("year") | CaselessLiteral("y"))
-        years = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("years") + unit_years)
-        unit_months = (CaselessLiteral("months") | CaselessLiteral("month") | CaselessLiteral("mo"))
-        months = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("months") + unit_months)
-        unit_weeks = (CaselessLiteral("weeks") | CaselessLiteral("week") | CaselessLiteral("w"))
-        weeks = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("weeks") + unit_weeks)
-        unit_days = (CaselessLiteral("days") | CaselessLiteral("day") | CaselessLiteral("d"))
-        days = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("days") + unit_days)
-        unit_hours = (CaselessLiteral("hours") | CaselessLiteral("hour") | CaselessLiteral("hrs") | CaselessLiteral("hr") | CaselessLiteral("h"))
-        hours = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("hours") + unit_hours)
-        unit_minutes = (CaselessLiteral("minutes") | CaselessLiteral("minute") | CaselessLiteral("mins") | CaselessLiteral("min") | CaselessLiteral("m"))
-        minutes = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("minutes") + unit_minutes)
-        unit_seconds = (CaselessLiteral("seconds") | CaselessLiteral("second") | CaselessLiteral("secs") | CaselessLiteral("sec") | CaselessLiteral("s"))
-        seconds = (Word(nums).setParseAction(lambda token_list: [int(str(token_list[0]))])("seconds") + unit_seconds)
-
-        time_unit = years | months | weeks | days | hours | minutes | seconds
-        time_unit_separators = Optional(Literal(",")) + Optional(CaselessLiteral("and"))
-        full_time = time_unit + ZeroOrMore(Suppress(Optional(time_unit_separators)) + time_unit)
-
-        every_time = Group(CaselessLiteral("every") + full_time)("every")
-        in_opt_time = Group(Optional(CaselessLiteral("in")) + full_time)("in")
-        in_req_time = Group(CaselessLiteral("in") + full_time)("in")
-
-        reminder_text_capture = SkipTo(every_time | in_req_time | StringEnd()).setParseAction(tokenMap(str.strip))
-        reminder_text_optional_prefix = Optional(Suppress(CaselessLiteral("to")))
-        reminder_text = reminder_text_optional_prefix + reminder_text_capture("text")
-
-        in_every_text = in_opt_time + every_time + reminder_text
-        every_in_text = every_time + in_req_time + reminder_text
-        in_text_every = in_opt_time + reminder_text + every_time
-        every_text_in = every_time + reminder_text + in_req_time
-        text_in_every = reminder_text + in_req_time + every_time
-        text_every_in = reminder_text + every_time + in_req_time
-
-        in_text = in_opt_time + reminder_text
-        text_in = reminder_text + in_req_time
-        every_text = every_time + reminder_text
-        text_every = reminder_text + every_time
-
-        template = (in_every_text | every_in_text | in_text_every | every_text_in | text_in_every | text_every_in | in_text | text_in | every_text | text_every)
-
-        self.parser = template
+        self.stats = ParseStats()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pyparsing_running = 0
+        self._results: OrderedDict[str, dict[str, Any]] = OrderedDict()
 
     def parse(self, text: str) -> dict[str, Any]:
         """Parse text into a reminder config dict."""
-        parsed = self.parser.parseString(text, parseAll=True)
-        return parsed.asDict()
\ No newline at end of file
+        text = self.normalize(text)
+        result = self._cached(text)
+        if result is None:
+            result = self._parse_fast(text)
+            if result is None:
+                result = self._parse_pyparsing(text)
+            self._remember(text, result)
+        return self._copy(result)
+
+    async def parse_guarded(self, text: str) -> dict[str, Any]:
+        """Parse text into a reminder config dict, without ever holding up the event loop for long.
+
+        Raises ReminderParseTooExpensiveError if the text is too long or complicated, or parsing it
+        takes too long, and ParseException if the text doesn't parse.
+        """
+        self._check_shape(text)
+        text = self.normalize(text)
+        result = self._cached(text)
+        if result is None:
+            result = await self._parse_uncached(text)
+            self._remember(text, result)
+        return self._copy(result)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text for parsing, in ways that don't change what it parses to.
+
+        pyparsing expands tabs before parsing, and skips whitespace before every token
+        (and the reminder text is stripped), so leading and trailing whitespace doesn't matter.
+        """
+        return text.expandtabs().strip(" \n\r")
+
+    async def _parse_uncached(self, text: str) -> dict[str, Any]:
+        """Parse normalized text with the fast path, or the pyparsing grammar in the thread pool."""
+        started = time.perf_counter()
+        try:
+            result = self._parse_fast(text)
+        finally:
+            self.stats.record(ParseStats.FAST, time.perf_counter() - started)
+        if result is not None:
+            return result
+
+        # The thread of a parse that timed out keeps going until it finishes, so only start another one if there is room
+        if self._pyparsing_running >= self.MAX_PYPARSING_THREADS:
+            self._reject(ReminderParseTooExpensiveError.BUSY)
+        if not self._executor:
+            self._executor = ThreadPoolExecutor(max_workers=self.MAX_PYPARSING_THREADS, thread_name_prefix="remindme-parse")
+        self._pyparsing_running += 1
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._parse_pyparsing, text)
+
+        def finished(_: asyncio.Future) -> None:
+            self._pyparsing_running -= 1
+            self.stats.record(ParseStats.PYPARSING, time.perf_counter() - started)
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.PYPARSING_TIMEOUT_SECONDS)
+        except TimeoutError:
+            self._reject(ReminderParseTooExpensiveError.TIMED_OUT)
+
+    def close(self) -> None:
+        """Stop the pyparsing thread pool (without waiting for any parses that are still running)."""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _cached(self, text: str) -> dict[str, Any] | None:
+        """Get the cached result of parsing normalized text."""
+        result = self._results.get(text)
+        if result is not None:
+            self._results.move_to_end(text)
+            self.stats.cache_hits += 1
+        return result
+
+    def _remember(self, text: str, result: dict[str, Any]) -> None:
+        """Cache the result of parsing normalized text, evicting the least recently used results past MAX_CACHED_RESULTS."""
+        self._results[text] = result
+        self._results.move_to_end(text)
+        while len(self._results) > self.MAX_CACHED_RESULTS:
+            self._results.popitem(last=False)
+
+    @staticmethod
+    def _copy(result: dict[str, Any]) -> dict[str, Any]:
+        """Copy a (possibly cached) result, so callers can't change what is cached."""
+        return {name: dict(value) if isinstance(value, dict) else value for name, value in result.items()}
+
+    def _check_shape(self, text: str) -> None:
+        """Reject text that would be too expensive to parse, before trying to parse it."""
+        if len(text) > self.MAX_INPUT_LENGTH:
+            self._reject(ReminderParseTooExpensiveError.TOO_LONG)
+        if len(_TIME_UNIT_LIKE.findall(text)) > self.MAX_TIME_UNITS:
+            self._reject(ReminderParseTooExpensiveError.TOO_COMPLEX)
+
+    def _reject(self, reason: str) -> NoReturn:
+        """Count and raise a ReminderParseTooExpensiveError."""
+        self.stats.rejected[reason] += 1
+        raise ReminderParseTooExpensiveError(reason)
+
+    def _parse_pyparsing(self, text: str) -> dict[str, Any]:
+        """Parse text with the pyparsing grammar."""
+        with _packrat():
+            parsed = _get_grammar().parseString(text, parseAll=True)
+        return parsed.asDict()
+
+    def _parse_fast(self, text: str) -> dict[str, Any] | None:
+        """Parse text the same way the pyparsing grammar does, but with a handful of regular expressions.
+
+        This mirrors the grammar exactly: the ten templates are tried in order, and the first one
+        that matches is the result (even if it doesn't match all of the text, in which case parsing
+        fails, and ParseException is raised). Returns None if the text can't be matched the way
+        pyparsing matches it (some characters upper case to more than one character), so that
+        pyparsing can have a go instead.
+        """
+        text = text.expandtabs()  # pyparsing does this before parsing too
+        upper_text = text.upper()
+        if len(upper_text) != len(text):
+            return None
+        result = _FastParse(text, upper_text).parse()
+        if result is None:
+            raise ParseException(text, 0, "Expected a reminder time")
+        return result
+
+
+class _FastParse:
+    """A single run of ReminderParser's fast path."""
+
+    def __init__(self, text: str, upper_text: str) -> None:
+        """Init."""
+        self.text = text
+        self.upper_text = upper_text
+
+    def parse(self) -> dict[str, Any] | None:
+        """Try each template in the same order as the grammar."""
+        in_opt, in_req, every, text = self.in_opt_time, self.in_req_time, self.every_time, self.reminder_text
+        templates: tuple[tuple[Callable[[int], tuple[str, Any, int] | None], ...], ...] = (
+            (in_opt, every, text),
+            (every, in_req, text),
+            (in_opt, text, every),
+            (every, text, in_req),
+            (text, in_req, every),
+            (text, every, in_req),
+            (in_opt, text),
+            (text, in_req),
+            (every, text),
+            (text, every),
+        )
+        for template in templates:
+            result: dict[str, Any] = {}
+            position = 0
+            for element in template:
+                parsed = element(position)
+                if parsed is None:
+                    break
+                name, value, position = parsed
+                result[name] = value
+            else:
+                # The first template to match wins, so this is either the result or a parse failure
+                return result if self.skip_whitespace(position) == len(self.text) else None
+        return None
+
+    def skip_whitespace(self, position: int) -> int:
+        """Skip over whitespace, like pyparsing does before each token."""
+        return _WHITESPACE.match(self.text, position).end()
+
+    def keyword(self, position: int, keyword: str) -> int | None:
+        """Match a CaselessLiteral, returning where it ends."""
+        position = self.skip_whitespace(position)
+        if self.upper_text.startswith(keyword, position):
+            return position + len(keyword)
+        return None
+
+    def full_time(self, position: int) -> tuple[dict[str, int], int] | None:
+        """Match one or more time units (greedily), returning them and where they end."""
+        match = _TIME_UNIT.match(self.upper_text, position)
+        if not match:
+            return None
+        result: dict[str, int] = {}
+        while match:
+            number, unit = match.groups()
+            result["months" if unit.startswith("MO") else _UNIT_NAMES[unit[0]]] = int(number)
+            position = match.end()
+            match = _SEPARATED_TIME_UNIT.match(self.upper_text, position)
+        return result, position
+
+    def in_opt_time(self, position: int) -> tuple[str, Any, int] | None:
+        """Match a time, optionally starting with "in"."""
+        position = self.keyword(position, "IN") or position
+        parsed = self.full_time(position)
+        return ("in", *parsed) if parsed else None
+
+    def in_req_time(self, position: int) -> tuple[str, Any, int] | None:
+        """Match "in" followed by a time."""
+        position = self.keyword(position, "IN")
+        parsed = self.full_time(position) if position is not None else None
+        return ("in", *parsed) if parsed else None
+
+    def every_time(self, position: int) -> tuple[str, Any, int] | None:
+        """Match "every" followed by a time."""
+        position = self.keyword(position, "EVERY")
+        parsed = self.full_time(position) if position is not None else None
+        return ("every", *parsed) if parsed else None
+
+    def reminder_text(self, position: int) -> tuple[str, Any, int]:
+        """Match an optional "to", then everything up to the next "every"/"in" time (or the end), stripped."""
+        position = self.keyword(position, "TO") or position
+        match = _EVERY_OR_IN_TIME.search(self.upper_text, position)
+        end = match.start() if match else len(self.text)
+        return "text", self.text[position:end].strip(), end
\ No newline at end of file
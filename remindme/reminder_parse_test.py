@@ -1,130 +1,220 @@
 """Unit tests for the reminder parser."""
+import asyncio
 import reminder_parse
+import threading
 import unittest
+from pyparsing import ParseException, ParserElement
 
 parser = reminder_parse.ReminderParser()
 
 
+def assert_parses(reminder: str, expected: dict) -> None:
+    """Check that both the fast path and the pyparsing grammar parse a reminder as expected."""
+    assert parser._parse_fast(reminder) == expected
+    assert parser._parse_pyparsing(reminder) == expected
+    assert parser.parse(reminder) == expected
+
+
 class TestCases(unittest.TestCase):
     def test_og(self):
         reminder = "2h reminder!"
-        result = parser.parse(reminder)
         expected = {"in": {"hours": 2}, "text": "reminder!"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_og_long(self):
         reminder = "1y2mo3w4d5h6m7s reminder!"
-        result = parser.parse(reminder)
         expected = {"in": {"years": 1, "months": 2, "weeks": 3, "days": 4, "hours": 5, "minutes": 6, "seconds": 7}, "text": "reminder!"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_og_long(self):
         reminder = "in 1y2mo3w4d5h6m7s reminder!"
-        result = parser.parse(reminder)
         expected = {"in": {"years": 1, "months": 2, "weeks": 3, "days": 4, "hours": 5, "minutes": 6, "seconds": 7}, "text": "reminder!"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_english(self):
         reminder = "in 1 year, 2 months, 3 weeks, 4 days, 5 hours, 6 minutes, and 7 seconds reminder!"
-        result = parser.parse(reminder)
         expected = {"in": {"years": 1, "months": 2, "weeks": 3, "days": 4, "hours": 5, "minutes": 6, "seconds": 7}, "text": "reminder!"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_broken_english(self):
         reminder = "in 1year2 mo, 3w4 day5hour6 mins       , and 7 s reminder!"
-        result = parser.parse(reminder)
         expected = {"in": {"years": 1, "months": 2, "weeks": 3, "days": 4, "hours": 5, "minutes": 6, "seconds": 7}, "text": "reminder!"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_optional_to(self):
         reminder = "to eat in 3 hours"
-        result = parser.parse(reminder)
         expected = {"in": {"hours": 3}, "text": "eat"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_only_in(self):
         reminder = "in 1 year"
-        result = parser.parse(reminder)
         expected = {"in": {"years": 1}, "text": ""}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_only_every(self):
         reminder = "every 1 year"
-        result = parser.parse(reminder)
         expected = {"every": {"years": 1}, "text": ""}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_every(self):
         reminder = "2w every 1 year"
-        result = parser.parse(reminder)
         expected = {"every": {"years": 1}, "in": {"weeks": 2}, "text": ""}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_every_in(self):
         reminder = "every 1 year in 3 weeks"
-        result = parser.parse(reminder)
         expected = {"every": {"years": 1}, "in": {"weeks": 3}, "text": ""}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_text(self):
         reminder = "in 3 weeks to keep coding"
-        result = parser.parse(reminder)
         expected = {"in": {"weeks": 3}, "text": "keep coding"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_text_in(self):
         reminder = "to keep coding in 2 hours"
-        result = parser.parse(reminder)
         expected = {"in": {"hours": 2}, "text": "keep coding"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_every_text(self):
         reminder = "every 3 weeks to keep coding"
-        result = parser.parse(reminder)
         expected = {"every": {"weeks": 3}, "text": "keep coding"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_text_every(self):
         reminder = "to keep coding every 2 hours"
-        result = parser.parse(reminder)
         expected = {"every": {"hours": 2}, "text": "keep coding"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_every_text(self):
         reminder = "2w every 1 year to write more code"
-        result = parser.parse(reminder)
         expected = {"every": {"years": 1}, "in": {"weeks": 2}, "text": "write more code"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_every_in_text(self):
         reminder = "every 1 year in 3 weeks to write more code"
-        result = parser.parse(reminder)
         expected = {"every": {"years": 1}, "in": {"weeks": 3}, "text": "write more code"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_in_text_every(self):
         reminder = "12 hrs write more code every 1 month"
-        result = parser.parse(reminder)
         expected = {"every": {"months": 1}, "in": {"hours": 12}, "text": "write more code"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_every_text_in(self):
         reminder = "every 1 month to write more code in 4 hours"
-        result = parser.parse(reminder)
         expected = {"every": {"months": 1}, "in": {"hours": 4}, "text": "write more code"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_text_in_every(self):
         reminder = "to write more unit tests in 8 days and 1 month every 1 week"
-        result = parser.parse(reminder)
         expected = {"every": {"weeks": 1}, "in": {"months": 1, "days": 8}, "text": "write more unit tests"}
-        assert expected == result
+        assert_parses(reminder, expected)
 
     def test_text_every_in(self):
         reminder = "to write more unit tests every 1 week 3 days in 2 months and 1 day"
-        result = parser.parse(reminder)
         expected = {"every": {"weeks": 1, "days": 3}, "in": {"months": 2, "days": 1}, "text": "write more unit tests"}
-        assert expected == result
+        assert_parses(reminder, expected)
+
+
+
+class TestFastPathQuirks(unittest.TestCase):
+    """The fast path has to match the grammar exactly, quirks and all."""
+
+    def test_no_word_boundaries(self):
+        assert_parses("2h tomorrow stuff", {"in": {"hours": 2}, "text": "morrow stuff"})
+        assert_parses("2 monkeys", {"in": {"months": 2}, "text": "nkeys"})
+        assert_parses("5min 3s text", {"in": {"minutes": 5, "seconds": 3}, "text": "text"})
+
+    def test_separators_and_whitespace(self):
+        assert_parses("  in 1 day and 2 hours,  to  go ", {"in": {"days": 1, "hours": 2}, "text": ",  to  go"})
+        assert_parses("in 2h\tx", {"in": {"hours": 2}, "text": "x"})
+        assert_parses("1 day 2 days hi", {"in": {"days": 2}, "text": "hi"})
+
+    def test_first_matching_template_wins(self):
+        for reminder in ("2h stuff in 3h", "every 2d foo every 3d", "hello"):
+            with self.subTest(reminder=reminder):
+                with self.assertRaises(ParseException):
+                    parser._parse_fast(reminder)
+                with self.assertRaises(ParseException):
+                    parser._parse_pyparsing(reminder)
+
+    def test_falls_back_when_upper_case_changes_length(self):
+        reminder = "2h go to the straße"
+        assert parser._parse_fast(reminder) is None
+        assert parser.parse(reminder) == {"in": {"hours": 2}, "text": "go to the straße"}
+
+
+class TestSharedGrammar(unittest.TestCase):
+    def test_grammar_is_shared(self):
+        assert reminder_parse._get_grammar() is reminder_parse._get_grammar()
+
+    def test_packrat_is_not_left_on(self):
+        assert reminder_parse.ReminderParser().parse("straße in 2h") == {"in": {"hours": 2}, "text": "straße"}
+        assert not ParserElement._packratEnabled
+        assert reminder_parse._shared.packrat_users == 0
+
+    def test_results_are_cached(self):
+        cached_parser = reminder_parse.ReminderParser()
+        cached_parser.MAX_CACHED_RESULTS = 2
+        result = cached_parser.parse("every 1 week")
+        result["every"]["weeks"] = 2
+        assert cached_parser.parse(" every 1 week\t") == {"every": {"weeks": 1}, "text": ""}
+        assert cached_parser.stats.cache_hits == 1
+        cached_parser.parse("1d")
+        cached_parser.parse("8h")
+        assert list(cached_parser._results) == ["1d", "8h"]
+
+
+
+class TestParseGuarded(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.parser = reminder_parse.ReminderParser()
+
+    async def asyncTearDown(self):
+        self.parser.close()
+
+    async def test_parses(self):
+        assert await self.parser.parse_guarded("in 2h to eat") == {"in": {"hours": 2}, "text": "eat"}
+        assert await self.parser.parse_guarded("2h straße") == {"in": {"hours": 2}, "text": "straße"}
+        with self.assertRaises(ParseException):
+            await self.parser.parse_guarded("hello")
+        with self.assertRaises(ParseException):
+            await self.parser.parse_guarded("straße")
+        stats = self.parser.stats
+        assert stats.count == {stats.FAST: 4, stats.PYPARSING: 2}
+
+    async def test_shape_guard(self):
+        with self.assertRaises(reminder_parse.ReminderParseTooExpensiveError) as context:
+            await self.parser.parse_guarded("x" * (self.parser.MAX_INPUT_LENGTH + 1))
+        assert context.exception.reason == context.exception.TOO_LONG
+        with self.assertRaises(reminder_parse.ReminderParseTooExpensiveError) as context:
+            await self.parser.parse_guarded("1h " * (self.parser.MAX_TIME_UNITS + 1))
+        assert context.exception.reason == context.exception.TOO_COMPLEX
+        assert self.parser.stats.count[self.parser.stats.FAST] == 0
+
+    async def test_timeout_and_busy(self):
+        release = threading.Event()
+
+        def slow_parse(text: str) -> dict:
+            release.wait(5)
+            return {"text": text}
+
+        self.parser._parse_pyparsing = slow_parse
+        self.parser.PYPARSING_TIMEOUT_SECONDS = 0.05
+        self.parser.MAX_PYPARSING_THREADS = 1
+        with self.assertRaises(reminder_parse.ReminderParseTooExpensiveError) as context:
+            await self.parser.parse_guarded("ß")
+        assert context.exception.reason == context.exception.TIMED_OUT
+        with self.assertRaises(reminder_parse.ReminderParseTooExpensiveError) as context:
+            await self.parser.parse_guarded("ß")
+        assert context.exception.reason == context.exception.BUSY
+        release.set()
+        # Wait for the parse that timed out to finish, then start over with a fresh thread pool
+        await asyncio.to_thread(self.parser._executor.shutdown)
+        self.parser.close()
+        assert self.parser._pyparsing_running == 0
+        assert await self.parser.parse_guarded("ß") == {"text": "ß"}
 
 
 # Run unit tests from command line
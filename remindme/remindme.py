@@ -3,19 +3,31 @@ import asyncio
 import datetime
 import discord
 import logging
+import time
 
 from abc import ABC
+from contextlib import suppress
 from dateutil.relativedelta import relativedelta
+from pathlib import Path
 from pyparsing import ParseException
 from redbot.core import Config, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.chat_formatting import humanize_list
 from typing import Any, ClassVar
 
 from .c_reminder import ReminderCommands
 from .c_remindmeset import RemindMeSetCommands
-from .pcx_lib import reply
-from .reminder_parse import ReminderParser
+from .delivery import SendLanes, TokenBucket, UserResolver, rate_limit_retry_after
+from .index import ReminderIndex
+from .metrics import DeliveryMetrics, MetricsExporter
+from .migration import LegacyMigration
+from .pcx_lib import BufferedCounter, ConfigAccessStats, TraceRecorder, invokes_subcommand, reply, split_embed
+from .recurrence import next_occurrence
+from .reminder_parse import ReminderParser, ReminderParseTooExpensiveError
+from .scheduler import ReminderSchedule, RetryQueue
+from .snapshot import pack_snapshot, read_snapshot, write_snapshot
+from .store import BufferedReminderStore, ConfigReminderStore, ReminderChanges, ReminderStore, SqliteReminderStore
 
 log = logging.getLogger("red.pcxcogs.remindme")
 
@@ -37,8 +49,15 @@ class RemindMe(
 
     default_global_settings: ClassVar[dict[str, int]] = {
         "schema_version": 0,
+        "migration_position": 0,
         "total_sent": 0,
         "max_user_reminders": 20,
+        "send_workers": 5,
+        "send_rate": 5.0,
+        "storage_backend": "config",
+        "storage_generation": 0,
+        "metrics_file": False,
+        "metrics_port": 0,
     }
     default_guild_settings: ClassVar[dict[str, bool]] = {
         "me_too": False,
@@ -53,7 +72,17 @@ class RemindMe(
         "repeat": {},  # relativedelta dict
     }
     SEND_DELAY_SECONDS = 30
+    PRERENDER_SECONDS = 60
+    PRERENDER_INTERVAL_SECONDS = 15
+    SNAPSHOT_INTERVAL_SECONDS = 600
     MAX_REMINDER_LENGTH = 800
+    # Command arguments that are safe to write down as is in a trace
+    TRACE_CHOICES: ClassVar[dict[str, tuple[str, ...]]] = {
+        "sort": ("time", "added", "id"),
+        "index": ("last", "all"),
+        "time": ("stop", "none", "false", "no", "cancel", "n"),
+        "backend": ("config", "sqlite"),
+    }
 
     def __init__(self, bot: Red) -> None:
         """Set up the cog."""
@@ -62,30 +91,87 @@ class RemindMe(
         self.config = Config.get_conf(
             self, identifier=1224364860, force_registration=True
         )
+        self.config_access = ConfigAccessStats()
+        self.config_access.instrument(self.config)
         self.config.register_global(**self.default_global_settings)
         self.config.register_guild(**self.default_guild_settings)
         # user id -> user reminder id
         self.config.init_custom("REMINDER", 2)
         self.config.register_custom("REMINDER", **self.default_reminder_settings)
+        self.reminder_store = BufferedReminderStore(ConfigReminderStore(self.config, self.default_reminder_settings))
+        self.total_sent = BufferedCounter(self.config.total_sent)
         self.bg_loop_task = None
+        self.prerender_task = None
+        self.snapshot_task = None
+        self.legacy_migration: LegacyMigration | None = None
+        self.legacy_migration_task = None
+        self.storage_backend = self.default_global_settings["storage_backend"]
+        # (user_id, user_reminder_id) -> (full reminder, embed) for reminders that are about to be sent
+        self.prerendered: dict[tuple[int, int], tuple[dict, discord.Embed]] = {}
+        self.user_resolver = UserResolver(bot)
         self.background_tasks = set()
-        self.next_reminder_to_send = {}
-        self.search_for_next_reminder = True
+        self.schedule = ReminderSchedule()
+        self.reminder_index = ReminderIndex()
+        # ((user_id, user_reminder_id), expires it was due at, or None for a retry), or None to stop a worker
+        self.send_queue: asyncio.Queue[tuple[tuple[int, int], int | None] | None] = asyncio.Queue()
+        self.send_workers: set[asyncio.Task] = set()
+        self.send_worker_count = 0
+        # Every reminder on the send queue or being sent, and the ones that came due again in the meantime
+        self.sending: set[tuple[int, int]] = set()
+        self.send_again: dict[tuple[int, int], int | None] = {}
+        self.send_limiter = TokenBucket(self.default_global_settings["send_rate"])
+        self.send_lanes = SendLanes(self.send_limiter)
         self.me_too_reminders = {}
         self.clicked_me_too_reminder = {}
         self.reminder_emoji = "\N{BELL}"
         self.reminder_parser = ReminderParser()
-        self.problematic_reminders = []
+        self.trace = TraceRecorder()
+        self.retry_queue = RetryQueue()
         self.sent_retry_warning = False
+        self.metrics = DeliveryMetrics()
+        self.metrics_exporter = MetricsExporter(self.render_metrics)
 
     #
     # Red methods
     #
 
-    def cog_unload(self) -> None:
+    async def cog_unload(self) -> None:
         """Clean up when cog shuts down."""
         if self.bg_loop_task:
             self.bg_loop_task.cancel()
+        if self.prerender_task:
+            self.prerender_task.cancel()
+        if self.snapshot_task:
+            self.snapshot_task.cancel()
+        if self.legacy_migration_task:
+            self.legacy_migration_task.cancel()
+        for worker in self.send_workers:
+            worker.cancel()
+        self.send_lanes.close()
+        self.reminder_parser.close()
+        self.trace.stop()
+        await self.metrics_exporter.close()
+        try:
+            await self._save_snapshot()
+        except Exception:
+            log.exception("Failed to save the schedule snapshot, the schedule will be rebuilt next time: ")
+        await self.reminder_store.close()
+        await self.total_sent.close()
+
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        """Let command replies jump ahead of any reminders being sent out (and trace the command, if we are recording)."""
+        if invokes_subcommand(ctx):
+            # The hook runs again for the subcommand, which is what gets counted, traced, and let ahead
+            return
+        self.config_access.begin(ctx.command.qualified_name)
+        if self.trace.recording:
+            await self._trace_command(ctx)
+        await self.send_lanes.acquire(SendLanes.INTERACTIVE)
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        """Finish counting the Config reads and writes the command made."""
+        if not invokes_subcommand(ctx):
+            self.config_access.end()
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """Show version in help."""
@@ -94,7 +180,9 @@ class RemindMe(
 
     async def red_delete_data_for_user(self, *, _requester: str, user_id: int) -> None:
         """There's already a [p]forgetme command, so..."""
-        await self.config.custom("REMINDER", str(user_id)).clear()
+        await self.reminder_store.delete_user(user_id)
+        await self.update_bg_task(user_id)
+        self.user_resolver.forget(user_id)
 
     #
     # Initialization methods
@@ -102,66 +190,133 @@ class RemindMe(
 
     async def initialize(self) -> None:
         """Perform setup actions before loading cog."""
+        self.storage_backend = await self.config.storage_backend()
+        self.reminder_store = await self._open_reminder_store(self.storage_backend)
+        if not await self._load_snapshot():
+            await self._build_schedule()
         await self._migrate_config()
         self._enable_bg_loop()
+        self.resize_send_workers(await self.config.send_workers())
+        self.send_limiter.set_rate(await self.config.send_rate())
+        await self.configure_metrics_exporter()
 
     async def _migrate_config(self) -> None:
-        """Perform some configuration migrations."""
-        schema_version = await self.config.schema_version()
-
-        schema_1_migration_reminders = []
-        if schema_version < 1:
-            # Add/generate USER_REMINDER_ID, rename some fields
-            current_reminders = await self.config.get_raw("reminders", default=[])
-            new_reminders = []
-            user_reminder_ids = {}
-            for reminder in current_reminders:
-                user_reminder_id = user_reminder_ids.get(reminder["ID"], 1)
-                new_reminder = {"USER_REMINDER_ID": user_reminder_id, "USER_ID": reminder["ID"], "REMINDER": reminder["TEXT"], "FUTURE": reminder["FUTURE"], "FUTURE_TEXT": reminder["FUTURE_TEXT"], "JUMP_LINK": None}
-                user_reminder_ids[reminder["ID"]] = user_reminder_id + 1
-                new_reminders.append(new_reminder)
-            schema_1_migration_reminders = new_reminders
-            await self.config.schema_version.set(1)
-
-        if schema_version < 2:  # noqa: PLR2004
-            # Migrate to REMINDER custom config group
-            current_reminders = schema_1_migration_reminders
-            if not current_reminders:
-                current_reminders = await self.config.get_raw("reminders", default=[])
-            for reminder in current_reminders:
-                # Get normalized expires datetime
-                try:
-                    expires_normalized = datetime.datetime.fromtimestamp(reminder["FUTURE"], datetime.UTC)
-                except (OverflowError, ValueError):
-                    expires_normalized = datetime.datetime(datetime.MAXYEAR, 12, 31, 23, 59, 59, 0, tzinfo=datetime.UTC)
-                # Try and convert the future text over to an actual point in time
-                created_converted = expires_normalized - relativedelta(seconds=1)
-                log.debug(
-                    "Converting to relativedelta object: %s", reminder["FUTURE_TEXT"]
-                )
-                try:
-                    parse_result = self.reminder_parser.parse(reminder["FUTURE_TEXT"].strip())
-                    in_dict = parse_result["in"]
-                    in_delta = relativedelta(**in_dict)
-                    created_converted = expires_normalized - in_delta
-                    log.debug("Successfully converted to relativedelta object: %s", self.humanize_relativedelta(in_delta))
-                except (OverflowError, ParseException, ValueError, TypeError):
-                    log.warning('Failed to convert to datetime object for migration: %s, using "1 second" ago as created time', reminder["FUTURE_TEXT"])
-                # Required fields
-                new_reminder = {"text": reminder["REMINDER"], "created": int(created_converted.timestamp()), "expires": int(expires_normalized.timestamp())}
-                # Optional fields
-                if reminder.get("JUMP_LINK"):
-                    new_reminder["jump_link"] = reminder["JUMP_LINK"]
-                if reminder.get("REPEAT"):
-                    new_reminder["repeat"] = self.relativedelta_to_dict(relativedelta(seconds=reminder["REPEAT"]))
-                # Save config
-                await self.config.custom(
-                    "REMINDER",
-                    str(reminder["USER_ID"]),
-                    str(reminder["USER_REMINDER_ID"]),
-                ).set(new_reminder)
-            await self.config.clear_raw("reminders")
-            await self.config.schema_version.set(2)
+        """Perform some configuration migrations.
+
+        Reminders saved by older versions of the cog are migrated in the background, so that
+        everything else can start up right away. Their IDs are reserved in the reminder index
+        first, so nothing else can take them in the meantime.
+        """
+        if await self.config.schema_version() >= 2:  # noqa: PLR2004
+            return
+        migration = LegacyMigration(self.config, self._convert_legacy_reminder)
+        for user_id, user_reminder_id in await migration.load():
+            self.reminder_index.reserve(user_id, user_reminder_id)
+        log.info("Migrating %d legacy reminders in the background, starting from %d.", len(migration), migration.position)
+        self.legacy_migration = migration
+        self.legacy_migration_task = asyncio.create_task(self._run_legacy_migration())
+
+    async def _run_legacy_migration(self) -> None:
+        """Migrate the legacy reminders, putting each chunk on the schedule as soon as it is saved."""
+        try:
+            with self.config_access.measure("legacy migration"):
+                await self.legacy_migration.run(self._save_migrated_reminders)
+        except Exception:
+            log.exception("Failed to migrate legacy reminders, will pick up where it left off when the cog is next loaded: ")
+        finally:
+            self.legacy_migration = None
+
+    async def _save_migrated_reminders(self, reminders: list[tuple[int, int, dict]]) -> None:
+        """Save a chunk of migrated reminders, and schedule them."""
+        await self.reminder_store.set_many(reminders)
+        for user_id, user_reminder_id, reminder in reminders:
+            self.schedule.push(user_id, user_reminder_id, reminder["expires"])
+            self.reminder_index.set(user_id, user_reminder_id, reminder["expires"])
+        self.schedule.wake()
+
+    def _convert_legacy_reminder(self, reminder: dict) -> dict:
+        """Convert a schema version 1 legacy reminder into a reminder."""
+        # Get normalized expires datetime
+        try:
+            expires_normalized = datetime.datetime.fromtimestamp(reminder["FUTURE"], datetime.UTC)
+        except (OverflowError, ValueError):
+            expires_normalized = datetime.datetime(datetime.MAXYEAR, 12, 31, 23, 59, 59, 0, tzinfo=datetime.UTC)
+        # Try and convert the future text over to an actual point in time
+        created_converted = expires_normalized - relativedelta(seconds=1)
+        log.debug(
+            "Converting to relativedelta object: %s", reminder["FUTURE_TEXT"]
+        )
+        try:
+            parse_result = self.reminder_parser.parse(reminder["FUTURE_TEXT"].strip())
+            in_dict = parse_result["in"]
+            in_delta = relativedelta(**in_dict)
+            created_converted = expires_normalized - in_delta
+            log.debug("Successfully converted to relativedelta object: %s", self.humanize_relativedelta(in_delta))
+        except (OverflowError, ParseException, ValueError, TypeError):
+            log.warning('Failed to convert to datetime object for migration: %s, using "1 second" ago as created time', reminder["FUTURE_TEXT"])
+        # Required fields
+        new_reminder = {"text": reminder["REMINDER"], "created": int(created_converted.timestamp()), "expires": int(expires_normalized.timestamp())}
+        # Optional fields
+        if reminder.get("JUMP_LINK"):
+            new_reminder["jump_link"] = reminder["JUMP_LINK"]
+        if reminder.get("REPEAT"):
+            new_reminder["repeat"] = self.relativedelta_to_dict(relativedelta(seconds=reminder["REPEAT"]))
+        return new_reminder
+
+    async def _open_reminder_store(self, backend: str) -> BufferedReminderStore:
+        """Open the reminder store for a storage backend ("config" or "sqlite")."""
+        return BufferedReminderStore(await self._open_backend_store(backend))
+
+    async def _open_backend_store(self, backend: str) -> ReminderStore:
+        """Open the store for a storage backend ("config" or "sqlite"), without any buffering."""
+        if backend == "sqlite":
+            backend_store: ReminderStore = SqliteReminderStore(cog_data_path(self) / "reminders.db", self.default_reminder_settings)
+        else:
+            backend_store = ConfigReminderStore(self.config, self.default_reminder_settings)
+        await backend_store.initialize()
+        return backend_store
+
+    async def _build_schedule(self) -> None:
+        """Load every pending reminder into the in-memory schedule and reminder index.
+
+        This is the only time every reminder is read. From here on out, they are kept
+        up to date by insert_reminder, update_bg_task, and _send_reminder.
+        """
+        schedule_entries = await self.reminder_store.schedule_entries()
+        self.schedule.build(schedule_entries)
+        self.reminder_index.build(schedule_entries)
+        log.debug("Loaded %d reminders into the schedule.", len(self.schedule))
+
+    def _snapshot_path(self) -> Path:
+        """Get where the schedule snapshot for the current storage backend is kept."""
+        return cog_data_path(self) / f"schedule-{self.storage_backend}.snapshot"
+
+    async def _load_snapshot(self) -> bool:
+        """Load the schedule and reminder index from the last snapshot, returning False if there isn't an up to date one.
+
+        A snapshot is only up to date if it was taken at the current storage generation, which
+        the reminder store moves on before changing any reminders after a snapshot is taken.
+        """
+        generation = await self.reminder_store.generation()
+        schedule_entries = read_snapshot(self._snapshot_path(), generation)
+        if schedule_entries is None:
+            log.debug("No up to date schedule snapshot, rebuilding the schedule from the reminder store.")
+            return False
+        self.schedule.build(schedule_entries)
+        self.reminder_index.build(schedule_entries)
+        log.debug("Loaded %d reminders into the schedule from the snapshot.", len(self.schedule))
+        return True
+
+    async def _save_snapshot(self) -> bool:
+        """Save the reminder index to the snapshot, returning False if reminders are being saved right now."""
+        generation = await self.reminder_store.checkpoint()
+        if generation is None:
+            log.debug("Reminders are being saved, skipping the schedule snapshot.")
+            return False
+        # Nothing else has run since the checkpoint, so the reminder index matches the generation
+        data = pack_snapshot(generation, self.reminder_index.entries())
+        await asyncio.get_running_loop().run_in_executor(None, write_snapshot, self._snapshot_path(), data)
+        return True
 
     #
     # Listener methods
@@ -172,47 +327,50 @@ class RemindMe(
         """Watches for bell reactions on reminder messages."""
         if str(payload.emoji) != self.reminder_emoji:
             return
-        if not payload.guild_id or await self.bot.cog_disabled_in_guild_raw(self.qualified_name, payload.guild_id):
-            return
-        guild = self.bot.get_guild(payload.guild_id)
-        if not guild:
-            return
-        if not await self.config.guild(guild).me_too():
-            return
-        member = guild.get_member(payload.user_id)
-        if not member:
-            return
-        if member.bot:
-            return
+        with self.config_access.measure("me too reaction"):
+            if not payload.guild_id or await self.bot.cog_disabled_in_guild_raw(self.qualified_name, payload.guild_id):
+                return
+            guild = self.bot.get_guild(payload.guild_id)
+            if not guild:
+                return
+            if not await self.config.guild(guild).me_too():
+                return
+            member = guild.get_member(payload.user_id)
+            if not member:
+                return
+            if member.bot:
+                return
+            if self.trace.recording:
+                self.trace.record("react", u=self.trace.pseudonym(member.id), m=self.trace.pseudonym(payload.message_id), g=self.trace.pseudonym(guild.id))
 
-        try:
-            reminder = self.me_too_reminders[payload.message_id]
-            clicked_set = self.clicked_me_too_reminder[payload.message_id]
-            if member.id in clicked_set:
-                return  # User clicked the bell again, not going to add a duplicate reminder
-            clicked_set.add(member.id)
-            if await self.insert_reminder(member.id, reminder):
-                expires_delta = relativedelta(
-                    datetime.datetime.fromtimestamp(reminder["expires"], datetime.UTC),
-                    datetime.datetime.fromtimestamp(reminder["created"], datetime.UTC),
-                )
-                repeat_delta = None
-                if reminder.get("repeat"):
-                    repeat_delta = relativedelta(reminder["repeat"])
-                message = "Hello! I will also send you "
-                if repeat_delta:
-                    message += f"those repeating reminders every {self.humanize_relativedelta(repeat_delta)}"
-                else:
-                    message += f"that reminder in {self.humanize_relativedelta(expires_delta)} (<t:{reminder['expires']}:f>)"
-                if repeat_delta and expires_delta != repeat_delta:
-                    message += f", with the first reminder in {self.humanize_relativedelta(expires_delta)} (<t:{reminder['expires']}:f>)."
+            try:
+                reminder = self.me_too_reminders[payload.message_id]
+                clicked_set = self.clicked_me_too_reminder[payload.message_id]
+                if member.id in clicked_set:
+                    return  # User clicked the bell again, not going to add a duplicate reminder
+                clicked_set.add(member.id)
+                if await self.insert_reminder(member.id, reminder):
+                    expires_delta = relativedelta(
+                        datetime.datetime.fromtimestamp(reminder["expires"], datetime.UTC),
+                        datetime.datetime.fromtimestamp(reminder["created"], datetime.UTC),
+                    )
+                    repeat_delta = None
+                    if reminder.get("repeat"):
+                        repeat_delta = relativedelta(reminder["repeat"])
+                    message = "Hello! I will also send you "
+                    if repeat_delta:
+                        message += f"those repeating reminders every {self.humanize_relativedelta(repeat_delta)}"
+                    else:
+                        message += f"that reminder in {self.humanize_relativedelta(expires_delta)} (<t:{reminder['expires']}:f>)"
+                    if repeat_delta and expires_delta != repeat_delta:
+                        message += f", with the first reminder in {self.humanize_relativedelta(expires_delta)} (<t:{reminder['expires']}:f>)."
+                    else:
+                        message += "."
+                    await member.send(message)
                 else:
-                    message += "."
-                await member.send(message)
-            else:
-                await self.send_too_many_message(member)
-        except KeyError:
-            return
+                    await self.send_too_many_message(member)
+            except KeyError:
+                return
 
     #
     # Background loop methods
@@ -242,93 +400,119 @@ class RemindMe(
                 task.add_done_callback(self.background_tasks.discard)
         self.bg_loop_task = self.bot.loop.create_task(self._bg_loop())
         self.bg_loop_task.add_done_callback(error_handler)
+        self.prerender_task = self.bot.loop.create_task(self._prerender_loop())
+        self.snapshot_task = self.bot.loop.create_task(self._snapshot_loop())
 
     async def _bg_loop(self) -> None:
-        """Background loop."""
+        """Background loop.
+
+        Sleeps until the next reminder is due (or update_bg_task tells it the schedule changed),
+        rather than polling. Anything that came due while we were offline is caught up on first.
+        """
         await self.bot.wait_until_ready()
-        self.search_for_next_reminder = True
+        with self.config_access.measure("catch up"):
+            await self._catch_up()
+        loop = asyncio.get_running_loop()
         while True:
-            current_time_seconds = int(datetime.datetime.now(datetime.UTC).timestamp())
-            # Check if we need to send the current reminder
-            if (
-                not self.next_reminder_to_send
-                or current_time_seconds < self.next_reminder_to_send["expires"]
-            ):
-                await asyncio.sleep(1)
-            else:
-                await self._send_reminder(self.next_reminder_to_send)
-                self.search_for_next_reminder = True
+            # Hand every reminder that is due (or due for a retry) off to the send workers
+            search_started = time.perf_counter()
+            due = [((user_id, user_reminder_id), expires) for expires, user_id, user_reminder_id in self.schedule.pop_due(time.time())]
+            due.extend((key, None) for key in self.retry_queue.pop_due(loop.time()))
+            self.metrics.observe("schedule_search_seconds", time.perf_counter() - search_started)
+            for key, expires in due:
+                if key in self.sending:
+                    # Goes back on the send queue once the send worker is done with it
+                    self.send_again[key] = expires
+                    continue
+                self.sending.add(key)
+                self.send_queue.put_nowait((key, expires))
+            if due:
+                self.metrics.observe("send_queue_depth", self.send_queue.qsize())
 
-            # Check if we need to retry a failed reminder
-            if self.problematic_reminders and not current_time_seconds % 15:
-                retry_reminder = self.problematic_reminders.pop(0)
-                log.debug(
-                    "Retrying user=%d, id=%d...",
-                    retry_reminder["user_id"],
-                    retry_reminder["user_reminder_id"],
+            # Notify owners that there is a reminder that failed to send and is now retrying
+            if self.retry_queue and not self.sent_retry_warning:
+                self.sent_retry_warning = True
+                await self.bot.send_to_owners(
+                    "I am running into an issue sending out reminders currently.\n"
+                    "I will keep retrying every so often until it can be sent, in case this is just a network issue.\n"
+                    "Check your console or logs for details, and consider opening a bug report for this if it isn't a network issue."
                 )
-                await self._send_reminder(retry_reminder)
-
-            # Find a new reminder
-            if self.search_for_next_reminder:
-                log.debug("Looking for next reminder...")
-                self.next_reminder_to_send = {}
-                self.search_for_next_reminder = False
-                all_reminders = await self.config.custom(
-                    "REMINDER"
-                ).all()  # Does NOT return default values
-                existing_problematic_reminders = []
-                for user_id, users_reminders in all_reminders.items():
-                    for user_reminder_id, partial_reminder in users_reminders.items():
-                        # If the reminder is expiring sooner than the one we have on deck to send...
-                        if (
-                            not self.next_reminder_to_send
-                            or partial_reminder["expires"]
-                            < self.next_reminder_to_send["expires"]
-                        ):
-                            full_reminder = self._get_full_reminder_from_partial(
-                                int(user_id),
-                                int(user_reminder_id),
-                                partial_reminder,
-                            )
-                            if full_reminder not in self.problematic_reminders:
-                                self.next_reminder_to_send = full_reminder.copy()
-                            else:
-                                existing_problematic_reminders.append(
-                                    full_reminder.copy()
-                                )
-
-                # Update retry list
-                self.problematic_reminders = existing_problematic_reminders
-                # Notify owners that there is a reminder that failed to send and is now retrying
-                if self.problematic_reminders and not self.sent_retry_warning:
-                    self.sent_retry_warning = True
-                    await self.bot.send_to_owners(
-                        "I am running into an issue sending out reminders currently.\n"
-                        "I will keep retrying every so often until it can be sent, in case this is just a network issue.\n"
-                        "Check your console or logs for details, and consider opening a bug report for this if it isn't a network issue."
-                    )
-                elif self.sent_retry_warning and not self.problematic_reminders:
-                    self.sent_retry_warning = False
-                    await self.bot.send_to_owners("Seems like I was able to send all of the backlogged reminders!")
-
-                if self.next_reminder_to_send:
-                    log.debug(
-                        "Next reminder is for user=%d, id=%d. It will be sent in %s.",
-                        self.next_reminder_to_send["user_id"],
-                        self.next_reminder_to_send["user_reminder_id"],
-                        self.humanize_relativedelta(
-                            relativedelta(
-                                datetime.datetime.fromtimestamp(
-                                    self.next_reminder_to_send["expires"],
-                                    datetime.UTC,
-                                ),
-                                datetime.datetime.now(datetime.UTC),
-                            )
-                        ),
-                    )
-                else:
-                    log.debug("There are no more reminders left to send.")
+            elif self.sent_retry_warning and not self.retry_queue:
+                self.sent_retry_warning = False
+                await self.bot.send_to_owners("Seems like I was able to send all of the backlogged reminders!")
+
+            # Sleep until there is something to do
+            next_retry_time = self.retry_queue.next_attempt()
+            await self.schedule.wait(None if next_retry_time is None else next_retry_time - loop.time())
+
+    async def _prerender_loop(self) -> None:
+        """Prerender the embeds of reminders that are about to be sent, so that sending them is just the HTTP request."""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                with self.config_access.measure("prerender"):
+                    await self._prerender(time.time() + self.PRERENDER_SECONDS)
+            except Exception:
+                log.exception("Unexpected exception occurred while prerendering reminders: ")
+            await asyncio.sleep(self.PRERENDER_INTERVAL_SECONDS)
+
+    async def _snapshot_loop(self) -> None:
+        """Save the schedule snapshot every so often, so that a crash doesn't always mean rebuilding the schedule."""
+        while True:
+            await asyncio.sleep(self.SNAPSHOT_INTERVAL_SECONDS)
+            try:
+                with self.config_access.measure("snapshot"):
+                    await self._save_snapshot()
+            except Exception:
+                log.exception("Unexpected exception occurred while saving the schedule snapshot: ")
+
+    async def _prerender(self, until: float) -> None:
+        """Prerender the embeds of reminders due at or before until, and forget any that are no longer due then."""
+        upcoming = set()
+        for _, user_id, user_reminder_id in self.schedule.due_before(until):
+            key = (user_id, user_reminder_id)
+            upcoming.add(key)
+            if key in self.prerendered:
+                continue
+            try:
+                user = await self.user_resolver.resolve(user_id)
+            except discord.HTTPException:
+                continue  # We'll try again when sending it
+            full_reminder = await self._get_full_reminder(user_id, user_reminder_id)
+            if user is None or full_reminder is None:
+                continue
+            self.prerendered[key] = (full_reminder, await self._generate_reminder_embed(user, full_reminder))
+        for key in [key for key in self.prerendered if key not in upcoming and key not in self.sending]:
+            del self.prerendered[key]
+
+    async def _send_worker(self) -> None:
+        """Send out reminders handed off by the background loop, until told to stop."""
+        while True:
+            queued = await self.send_queue.get()
+            try:
+                if queued is None:
+                    return
+                key, expires = queued
+                with self.config_access.measure("send reminder"):
+                    full_reminder = await self._get_full_reminder(*key)
+                    if not full_reminder:
+                        # Reminder was deleted while it was waiting to be sent (or retried)
+                        self.retry_queue.remove(*key)
+                    elif expires is not None and full_reminder["expires"] != expires and full_reminder["expires"] > time.time():
+                        # Rescheduled while it was waiting to be sent, so it is already back in the schedule
+                        pass
+                    else:
+                        await self._send_reminder(full_reminder)
+            except Exception:
+                log.exception("Unexpected exception occurred while sending a reminder: ")
+            finally:
+                if queued is not None:
+                    key = queued[0]
+                    if key in self.send_again:
+                        self.send_queue.put_nowait((key, self.send_again.pop(key)))
+                    else:
+                        self.sending.discard(key)
+                self.send_queue.task_done()
 
     #
     # Private methods
@@ -337,36 +521,125 @@ class RemindMe(
     async def _send_reminder(self, full_reminder: dict) -> None:
         """Send reminders that have expired."""
         delete = False
-        user = self.bot.get_user(full_reminder["user_id"])
-        if user is None:
-            log.debug(
-                "User=%d is not visible to the bot. Deleting reminder.",
-                full_reminder["user_id"],
-            )
-            delete = True
-        else:
-            embed = await self._generate_reminder_embed(user, full_reminder)
-            try:
-                log.debug("Sending reminder to user=%d...", full_reminder["user_id"])
-                await user.send(embed=embed)
-            except (discord.Forbidden, discord.NotFound):
-                # Can't send DM's to user: delete reminder
+        prerendered = self.prerendered.pop((full_reminder["user_id"], full_reminder["user_reminder_id"]), None)
+        embed = prerendered[1] if prerendered and prerendered[0] == full_reminder else None
+        try:
+            user = await self.user_resolver.resolve(full_reminder["user_id"])
+            if user is None:
                 log.debug(
-                    "User=%d doesn't allow DMs. Deleting reminder.",
+                    "User=%d can't be reached by the bot. Deleting reminder.",
                     full_reminder["user_id"],
                 )
                 delete = True
-            except discord.HTTPException as http_exception:
-                # Something weird happened: retry next time
-                log.warning("HTTP exception when trying to send reminder for user=%d, id=%d:\n%s", full_reminder["user_id"], full_reminder["user_reminder_id"], str(http_exception))
-                self.problematic_reminders.append(full_reminder)
-                return
+                self._record_send(full_reminder, "unreachable")
             else:
-                total_sent = await self.config.total_sent()
-                await self.config.total_sent.set(total_sent + 1)
+                if embed is None:
+                    embed = await self._generate_reminder_embed(user, full_reminder)
+                embed = self._mark_reminder_delayed(embed, full_reminder)
+                log.debug("Sending reminder to user=%d...", full_reminder["user_id"])
+                await self._send_dm(user, embed)
+                self.total_sent.increment()
+                self._record_send(full_reminder, "sent")
+        except (discord.Forbidden, discord.NotFound):
+            # Can't send DM's to user: delete reminder
+            log.debug(
+                "User=%d doesn't allow DMs. Deleting reminder.",
+                full_reminder["user_id"],
+            )
+            delete = True
+            self._record_send(full_reminder, "forbidden")
+        except discord.HTTPException as http_exception:
+            # Something weird happened: retry in a bit
+            log.warning("HTTP exception when trying to send reminder for user=%d, id=%d:\n%s", full_reminder["user_id"], full_reminder["user_reminder_id"], str(http_exception))
+            self._record_send(full_reminder, "error", status=http_exception.status, retry_after=rate_limit_retry_after(http_exception))
+            if self.retry_queue.add(full_reminder["user_id"], full_reminder["user_reminder_id"], asyncio.get_running_loop().time()):
+                self.schedule.wake()
+                return
+            # Give up on this one (a repeating reminder will still be sent next time)
+            self.metrics.observe("send_retries", self.retry_queue.MAX_ATTEMPTS - 1)
+            log.warning(
+                "Giving up on reminder for user=%d, id=%d after %d failed attempts.",
+                full_reminder["user_id"],
+                full_reminder["user_reminder_id"],
+                self.retry_queue.MAX_ATTEMPTS,
+            )
+            self.schedule.wake()
 
-        # Get the config for editing
-        config_reminder = self.config.custom("REMINDER", str(full_reminder["user_id"]), str(full_reminder["user_reminder_id"]))
+        # Save all changes with one write, group committed with any other reminders sent around now
+        self.reminder_store.stage(self._sent_reminder_changes(full_reminder, delete=delete))
+
+    async def _send_dm(self, user: discord.User, embed: discord.Embed) -> None:
+        """DM a user, paced by the send limiter (behind any command replies)."""
+        await self.send_lanes.acquire(SendLanes.BULK)
+        started = time.perf_counter()
+        try:
+            channel = await self.user_resolver.dm_channel(user)
+            await channel.send(embed=embed)
+        except (discord.Forbidden, discord.NotFound):
+            self.user_resolver.mark_unreachable(user.id)
+            raise
+        except discord.HTTPException as http_exception:
+            retry_after = rate_limit_retry_after(http_exception)
+            if retry_after is not None:
+                log.warning("Rate limited while sending reminders, slowing down.")
+                self.send_limiter.rate_limited(retry_after)
+            raise
+        finally:
+            self.metrics.observe("send_latency_seconds", time.perf_counter() - started)
+        self.send_limiter.succeeded()
+
+    async def _trace_command(self, ctx: commands.Context) -> None:
+        """Record a command in the trace, along with the times (but none of the text) it was given."""
+        arguments = self.trace.command_arguments(ctx)
+        scrubbed = self.trace.scrub(arguments, choices=self.TRACE_CHOICES)
+        for argument in ("time_and_optional_text", "time"):
+            value = arguments.get(argument)
+            if isinstance(value, str) and not isinstance(scrubbed[argument], str):
+                with suppress(ParseException, ReminderParseTooExpensiveError):
+                    # Answered from the parse cache when the command parses it again
+                    parse_result = await self.reminder_parser.parse_guarded(value.strip())
+                    scrubbed[argument] = {key: parse_result[key] for key in ("in", "every") if key in parse_result} | {"len": len(parse_result.get("text", ""))}
+        self.trace.record(
+            "command",
+            c=ctx.command.qualified_name,
+            u=self.trace.pseudonym(ctx.author.id),
+            g=self.trace.pseudonym(ctx.guild.id) if ctx.guild else None,
+            a=scrubbed or None,
+        )
+
+    def _record_send(self, full_reminders: dict | list[dict], outcome: str, **fields: Any) -> None:  # noqa: ANN401
+        """Record how sending a reminder (or a digest of them) went in the metrics, and in the trace if we are recording."""
+        digest = isinstance(full_reminders, list)
+        now = time.time()
+        for full_reminder in full_reminders if digest else [full_reminders]:
+            if outcome == "sent":
+                self.metrics.observe("send_lateness_seconds", max(0.0, now - full_reminder["expires"]))
+            if outcome != "error" and not digest:
+                # This is called before the reminder leaves the retry queue
+                self.metrics.observe("send_retries", self.retry_queue.attempts(full_reminder["user_id"], full_reminder["user_reminder_id"]))
+            if not self.trace.recording:
+                continue
+            self.trace.record(
+                "send",
+                u=self.trace.pseudonym(full_reminder["user_id"]),
+                r=full_reminder["user_reminder_id"],
+                o=outcome,
+                late=round(now - full_reminder["expires"], 3),
+                c=self.trace.relative(full_reminder["created"]) if full_reminder.get("created") else None,
+                n=len(full_reminder["text"]),
+                rep=full_reminder.get("repeat") or None,
+                digest=digest or None,
+                **fields,
+            )
+
+    def _sent_reminder_changes(self, full_reminder: dict, *, delete: bool) -> ReminderChanges:
+        """Reschedule (or unschedule) a reminder that has been sent, returning the changes to save."""
+        user_id = full_reminder["user_id"]
+        user_reminder_id = full_reminder["user_reminder_id"]
+        changes = ReminderChanges(user_id, user_reminder_id)
+        if self.retry_queue.remove(user_id, user_reminder_id):
+            # Let the background loop know in case this was the last reminder being retried
+            self.schedule.wake()
 
         # Handle repeats and deletes
         if not delete and full_reminder["repeat"]:
@@ -374,46 +647,168 @@ class RemindMe(
             now = datetime.datetime.now(datetime.UTC)
             if now + relativedelta(**full_reminder["repeat"]) < now + relativedelta(days=1):
                 full_reminder["repeat"] = {"days": 1}
-                await config_reminder.repeat.set(full_reminder["repeat"])
-            # Calculate next reminder
-            next_reminder_time = datetime.datetime.fromtimestamp(full_reminder["expires"], datetime.UTC)
-            repeat_time = relativedelta(**full_reminder["repeat"])
+                changes.set(repeat=full_reminder["repeat"])
+            # Calculate next reminder, skipping straight past any we missed
             try:
-                while next_reminder_time < now:
-                    next_reminder_time = next_reminder_time + repeat_time
+                next_reminder_time = next_occurrence(
+                    datetime.datetime.fromtimestamp(full_reminder["expires"], datetime.UTC),
+                    relativedelta(**full_reminder["repeat"]),
+                    now,
+                )
                 # Set new reminder time
-                await config_reminder.created.set(full_reminder["expires"])
-                await config_reminder.expires.set(int(next_reminder_time.timestamp()))
+                next_expires = int(next_reminder_time.timestamp())
+                changes.set(created=full_reminder["expires"], expires=next_expires)
+                self.schedule.push(user_id, user_reminder_id, next_expires)
+                self.reminder_index.set(user_id, user_reminder_id, next_expires)
+                # The background loop may be asleep with nothing else scheduled
+                self.schedule.wake()
             except (OverflowError, ValueError):
                 # Next repeat would be after the year 9999. We don't support that.
-                await config_reminder.clear()
+                changes.delete()
+                self.schedule.remove(user_id, user_reminder_id)
+                self.reminder_index.remove(user_id, user_reminder_id)
         else:
-            await config_reminder.clear()
-        # Search for next reminder, in case this was a successful retry reminder
-        self.search_for_next_reminder = True
+            changes.delete()
+            self.schedule.remove(user_id, user_reminder_id)
+            self.reminder_index.remove(user_id, user_reminder_id)
+        return changes
+
+    async def _catch_up(self) -> None:
+        """Send out every reminder that came due while we were offline.
+
+        Users with more than one overdue reminder get them all in a single digest rather than
+        one DM each, and every resulting repeat/delete is saved in one group commit. Users with just
+        one overdue reminder are left for the send workers, as usual.
+        """
+        overdue: dict[int, list[dict]] = {}
+        for user_id, user_reminder_id, reminder in await self.reminder_store.due_before(int(time.time())):
+            if reminder["expires"] is None or (user_id, user_reminder_id) not in self.schedule:
+                continue
+            reminder.update({"user_id": user_id, "user_reminder_id": user_reminder_id})
+            overdue.setdefault(user_id, []).append(reminder)
+        digests = {user_id: full_reminders for user_id, full_reminders in overdue.items() if len(full_reminders) > 1}
+        if not digests:
+            return
+        for full_reminders in digests.values():
+            for full_reminder in full_reminders:
+                self.schedule.remove(full_reminder["user_id"], full_reminder["user_reminder_id"])
+                self.sending.add((full_reminder["user_id"], full_reminder["user_reminder_id"]))
+
+        log.info(
+            "Catching up on %d overdue reminders for %d users.",
+            sum(len(full_reminders) for full_reminders in digests.values()),
+            len(digests),
+        )
+        semaphore = asyncio.Semaphore(max(1, self.send_worker_count))
+
+        async def send_digest(full_reminders: list[dict]) -> list[ReminderChanges]:
+            async with semaphore:
+                return await self._send_reminder_digest(full_reminders)
+
+        try:
+            for result in await asyncio.gather(*(send_digest(full_reminders) for full_reminders in digests.values())):
+                for changes in result:
+                    # These all end up in the same group commit
+                    self.reminder_store.stage(changes)
+        finally:
+            for full_reminders in digests.values():
+                for full_reminder in full_reminders:
+                    self.sending.discard((full_reminder["user_id"], full_reminder["user_reminder_id"]))
+
+    async def _send_reminder_digest(self, full_reminders: list[dict]) -> list[ReminderChanges]:
+        """Send a user all of their overdue reminders at once, returning the changes to save."""
+        user_id = full_reminders[0]["user_id"]
+        delete = False
+        try:
+            user = await self.user_resolver.resolve(user_id)
+            if user is None:
+                log.debug("User=%d can't be reached by the bot. Deleting reminders.", user_id)
+                delete = True
+                self._record_send(full_reminders, "unreachable")
+            else:
+                embeds = split_embed(await self._generate_reminder_digest_embed(user, full_reminders))
+                log.debug("Sending %d overdue reminders to user=%d...", len(full_reminders), user_id)
+                for embed in embeds:
+                    await self._send_dm(user, embed)
+                self.total_sent.increment(len(full_reminders))
+                self._record_send(full_reminders, "sent")
+        except (discord.Forbidden, discord.NotFound):
+            # Can't send DM's to user: delete reminders
+            log.debug("User=%d doesn't allow DMs. Deleting reminders.", user_id)
+            delete = True
+            self._record_send(full_reminders, "forbidden")
+        except discord.HTTPException as http_exception:
+            # Something weird happened: put them back, and let the send workers retry them one by one
+            log.warning("HTTP exception when trying to send overdue reminders for user=%d:\n%s", user_id, str(http_exception))
+            self._record_send(full_reminders, "error", status=http_exception.status, retry_after=rate_limit_retry_after(http_exception))
+            for full_reminder in full_reminders:
+                self.schedule.push(user_id, full_reminder["user_reminder_id"], full_reminder["expires"])
+            return []
+        return [self._sent_reminder_changes(full_reminder, delete=delete) for full_reminder in full_reminders]
 
     async def _generate_reminder_embed(
         self, user: discord.User, full_reminder: dict
     ) -> discord.Embed:
-        """Generate the reminder embed."""
-        # Determine any delay
-        current_time = datetime.datetime.now(datetime.UTC)
-        current_time_seconds = int(current_time.timestamp())
-        delay = current_time_seconds - full_reminder["expires"]
-        if delay < self.SEND_DELAY_SECONDS:
-            delay = 0
+        """Generate the reminder embed, as if it were being sent right on time.
+
+        If it isn't, _mark_reminder_delayed will patch that in at send time.
+        """
         # Title
         embed = discord.Embed(
             # title=f":bell:{' (Delayed)' if delay else ''} Reminder! :bell:",
             color=await self.bot.get_embed_color(user),
         )
+        on_time = datetime.datetime.fromtimestamp(full_reminder["expires"], datetime.UTC)
+        embed.add_field(**self._generate_reminder_field(on_time, full_reminder))
+        return embed
+
+    def _mark_reminder_delayed(self, embed: discord.Embed, full_reminder: dict) -> discord.Embed:
+        """Get a copy of a reminder embed marked as delayed, if it is being sent late. Otherwise, get it as is."""
+        # Determine any delay
+        current_time = datetime.datetime.now(datetime.UTC)
+        delay = self._reminder_delay(current_time, full_reminder)
+        if not delay:
+            return embed
+        embed = embed.copy()
         # Footer if delay
+        embed.set_footer(
+            text=f"This was supposed to send {self.humanize_relativedelta(relativedelta(seconds=delay))} ago.\n"
+            "I might be having network or server issues, or perhaps I just started up.\n"
+            "Sorry about that!"
+        )
+        embed.set_field_at(0, **self._generate_reminder_field(current_time, full_reminder))
+        return embed
+
+    async def _generate_reminder_digest_embed(
+        self, user: discord.User, full_reminders: list[dict]
+    ) -> discord.Embed:
+        """Generate an embed with many overdue reminders in it."""
+        current_time = datetime.datetime.now(datetime.UTC)
+        embed = discord.Embed(
+            description=f"You have {len(full_reminders)} reminders that came due while I was away:",
+            color=await self.bot.get_embed_color(user),
+        )
+        delay = max(self._reminder_delay(current_time, full_reminder) for full_reminder in full_reminders)
         if delay:
             embed.set_footer(
-                text=f"This was supposed to send {self.humanize_relativedelta(relativedelta(seconds=delay))} ago.\n"
+                text=f"The oldest of these was supposed to send {self.humanize_relativedelta(relativedelta(seconds=delay))} ago.\n"
                 "I might be having network or server issues, or perhaps I just started up.\n"
                 "Sorry about that!"
             )
+        for full_reminder in full_reminders:
+            embed.add_field(**self._generate_reminder_field(current_time, full_reminder), inline=False)
+        return embed
+
+    def _reminder_delay(self, current_time: datetime.datetime, full_reminder: dict) -> int:
+        """Get how many seconds late a reminder is, or 0 if it is close enough to on time."""
+        delay = int(current_time.timestamp()) - full_reminder["expires"]
+        if delay < self.SEND_DELAY_SECONDS:
+            delay = 0
+        return delay
+
+    def _generate_reminder_field(self, current_time: datetime.datetime, full_reminder: dict) -> dict[str, str]:
+        """Generate the embed field (name and value) for a single reminder."""
+        delay = self._reminder_delay(current_time, full_reminder)
         # Field name
         field_name = f":bell:{' (Delayed)' if delay else ''}{' Repeating' if full_reminder['repeat'] else ''} Reminder! :bell:"
         # Field value - time ago
@@ -459,36 +854,15 @@ class RemindMe(
         if footer_part:
             field_value += f"\n\n{footer_part}"
 
-        embed.add_field(name=field_name, value=field_value)
-        return embed
+        return {"name": field_name, "value": field_value}
 
-    def _get_full_reminder_from_partial(
-        self,
-        user_id: int,
-        user_reminder_id: int,
-        partial_reminder: dict,
-    ) -> dict[str, Any]:
-        """Construct a full reminder from a partial reminder.
-
-        This reminder object will be the same as the partial_reminder passed in,
-        except that it will include the user_id, the user_reminder_id, as well as
-        any missing defaults (such as repeat).
-
-        DO NOT SAVE THIS BACK TO THE CONFIG! Doing so would be a waste of disk space.
-        Only save back specific modified values (and never user_id nor user_reminder_id).
-        """
-        result = self.config.custom(
-            "REMINDER",
-            str(user_id),
-            str(user_reminder_id),
-        ).nested_update(partial_reminder)
-        result.update(
-            {
-                "user_id": user_id,
-                "user_reminder_id": user_reminder_id,
-            }
-        )
-        return result
+    async def _get_full_reminder(self, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        """Load a single full reminder from the reminder store, or None if it no longer exists."""
+        full_reminder = await self.reminder_store.get(user_id, user_reminder_id)
+        if not full_reminder or full_reminder["expires"] is None:
+            return None
+        full_reminder.update({"user_id": user_id, "user_reminder_id": user_reminder_id})
+        return full_reminder
 
     #
     # Public methods
@@ -520,17 +894,18 @@ class RemindMe(
         """
         # Check that the user has room for another reminder
         maximum = await self.config.max_user_reminders()
-        users_partial_reminders = await self.config.custom("REMINDER", str(user_id)).all()  # Does NOT return default values
-        if len(users_partial_reminders) > maximum - 1:
+        if self.reminder_index.count(user_id) > maximum - 1:
             return False
 
         # Get next user_reminder_id
-        next_reminder_id = 1
-        while str(next_reminder_id) in users_partial_reminders:  # Keys are strings
-            next_reminder_id += 1
+        next_reminder_id = self.reminder_index.allocate(user_id)
 
         # Save new reminder
-        await self.config.custom("REMINDER", str(user_id), str(next_reminder_id)).set(reminder)
+        try:
+            await self.reminder_store.set(user_id, next_reminder_id, reminder)
+        except Exception:
+            self.reminder_index.remove(user_id, next_reminder_id)
+            raise
 
         # Update background task
         await self.update_bg_task(user_id, next_reminder_id, reminder)
@@ -547,6 +922,64 @@ class RemindMe(
             result[key] = value
         return result
 
+    async def switch_reminder_store(self, backend: str) -> int:
+        """Move every reminder over to a different storage backend, returning how many were moved.
+
+        Commands, the background loop and send workers carry on using the same (buffered) reminder store,
+        and wait for the move whenever they need to read or write reminders. The reminders themselves don't
+        change, so neither do the schedule and the reminder index.
+        """
+        backend_store = await self._open_backend_store(backend)
+        old_backend_store = self.reminder_store.store
+        try:
+            moved = await self.reminder_store.switch_to(backend_store)
+        except Exception:
+            await backend_store.close()
+            raise
+        # Right away, so that a schedule snapshot can never pair one backend with the other's generation
+        self.storage_backend = backend
+        await self.config.storage_backend.set(backend)
+        await old_backend_store.close()
+        log.info("Moved %d reminders to the %s storage backend.", moved, backend)
+        return moved
+
+    def resize_send_workers(self, count: int) -> None:
+        """Grow or shrink the pool of send workers, so that at most count reminders are sent at the same time."""
+        self.send_workers = {worker for worker in self.send_workers if not worker.done()}
+        while self.send_worker_count < count:
+            worker = asyncio.create_task(self._send_worker())
+            self.send_workers.add(worker)
+            self.send_worker_count += 1
+        while self.send_worker_count > count:
+            # Workers finish what is already queued before picking up the stop signal
+            self.send_queue.put_nowait(None)
+            self.send_worker_count -= 1
+
+    async def configure_metrics_exporter(self) -> None:
+        """Start (or stop) exporting metrics to Prometheus, as configured."""
+        port = await self.config.metrics_port()
+        if port != self.metrics_exporter.port:
+            try:
+                await self.metrics_exporter.serve(port)
+            except OSError:
+                log.exception("Failed to serve metrics on port %d: ", port)
+        path = cog_data_path(self) / "metrics.prom" if await self.config.metrics_file() else None
+        if path != self.metrics_exporter.path:
+            self.metrics_exporter.write_to(path)
+
+    async def render_metrics(self) -> str:
+        """Render the delivery metrics (and a few other numbers) in the Prometheus text format."""
+        return self.metrics.render_prometheus(
+            "remindme_",
+            {
+                "reminders_sent_total": ("counter", "How many reminders have been sent, ever.", await self.total_sent.get()),
+                "reminders_scheduled": ("gauge", "How many reminders are waiting to be sent.", len(self.schedule)),
+                "send_queue_length": ("gauge", "How many reminders are waiting for a send worker right now.", self.send_queue.qsize()),
+                "retry_queue_length": ("gauge", "How many reminders are waiting to be retried after failing to send.", len(self.retry_queue)),
+                "send_rate": ("gauge", "How many reminders per second we are currently allowed to send, after any backoff.", self.send_limiter.effective_rate),
+            },
+        )
+
     async def send_too_many_message(
         self,
         ctx_or_user: commands.Context | discord.Member | discord.User,
@@ -566,50 +999,36 @@ class RemindMe(
             await ctx_or_user.send(message)
 
     async def update_bg_task(self, user_id: int, user_reminder_id: int | None = None, partial_reminder: dict | None = None) -> None:
-        """Request the background task to consider a new (or updated) reminder.
+        """Update the background task schedule (and reminder index) for a new, modified, or deleted reminder.
 
         user_id is always required, user_reminder_id and partial_reminder are usually required,
         unless we are doing reminder deletions (and forgetme/red_delete_data_for_user)
         """
         user_id = int(user_id)
-        if user_reminder_id:
-            user_reminder_id = int(user_reminder_id)
-        if self.search_for_next_reminder:
-            # If the bg task is already going to perform a search soon
-            log.debug("Background task will be searching for new reminders soon")
-        elif not self.next_reminder_to_send:
-            # If the bg task isn't waiting on any reminders currently
-            self.search_for_next_reminder = True
-            log.debug("Background task has no reminders, forcing search")
-        elif not user_reminder_id and self.next_reminder_to_send["user_id"] == user_id:
+        if self.legacy_migration and not (partial_reminder and partial_reminder.get("expires") is not None):
+            # Make sure deleted reminders don't get migrated back in afterwards
+            await self.legacy_migration.forget(user_id, int(user_reminder_id) if user_reminder_id else None)
+            if user_reminder_id:
+                await self.reminder_store.delete(user_id, int(user_reminder_id))
+            else:
+                await self.reminder_store.delete_user(user_id)
+        if not user_reminder_id:
             # If there isn't a user_reminder_id, the user must have deleted all of their reminders
-            self.search_for_next_reminder = True
-            log.debug(
-                "Background task reminder user deleted all their reminders, forcing search"
-            )
-        elif (
-            self.next_reminder_to_send["user_id"] == user_id
-            and self.next_reminder_to_send["user_reminder_id"] == user_reminder_id
-        ):
-            # If the modified reminder is the one the bg task is going to send next
-            self.search_for_next_reminder = True
-            log.debug("Modified background task reminder, forcing search")
-        elif (
-            partial_reminder
-            and self.next_reminder_to_send["expires"] > partial_reminder["expires"]
-        ):
-            # If the new reminder expires sooner than the current next reminder
-            self.search_for_next_reminder = True
-            log.debug(
-                "New reminder expires before background task reminder, forcing search"
-            )
-        elif user_reminder_id and self.problematic_reminders:
-            # Check if the new reminder is currently being retried
-            for reminder in self.problematic_reminders:
-                if (
-                    reminder["user_id"] == user_id
-                    and reminder["user_reminder_id"] == user_reminder_id
-                ):
-                    self.search_for_next_reminder = True
-                    log.debug("Modified reminder is in the retry queue, forcing search")
-                    break
+            self.schedule.remove_user(user_id, self.reminder_index.ids(user_id))
+            self.reminder_index.remove_user(user_id)
+            self.retry_queue.remove_user(user_id)
+            log.debug("Removed all reminders for user=%d from the schedule", user_id)
+            self.schedule.wake()
+            return
+        user_reminder_id = int(user_reminder_id)
+        # A modified (or deleted) reminder no longer needs to be retried
+        self.retry_queue.remove(user_id, user_reminder_id)
+        if partial_reminder and partial_reminder.get("expires") is not None:
+            self.schedule.push(user_id, user_reminder_id, partial_reminder["expires"])
+            self.reminder_index.set(user_id, user_reminder_id, partial_reminder["expires"])
+            log.debug("Scheduled reminder for user=%d, id=%d", user_id, user_reminder_id)
+        else:
+            self.schedule.remove(user_id, user_reminder_id)
+            self.reminder_index.remove(user_id, user_reminder_id)
+            log.debug("Removed reminder for user=%d, id=%d from the schedule", user_id, user_reminder_id)
+        self.schedule.wake()
@@ -0,0 +1,218 @@
+"""Unit tests for the RemindMe cog."""
+
+import asyncio
+import contextlib
+import datetime
+import json
+import sys
+import tempfile
+import time
+import unittest
+from collections.abc import Iterator
+from pathlib import Path
+from unittest import mock
+
+import discord
+from discord.ext.commands.view import StringView
+from redbot.core import commands, data_manager
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from remindme.delivery import SendLanes
+from remindme.remindme import RemindMe
+
+DAY = 24 * 60 * 60
+# How long (in real time) to wait for a reminder to be sent
+WAIT_SECONDS = 5.0
+
+
+class FakeUser:
+    def __init__(self, user_id: int) -> None:
+        """Init."""
+        self.id = user_id
+        self.bot = False
+        self.dm_channel = self
+        self.sent: list[discord.Embed | str | None] = []
+        self._sent_changed = asyncio.Condition()
+
+    async def create_dm(self) -> "FakeUser":
+        return self
+
+    async def send(
+        self, content: str | None = None, *, embed: discord.Embed | None = None
+    ) -> None:
+        async with self._sent_changed:
+            self.sent.append(embed or content)
+            self._sent_changed.notify_all()
+
+    async def wait_for_sent(self, count: int) -> None:
+        """Wait until count messages have been sent to this user."""
+        async with asyncio.timeout(WAIT_SECONDS), self._sent_changed:
+            await self._sent_changed.wait_for(lambda: len(self.sent) >= count)
+
+
+class FakeBot:
+    # No global command hooks
+    _before_invoke = None
+    _after_invoke = None
+
+    def __init__(self, user: FakeUser) -> None:
+        """Init."""
+        self.user = user
+        self.loop = asyncio.get_running_loop()
+
+    def get_user(self, user_id: int) -> FakeUser | None:
+        return self.user if user_id == self.user.id else None
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+    async def send_to_owners(self, content: str) -> None:
+        pass
+
+    async def get_embed_color(self, _: object) -> discord.Color:
+        return discord.Color.red()
+
+
+class WallClock:
+    """The real wall clock, except that it can be moved forward."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.offset = 0.0
+        self._time = time.time
+
+    def time(self) -> float:
+        return self._time() + self.offset
+
+    @contextlib.contextmanager
+    def patched(self) -> Iterator[None]:
+        """Make time.time and datetime.datetime.now use this clock."""
+        clock = self
+
+        class Datetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz: datetime.tzinfo | None = None) -> datetime.datetime:
+                return datetime.datetime.fromtimestamp(clock.time(), tz)
+
+        with mock.patch("time.time", self.time), mock.patch(
+            "datetime.datetime", Datetime
+        ):
+            yield
+
+
+async def invoke(cog: RemindMe, content: str, author: FakeUser) -> commands.Context:
+    """Invoke one of the cog's commands the way the bot would, for a DM saying content (without a prefix)."""
+    for command in cog.walk_commands():
+        # As adding the cog to the bot would
+        command.cog = cog
+    view = StringView(content)
+    message = mock.MagicMock(content=content, author=author, guild=None)
+    ctx = commands.Context(message=message, bot=cog.bot, view=view, prefix="")
+    ctx.invoked_with = view.get_word()
+    ctx.command = next(
+        command for command in cog.get_commands() if command.name == ctx.invoked_with
+    )
+    with mock.patch.object(
+        commands.Command, "can_run", mock.AsyncMock(return_value=True)
+    ):
+        await ctx.command.invoke(ctx)
+    return ctx
+
+
+class CogTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        data_path = tempfile.TemporaryDirectory()
+        self.addCleanup(data_path.cleanup)
+        basic_config = {
+            **data_manager.basic_config_default,
+            "DATA_PATH": data_path.name,
+            "STORAGE_TYPE": "JSON",
+            "STORAGE_DETAILS": {},
+        }
+        for patch in (
+            mock.patch.object(data_manager, "basic_config", basic_config),
+            # Red hands out the same Config for as long as the cog is alive, which could be an earlier test's
+            mock.patch("redbot.core.config._config_cache", {}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class TestBackgroundLoop(CogTestCase):
+    def test_lone_repeating_reminder_fires_again(self):
+        clock = WallClock()
+
+        async def scenario() -> None:
+            user = FakeUser(1)
+            cog = RemindMe(FakeBot(user))
+            # Notice the wall clock moving forward right away
+            cog.schedule.MAX_SLEEP_SECONDS = 0.01
+            await cog.initialize()
+            try:
+                now = int(clock.time())
+                await cog.insert_reminder(
+                    user.id,
+                    {
+                        "text": "stretch",
+                        "created": now,
+                        "expires": now,
+                        "jump_link": None,
+                        "repeat": {"days": 1},
+                    },
+                )
+                await user.wait_for_sent(1)
+                await cog.send_queue.join()
+                # Nothing else is scheduled, so the background loop has to be woken by the reschedule
+                clock.offset += DAY
+                await user.wait_for_sent(2)
+            finally:
+                await cog.cog_unload()
+
+        with clock.patched():
+            asyncio.run(scenario())
+
+
+class TestCommandHooks(CogTestCase):
+    def test_nested_subcommand_takes_one_interactive_token(self):
+        async def scenario() -> None:
+            user = FakeUser(1)
+            cog = RemindMe(FakeBot(user))
+            await cog.initialize()
+            try:
+                acquire = mock.AsyncMock()
+                with mock.patch.object(
+                    cog.send_lanes, "acquire", acquire
+                ), mock.patch.object(commands.Context, "send") as send:
+                    ctx = await invoke(cog, "reminder edit time 1 in 1 day", user)
+                assert ctx.command.qualified_name == "reminder modify time"
+                # The reply saying there is no such reminder
+                send.assert_awaited_once()
+                acquire.assert_awaited_once_with(SendLanes.INTERACTIVE)
+            finally:
+                await cog.cog_unload()
+
+        asyncio.run(scenario())
+
+    def test_only_the_subcommand_is_traced(self):
+        async def scenario(folder: Path) -> Path:
+            user = FakeUser(1)
+            cog = RemindMe(FakeBot(user))
+            await cog.initialize()
+            try:
+                path = cog.trace.start(folder, cog)
+                with mock.patch.object(commands.Context, "send"):
+                    await invoke(cog, "reminder edit time 1 in 1 day", user)
+            finally:
+                await cog.cog_unload()
+            return path
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = asyncio.run(scenario(Path(folder)))
+            trace = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [event["c"] for event in trace if event["e"] == "command"] == [
+            "reminder modify time"
+        ]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+"""In-memory scheduling index for the RemindMe cog."""
+
+import asyncio
+import heapq
+import random
+import time
+from collections.abc import Iterable
+from contextlib import suppress
+
+
+class ReminderSchedule:
+    """A min-heap of pending reminders, keyed on (expires, user_id, user_reminder_id).
+
+    Removing or rescheduling a reminder does not touch the heap. Instead, the old heap
+    entry is left behind and skipped once it bubbles up to the top, so every operation
+    stays O(log n). The heap is compacted whenever stale entries start to dominate it.
+
+    To keep memory usage down with millions of reminders, each (user_id, user_reminder_id)
+    is packed into a single int key, and each heap entry is that key packed together with
+    the expiry time, rather than storing tuples of separate ints.
+    """
+
+    COMPACT_MIN_SIZE = 1024
+    MAX_SLEEP_SECONDS = 60.0
+    ID_BITS = 32
+    KEY_BITS = 64 + ID_BITS
+
+    def __init__(self) -> None:
+        """Init."""
+        # Packed (expires, key) entries
+        self._heap: list[int] = []
+        # Packed key -> expires
+        self._expires: dict[int, int] = {}
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        """Count of how many reminders are scheduled."""
+        return len(self._expires)
+
+    def __contains__(self, key: tuple[int, int]) -> bool:
+        """Check if a (user_id, user_reminder_id) is scheduled."""
+        return self._pack_key(*key) in self._expires
+
+    def _pack_key(self, user_id: int, user_reminder_id: int) -> int:
+        """Pack a (user_id, user_reminder_id) into a single int."""
+        return user_id << self.ID_BITS | user_reminder_id
+
+    def _unpack_entry(self, entry: int) -> tuple[int, int, int]:
+        """Unpack a heap entry back into (expires, user_id, user_reminder_id)."""
+        key = entry & ((1 << self.KEY_BITS) - 1)
+        return (
+            entry >> self.KEY_BITS,
+            key >> self.ID_BITS,
+            key & ((1 << self.ID_BITS) - 1),
+        )
+
+    def _is_live(self, entry: int) -> bool:
+        """Check if a heap entry is still the current schedule for its reminder."""
+        return (
+            self._expires.get(entry & ((1 << self.KEY_BITS) - 1))
+            == entry >> self.KEY_BITS
+        )
+
+    def build(self, entries: Iterable[tuple[int, int, int]]) -> None:
+        """Replace the whole schedule with (expires, user_id, user_reminder_id) entries."""
+        self._expires = {}
+        for expires, user_id, user_reminder_id in entries:
+            self._expires[self._pack_key(user_id, user_reminder_id)] = expires
+        self._heap = [
+            (expires << self.KEY_BITS) + key for key, expires in self._expires.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def push(self, user_id: int, user_reminder_id: int, expires: int) -> None:
+        """Schedule a reminder, replacing any existing schedule for it."""
+        key = self._pack_key(user_id, user_reminder_id)
+        if self._expires.get(key) == expires:
+            return
+        self._expires[key] = expires
+        heapq.heappush(self._heap, (expires << self.KEY_BITS) + key)
+        self._maybe_compact()
+
+    def remove(self, user_id: int, user_reminder_id: int) -> bool:
+        """Unschedule a reminder. Returns True if it was scheduled."""
+        if self._expires.pop(self._pack_key(user_id, user_reminder_id), None) is None:
+            return False
+        self._maybe_compact()
+        return True
+
+    def remove_user(self, user_id: int, user_reminder_ids: Iterable[int]) -> None:
+        """Unschedule all of a users reminders (given all of their user_reminder_ids)."""
+        for user_reminder_id in user_reminder_ids:
+            self._expires.pop(self._pack_key(user_id, user_reminder_id), None)
+        self._maybe_compact()
+
+    def peek(self) -> tuple[int, int, int] | None:
+        """Get the (expires, user_id, user_reminder_id) of the soonest reminder without removing it."""
+        heap = self._heap
+        while heap:
+            if self._is_live(heap[0]):
+                return self._unpack_entry(heap[0])
+            heapq.heappop(heap)
+        return None
+
+    def pop(self) -> tuple[int, int, int] | None:
+        """Remove and return the (expires, user_id, user_reminder_id) of the soonest reminder."""
+        entry = self.peek()
+        if entry:
+            self.remove(entry[1], entry[2])
+        return entry
+
+    def pop_due(self, now: float) -> list[tuple[int, int, int]]:
+        """Remove and return the (expires, user_id, user_reminder_id) of every reminder due at or before now."""
+        due = []
+        entry = self.peek()
+        while entry and entry[0] <= now:
+            self.remove(entry[1], entry[2])
+            due.append(entry)
+            entry = self.peek()
+        return due
+
+    def due_before(self, timestamp: float) -> list[tuple[int, int, int]]:
+        """Get (without removing) the (expires, user_id, user_reminder_id) of every reminder due at or before timestamp, soonest first.
+
+        Only walks the part of the heap that is due, so this is cheap when few reminders are.
+        """
+        heap = self._heap
+        due = set()
+        stack = [0] if heap else []
+        while stack:
+            index = stack.pop()
+            entry = heap[index]
+            if entry >> self.KEY_BITS > timestamp:
+                continue
+            if self._is_live(entry):
+                due.add(entry)
+            stack.extend(
+                child for child in (2 * index + 1, 2 * index + 2) if child < len(heap)
+            )
+        return [self._unpack_entry(entry) for entry in sorted(due)]
+
+    def wake(self) -> None:
+        """Wake up anything sleeping in wait(), as the schedule has changed."""
+        self._changed.set()
+
+    async def wait(self, timeout: float | None = None) -> None:  # noqa: ASYNC109
+        """Sleep until the soonest reminder is due, wake() is called, or timeout seconds have passed.
+
+        Reminder expiry times are wall clock times, but the sleep itself runs on the event loop's
+        monotonic clock, so a wall clock jump (NTP corrections and the like) can never make us wake
+        up early and misfire. To notice forward jumps, we never sleep for more than MAX_SLEEP_SECONDS
+        at a time while a reminder is pending; the caller is expected to re-check the wall clock each
+        time this returns. With nothing pending and no timeout, this sleeps until woken.
+        """
+        self._changed.clear()
+        sleep_seconds = timeout
+        entry = self.peek()
+        if entry:
+            until_due = min(entry[0] - time.time(), self.MAX_SLEEP_SECONDS)
+            sleep_seconds = (
+                until_due if sleep_seconds is None else min(sleep_seconds, until_due)
+            )
+        if sleep_seconds is not None and sleep_seconds <= 0:
+            return
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._changed.wait(), sleep_seconds)
+
+    def _maybe_compact(self) -> None:
+        """Rebuild the heap once more than half of it is stale entries."""
+        if len(self._heap) > self.COMPACT_MIN_SIZE and len(self._heap) > 2 * len(
+            self._expires
+        ):
+            self._heap = [
+                (expires << self.KEY_BITS) + key
+                for key, expires in self._expires.items()
+            ]
+            heapq.heapify(self._heap)
+
+
+class RetryQueue:
+    """Reminders that failed to send, each waiting out its own jittered exponential backoff.
+
+    Membership is tracked by (user_id, user_reminder_id), and a reminder stays a member
+    (keeping its attempt count) while a retry is in flight, until it is either removed
+    after a successful send or given up on after MAX_ATTEMPTS failures.
+    """
+
+    BASE_DELAY_SECONDS = 15.0
+    MAX_DELAY_SECONDS = 900.0
+    MAX_ATTEMPTS = 20
+
+    def __init__(self) -> None:
+        """Init."""
+        self._heap: list[tuple[float, int, int]] = []
+        self._attempts: dict[tuple[int, int], int] = {}
+        self._next_attempt: dict[tuple[int, int], float] = {}
+
+    def __len__(self) -> int:
+        """Count of how many reminders are waiting to be retried (or are being retried)."""
+        return len(self._attempts)
+
+    def __contains__(self, key: tuple[int, int]) -> bool:
+        """Check if a (user_id, user_reminder_id) is waiting to be retried (or is being retried)."""
+        return key in self._attempts
+
+    def attempts(self, user_id: int, user_reminder_id: int) -> int:
+        """Get how many failed attempts a reminder has had so far."""
+        return self._attempts.get((user_id, user_reminder_id), 0)
+
+    def add(self, user_id: int, user_reminder_id: int, now: float) -> bool:
+        """Record a failed attempt and schedule the next one.
+
+        Returns False (and forgets the reminder) if it has now failed MAX_ATTEMPTS times.
+        """
+        key = (user_id, user_reminder_id)
+        attempts = self._attempts.get(key, 0) + 1
+        if attempts >= self.MAX_ATTEMPTS:
+            self.remove(user_id, user_reminder_id)
+            return False
+        delay = min(
+            self.MAX_DELAY_SECONDS, self.BASE_DELAY_SECONDS * 2 ** (attempts - 1)
+        )
+        next_attempt = now + random.uniform(delay / 2, delay)  # noqa: S311
+        self._attempts[key] = attempts
+        self._next_attempt[key] = next_attempt
+        heapq.heappush(self._heap, (next_attempt, user_id, user_reminder_id))
+        return True
+
+    def remove(self, user_id: int, user_reminder_id: int) -> bool:
+        """Forget about a reminder. Returns True if it was waiting to be retried."""
+        key = (user_id, user_reminder_id)
+        self._next_attempt.pop(key, None)
+        removed = self._attempts.pop(key, None) is not None
+        if not self._attempts:
+            self._heap = []
+        return removed
+
+    def remove_user(self, user_id: int) -> None:
+        """Forget about all of a users reminders."""
+        for key in [key for key in self._attempts if key[0] == user_id]:
+            self.remove(*key)
+
+    def next_attempt(self) -> float | None:
+        """Get the time of the soonest scheduled retry."""
+        heap = self._heap
+        while heap:
+            next_attempt, user_id, user_reminder_id = heap[0]
+            if self._next_attempt.get((user_id, user_reminder_id)) == next_attempt:
+                return next_attempt
+            heapq.heappop(heap)
+        return None
+
+    def pop_due(self, now: float) -> list[tuple[int, int]]:
+        """Get the (user_id, user_reminder_id) of every reminder due for a retry at or before now."""
+        due = []
+        next_attempt = self.next_attempt()
+        while next_attempt is not None and next_attempt <= now:
+            _, user_id, user_reminder_id = heapq.heappop(self._heap)
+            del self._next_attempt[(user_id, user_reminder_id)]
+            due.append((user_id, user_reminder_id))
+            next_attempt = self.next_attempt()
+        return due
@@ -0,0 +1,181 @@
+"""Unit tests for the reminder schedule."""
+
+import asyncio
+import time
+import unittest
+
+import scheduler
+
+
+class TestReminderSchedule(unittest.TestCase):
+    def test_empty(self):
+        schedule = scheduler.ReminderSchedule()
+        assert schedule.peek() is None
+        assert schedule.pop() is None
+        assert len(schedule) == 0
+
+    def test_build_orders_by_expires(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.build([(300, 1, 1), (100, 2, 1), (200, 1, 2)])
+        assert len(schedule) == 3
+        assert schedule.pop() == (100, 2, 1)
+        assert schedule.pop() == (200, 1, 2)
+        assert schedule.pop() == (300, 1, 1)
+        assert schedule.pop() is None
+
+    def test_ties_break_on_user_then_id(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.build([(100, 2, 1), (100, 1, 2), (100, 1, 1)])
+        assert [schedule.pop() for _ in range(3)] == [
+            (100, 1, 1),
+            (100, 1, 2),
+            (100, 2, 1),
+        ]
+
+    def test_reschedule(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.push(1, 1, 100)
+        schedule.push(1, 2, 200)
+        schedule.push(1, 1, 300)
+        assert len(schedule) == 2
+        assert schedule.pop() == (200, 1, 2)
+        assert schedule.pop() == (300, 1, 1)
+        assert schedule.pop() is None
+
+    def test_remove(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.push(1, 1, 100)
+        schedule.push(1, 2, 200)
+        assert schedule.remove(1, 1)
+        assert not schedule.remove(1, 1)
+        assert (1, 1) not in schedule
+        assert schedule.peek() == (200, 1, 2)
+
+    def test_remove_then_push_same_time(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.push(1, 1, 100)
+        schedule.remove(1, 1)
+        schedule.push(1, 1, 100)
+        assert schedule.pop() == (100, 1, 1)
+        assert schedule.pop() is None
+
+    def test_remove_user(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.build([(100, 1, 1), (200, 2, 1), (300, 1, 2)])
+        schedule.remove_user(1, [1, 2, 3])
+        assert len(schedule) == 1
+        assert schedule.pop() == (200, 2, 1)
+        assert schedule.pop() is None
+
+    def test_pop_due(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.build([(100, 1, 1), (200, 2, 1), (300, 1, 2), (200, 1, 3)])
+        assert schedule.pop_due(50) == []
+        assert schedule.pop_due(200) == [(100, 1, 1), (200, 1, 3), (200, 2, 1)]
+        assert len(schedule) == 1
+        assert schedule.pop_due(1000) == [(300, 1, 2)]
+
+    def test_large_ids_and_old_times(self):
+        schedule = scheduler.ReminderSchedule()
+        user_id = 2**63 + 12345
+        schedule.build(
+            [(2**40, user_id, 2**32 - 1), (-100, user_id, 1), (0, 1, 2**32 - 1)]
+        )
+        assert (user_id, 2**32 - 1) in schedule
+        assert schedule.pop() == (-100, user_id, 1)
+        assert schedule.pop() == (0, 1, 2**32 - 1)
+        assert schedule.pop() == (2**40, user_id, 2**32 - 1)
+
+    def test_due_before(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.build([(100, 1, 1), (200, 2, 1), (300, 1, 2), (200, 1, 3)])
+        schedule.push(2, 1, 250)
+        schedule.remove(1, 1)
+        schedule.push(1, 1, 100)
+        assert schedule.due_before(50) == []
+        assert schedule.due_before(250) == [(100, 1, 1), (200, 1, 3), (250, 2, 1)]
+        assert len(schedule) == 4
+
+    def test_compaction_keeps_live_entries(self):
+        schedule = scheduler.ReminderSchedule()
+        for expires in range(5000):
+            schedule.push(1, 1, expires)
+        schedule.push(2, 1, 2500)
+        assert len(schedule._heap) < 5000
+        assert schedule.pop() == (2500, 2, 1)
+        assert schedule.pop() == (4999, 1, 1)
+        assert schedule.pop() is None
+
+
+class TestRetryQueue(unittest.TestCase):
+    def test_backoff_grows(self):
+        retry_queue = scheduler.RetryQueue()
+        delays = []
+        for _ in range(8):
+            assert retry_queue.add(1, 1, 0)
+            delays.append(retry_queue.next_attempt())
+        base = retry_queue.BASE_DELAY_SECONDS
+        assert base / 2 <= delays[0] <= base
+        assert base * 2 <= delays[2] <= base * 4
+        assert all(delay <= retry_queue.MAX_DELAY_SECONDS for delay in delays)
+        assert retry_queue.attempts(1, 1) == 8
+        assert len(retry_queue) == 1
+
+    def test_gives_up(self):
+        retry_queue = scheduler.RetryQueue()
+        for _ in range(retry_queue.MAX_ATTEMPTS - 1):
+            assert retry_queue.add(1, 1, 0)
+        assert not retry_queue.add(1, 1, 0)
+        assert (1, 1) not in retry_queue
+        assert retry_queue.next_attempt() is None
+
+    def test_pop_due_keeps_membership(self):
+        retry_queue = scheduler.RetryQueue()
+        retry_queue.add(1, 1, 0)
+        retry_queue.add(2, 1, 1000)
+        assert retry_queue.pop_due(0) == []
+        assert retry_queue.pop_due(100) == [(1, 1)]
+        assert (1, 1) in retry_queue
+        assert retry_queue.pop_due(100) == []
+        assert retry_queue.remove(1, 1)
+        assert not retry_queue.remove(1, 1)
+        assert retry_queue.pop_due(10000) == [(2, 1)]
+
+    def test_remove_user(self):
+        retry_queue = scheduler.RetryQueue()
+        retry_queue.add(1, 1, 0)
+        retry_queue.add(1, 2, 0)
+        retry_queue.add(2, 1, 0)
+        retry_queue.remove_user(1)
+        assert len(retry_queue) == 1
+        assert retry_queue.pop_due(10000) == [(2, 1)]
+
+
+class TestReminderScheduleWait(unittest.IsolatedAsyncioTestCase):
+    async def test_due_returns_immediately(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.push(1, 1, int(time.time()) - 5)
+        await asyncio.wait_for(schedule.wait(), 1)
+
+    async def test_wakes_at_deadline(self):
+        schedule = scheduler.ReminderSchedule()
+        schedule.push(1, 1, int(time.time()) + 1)
+        await asyncio.wait_for(schedule.wait(), 3)
+        assert time.time() >= schedule.peek()[0] - 0.05
+
+    async def test_timeout(self):
+        schedule = scheduler.ReminderSchedule()
+        await asyncio.wait_for(schedule.wait(0.05), 1)
+
+    async def test_wake(self):
+        schedule = scheduler.ReminderSchedule()
+        waiter = asyncio.create_task(schedule.wait())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        schedule.wake()
+        await asyncio.wait_for(waiter, 1)
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
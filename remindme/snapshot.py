@@ -0,0 +1,69 @@
+"""Warm-start snapshots of the in-memory schedule for the RemindMe cog.
+
+A snapshot is a small header followed by one fixed size record per reminder:
+
+    header: magic (8 bytes), format version (uint32), storage generation (uint64), record count (uint64)
+    record: expires (int64), user_id (uint64), user_reminder_id (uint32)
+
+All little endian. Records are in the order the reminders were created, which is what
+ReminderSchedule.build() and ReminderIndex.build() take.
+"""
+
+import mmap
+import os
+import struct
+from collections.abc import Iterable
+from pathlib import Path
+
+MAGIC = b"PCXRMSNP"
+VERSION = 1
+HEADER = struct.Struct("<8sIQQ")
+RECORD = struct.Struct("<qQI")
+
+
+def pack_snapshot(generation: int, entries: Iterable[tuple[int, int, int]]) -> bytes:
+    """Pack (expires, user_id, user_reminder_id) entries into a snapshot for a storage generation."""
+    records = bytearray()
+    count = 0
+    for entry in entries:
+        records += RECORD.pack(*entry)
+        count += 1
+    return HEADER.pack(MAGIC, VERSION, generation, count) + records
+
+
+def write_snapshot(path: Path, data: bytes) -> None:
+    """Write out a snapshot, replacing any existing one all at once (so it is never seen half written)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(path.name + ".tmp")
+    with temporary_path.open("wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    temporary_path.replace(path)
+
+
+def read_snapshot(path: Path, generation: int) -> list[tuple[int, int, int]] | None:
+    """Read the (expires, user_id, user_reminder_id) entries from a snapshot.
+
+    Returns None if there is no snapshot, it can't be read, or it was taken at a different storage generation.
+    """
+    try:
+        with path.open("rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            if len(mapped) < HEADER.size:
+                return None
+            magic, version, snapshot_generation, count = HEADER.unpack_from(mapped)
+            if (
+                magic != MAGIC
+                or version != VERSION
+                or snapshot_generation != generation
+            ):
+                return None
+            if len(mapped) != HEADER.size + count * RECORD.size:
+                return None
+            with memoryview(mapped) as view:
+                return list(RECORD.iter_unpack(view[HEADER.size :]))
+    except (OSError, ValueError):
+        # Missing, empty (which can't be mapped), or otherwise unreadable
+        return None
@@ -0,0 +1,48 @@
+"""Unit tests for schedule snapshots."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import snapshot
+
+ENTRIES = [
+    (1700000000, 2**63, 1),
+    (-5, 1, 2**32 - 1),
+    (253402300799, 123456789012345678, 7),
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "data" / "schedule.snapshot"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        snapshot.write_snapshot(self.path, snapshot.pack_snapshot(3, iter(ENTRIES)))
+        assert snapshot.read_snapshot(self.path, 3) == ENTRIES
+        assert not self.path.with_name(self.path.name + ".tmp").exists()
+
+    def test_empty(self):
+        snapshot.write_snapshot(self.path, snapshot.pack_snapshot(0, []))
+        assert snapshot.read_snapshot(self.path, 0) == []
+
+    def test_other_generation(self):
+        snapshot.write_snapshot(self.path, snapshot.pack_snapshot(3, ENTRIES))
+        assert snapshot.read_snapshot(self.path, 4) is None
+
+    def test_missing_or_damaged(self):
+        assert snapshot.read_snapshot(self.path, 0) is None
+        data = snapshot.pack_snapshot(3, ENTRIES)
+        for damaged in (b"", data[:-1], data + b"\0", b"NOTASNAP" + data[8:]):
+            with self.subTest(damaged=damaged[:8]):
+                snapshot.write_snapshot(self.path, damaged)
+                assert snapshot.read_snapshot(self.path, 3) is None
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
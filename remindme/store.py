@@ -0,0 +1,859 @@
+"""Storage backends for reminders."""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, TypeVar
+
+from redbot.core import Config
+
+log = logging.getLogger("red.pcxcogs.remindme")
+
+T = TypeVar("T")
+
+REMINDER_FIELDS = ("text", "created", "expires", "jump_link", "repeat")
+
+
+class ReminderChanges:
+    """A unit of work: every change to a single reminder, to be saved with one write."""
+
+    __slots__ = ("deleted", "fields", "user_id", "user_reminder_id")
+
+    def __init__(self, user_id: int, user_reminder_id: int) -> None:
+        """Init."""
+        self.user_id = user_id
+        self.user_reminder_id = user_reminder_id
+        self.fields: dict[str, Any] = {}
+        self.deleted = False
+
+    @property
+    def key(self) -> tuple[int, int]:
+        """Get the (user_id, user_reminder_id) this applies to."""
+        return self.user_id, self.user_reminder_id
+
+    def set(self, **fields: Any) -> "ReminderChanges":  # noqa: ANN401
+        """Change some fields of the reminder."""
+        for field in fields:
+            if field not in REMINDER_FIELDS:
+                msg = f"Unknown reminder field: {field}"
+                raise KeyError(msg)
+        if not self.deleted:
+            self.fields.update(fields)
+        return self
+
+    def delete(self) -> "ReminderChanges":
+        """Delete the reminder instead."""
+        self.deleted = True
+        self.fields = {}
+        return self
+
+    def merge(self, later: "ReminderChanges") -> None:
+        """Fold some later changes to the same reminder into these ones."""
+        if later.deleted:
+            self.delete()
+        else:
+            self.set(**later.fields)
+
+    def apply_to(self, reminder: dict[str, Any]) -> dict[str, Any] | None:
+        """Get what a reminder will look like once these changes are saved."""
+        if self.deleted:
+            return None
+        reminder.update(self.fields)
+        return reminder
+
+
+class ReminderStore(ABC):
+    """Somewhere to keep reminders.
+
+    Reminders are always handed out as full reminders (every field in default_reminder_settings
+    is present), but never include the user_id or user_reminder_id.
+    """
+
+    def __init__(self, defaults: dict[str, Any]) -> None:
+        """Init."""
+        self.defaults = defaults
+
+    def _full_reminder(self, partial_reminder: dict[str, Any]) -> dict[str, Any]:
+        """Fill in any missing fields with their defaults."""
+        full_reminder = {
+            key: value.copy() if isinstance(value, dict) else value
+            for key, value in self.defaults.items()
+        }
+        full_reminder.update(partial_reminder)
+        return full_reminder
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Get the store ready for use."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release any resources held by the store."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        """Get a reminder, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> dict[int, dict[str, Any]]:
+        """Get all of a users reminders (user_reminder_id -> reminder), in the order they were created."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_all(self) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get every reminder (user_id -> user_reminder_id -> reminder)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def due_before(self, timestamp: int) -> list[tuple[int, int, dict[str, Any]]]:
+        """Get the (user_id, user_reminder_id, reminder) of every reminder expiring at or before timestamp, soonest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def schedule_entries(self) -> list[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, in the order they were created."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count(self) -> tuple[int, int]:
+        """Count how many reminders there are, and how many of those are repeating."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generation(self) -> int:
+        """Get the storage generation, which is moved on by bump_generation() before the stored reminders change."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def bump_generation(self) -> None:
+        """Move the storage generation on, so that anything saved alongside the current one is known to be out of date."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(
+        self, user_id: int, user_reminder_id: int, reminder: dict[str, Any]
+    ) -> None:
+        """Save a reminder, replacing it if it exists."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_many(self, reminders: list[tuple[int, int, dict[str, Any]]]) -> None:
+        """Save many (user_id, user_reminder_id, reminder) at once, replacing any that exist."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def apply(self, changes: list[ReminderChanges]) -> None:
+        """Save some units of work, with one write per reminder."""
+        raise NotImplementedError
+
+    async def update(
+        self, user_id: int, user_reminder_id: int, **fields: Any  # noqa: ANN401
+    ) -> None:
+        """Change some fields of an existing reminder."""
+        await self.apply([ReminderChanges(user_id, user_reminder_id).set(**fields)])
+
+    @abstractmethod
+    async def delete(self, user_id: int, user_reminder_id: int) -> None:
+        """Delete a reminder."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_user(self, user_id: int) -> None:
+        """Delete all of a users reminders."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Delete every reminder."""
+        raise NotImplementedError
+
+
+class ConfigReminderStore(ReminderStore):
+    """Reminders kept in the REMINDER custom Config group (user_id -> user_reminder_id -> reminder)."""
+
+    def __init__(self, config: Config, defaults: dict[str, Any]) -> None:
+        """Init."""
+        super().__init__(defaults)
+        self.config = config
+
+    async def initialize(self) -> None:
+        """Get the store ready for use (Config is always ready)."""
+
+    async def close(self) -> None:
+        """Release any resources held by the store (Config holds none of its own)."""
+
+    async def get(self, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        """Get a reminder, or None if it doesn't exist."""
+        partial_reminder = await self.config.custom("REMINDER", str(user_id)).get_raw(
+            str(user_reminder_id), default=None
+        )
+        if not partial_reminder:
+            return None
+        return self._full_reminder(partial_reminder)
+
+    async def get_user(self, user_id: int) -> dict[int, dict[str, Any]]:
+        """Get all of a users reminders (user_reminder_id -> reminder), in the order they were created."""
+        users_reminders = await self.config.custom(
+            "REMINDER", str(user_id)
+        ).all()  # Does NOT return default values
+        return {
+            int(user_reminder_id): self._full_reminder(partial_reminder)
+            for user_reminder_id, partial_reminder in users_reminders.items()
+        }
+
+    async def get_all(self) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get every reminder (user_id -> user_reminder_id -> reminder)."""
+        all_reminders = await self.config.custom(
+            "REMINDER"
+        ).all()  # Does NOT return default values
+        return {
+            int(user_id): {
+                int(user_reminder_id): self._full_reminder(partial_reminder)
+                for user_reminder_id, partial_reminder in users_reminders.items()
+            }
+            for user_id, users_reminders in all_reminders.items()
+        }
+
+    async def due_before(self, timestamp: int) -> list[tuple[int, int, dict[str, Any]]]:
+        """Get the (user_id, user_reminder_id, reminder) of every reminder expiring at or before timestamp, soonest first."""
+        all_reminders = await self.config.custom(
+            "REMINDER"
+        ).all()  # Does NOT return default values
+        due = [
+            (int(user_id), int(user_reminder_id), self._full_reminder(partial_reminder))
+            for user_id, users_reminders in all_reminders.items()
+            for user_reminder_id, partial_reminder in users_reminders.items()
+            if partial_reminder.get("expires") is not None
+            and partial_reminder["expires"] <= timestamp
+        ]
+        due.sort(key=lambda entry: (entry[2]["expires"], entry[0], entry[1]))
+        return due
+
+    async def schedule_entries(self) -> list[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, in the order they were created."""
+        all_reminders = await self.config.custom(
+            "REMINDER"
+        ).all()  # Does NOT return default values
+        return [
+            (partial_reminder["expires"], int(user_id), int(user_reminder_id))
+            for user_id, users_reminders in all_reminders.items()
+            for user_reminder_id, partial_reminder in users_reminders.items()
+            if partial_reminder.get("expires") is not None
+        ]
+
+    async def count(self) -> tuple[int, int]:
+        """Count how many reminders there are, and how many of those are repeating."""
+        total = 0
+        repeating = 0
+        all_reminders = await self.config.custom(
+            "REMINDER"
+        ).all()  # Does NOT return default values
+        for users_reminders in all_reminders.values():
+            for partial_reminder in users_reminders.values():
+                total += 1
+                if partial_reminder.get("repeat"):
+                    repeating += 1
+        return total, repeating
+
+    async def generation(self) -> int:
+        """Get the storage generation."""
+        return await self.config.storage_generation()
+
+    async def bump_generation(self) -> None:
+        """Move the storage generation on."""
+        await self.config.storage_generation.set(
+            await self.config.storage_generation() + 1
+        )
+
+    async def set(
+        self, user_id: int, user_reminder_id: int, reminder: dict[str, Any]
+    ) -> None:
+        """Save a reminder, replacing it if it exists."""
+        await self.config.custom("REMINDER", str(user_id), str(user_reminder_id)).set(
+            reminder
+        )
+
+    async def set_many(self, reminders: list[tuple[int, int, dict[str, Any]]]) -> None:
+        """Save many (user_id, user_reminder_id, reminder) at once, replacing any that exist, with one write per user."""
+        users_reminders: dict[int, dict[str, dict[str, Any]]] = {}
+        for user_id, user_reminder_id, reminder in reminders:
+            users_reminders.setdefault(user_id, {})[str(user_reminder_id)] = reminder
+        for user_id, new_reminders in users_reminders.items():
+            user_group = self.config.custom("REMINDER", str(user_id))
+            async with user_group.get_lock():
+                saved_reminders = await user_group.all()
+                saved_reminders.update(new_reminders)
+                await user_group.set(saved_reminders)
+
+    async def apply(self, changes: list[ReminderChanges]) -> None:
+        """Save some units of work, with one write per reminder."""
+        for reminder_changes in changes:
+            config_reminder = self.config.custom(
+                "REMINDER",
+                str(reminder_changes.user_id),
+                str(reminder_changes.user_reminder_id),
+            )
+            if reminder_changes.deleted:
+                await config_reminder.clear()
+                continue
+            if not reminder_changes.fields:
+                continue
+            async with config_reminder.get_lock():
+                partial_reminder = await self.config.custom(
+                    "REMINDER", str(reminder_changes.user_id)
+                ).get_raw(str(reminder_changes.user_reminder_id), default=None)
+                if not partial_reminder:
+                    continue  # Reminder was deleted
+                partial_reminder.update(reminder_changes.fields)
+                await config_reminder.set(partial_reminder)
+
+    async def delete(self, user_id: int, user_reminder_id: int) -> None:
+        """Delete a reminder."""
+        await self.config.custom(
+            "REMINDER", str(user_id), str(user_reminder_id)
+        ).clear()
+
+    async def delete_user(self, user_id: int) -> None:
+        """Delete all of a users reminders."""
+        await self.config.custom("REMINDER", str(user_id)).clear()
+
+    async def clear(self) -> None:
+        """Delete every reminder."""
+        await self.config.custom("REMINDER").clear()
+
+
+class SqliteReminderStore(ReminderStore):
+    """Reminders kept in a local SQLite database (in WAL mode).
+
+    All database work happens on a single dedicated thread, so the event loop never blocks on disk.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS reminders ("
+        " user_id INTEGER NOT NULL,"
+        " user_reminder_id INTEGER NOT NULL,"
+        " text TEXT NOT NULL DEFAULT '',"
+        " created INTEGER,"
+        " expires INTEGER,"
+        " jump_link TEXT,"
+        " repeat TEXT,"
+        " PRIMARY KEY (user_id, user_reminder_id)"  # Also serves as the user_id index
+        ")",
+        "CREATE INDEX IF NOT EXISTS reminders_expires ON reminders (expires)",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    )
+    UPSERT = (
+        "INSERT INTO reminders (user_id, user_reminder_id, text, created, expires, jump_link, repeat)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (user_id, user_reminder_id) DO UPDATE SET"
+        " text = excluded.text, created = excluded.created, expires = excluded.expires,"
+        " jump_link = excluded.jump_link, repeat = excluded.repeat"
+    )
+    COLUMNS = "text, created, expires, jump_link, repeat"
+
+    def __init__(self, path: Path, defaults: dict[str, Any]) -> None:
+        """Init."""
+        super().__init__(defaults)
+        self.path = path
+        self._executor: ThreadPoolExecutor | None = None
+        self._connection: sqlite3.Connection | None = None
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:  # noqa: ANN401
+        """Run something on the database thread."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    def _row_to_reminder(self, row: tuple) -> dict[str, Any]:
+        """Convert a (text, created, expires, jump_link, repeat) row into a full reminder."""
+        text, created, expires, jump_link, repeat = row
+        return self._full_reminder(
+            {
+                "text": text,
+                "created": created,
+                "expires": expires,
+                "jump_link": jump_link,
+                "repeat": json.loads(repeat) if repeat else {},
+            }
+        )
+
+    @staticmethod
+    def _reminder_to_row(
+        user_id: int, user_reminder_id: int, reminder: dict[str, Any]
+    ) -> tuple:
+        """Convert a (possibly partial) reminder into a row for UPSERT."""
+        repeat = reminder.get("repeat")
+        return (
+            user_id,
+            user_reminder_id,
+            reminder.get("text", ""),
+            reminder.get("created"),
+            reminder.get("expires"),
+            reminder.get("jump_link"),
+            json.dumps(repeat) if repeat else None,
+        )
+
+    def _query(self, sql: str, *parameters: Any) -> list[tuple]:  # noqa: ANN401
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def _execute(self, sql: str, *parameters: Any) -> None:  # noqa: ANN401
+        with self._connection:
+            self._connection.execute(sql, parameters)
+
+    def _execute_many(self, sql: str, rows: list[tuple]) -> None:
+        with self._connection:
+            self._connection.executemany(sql, rows)
+
+    async def initialize(self) -> None:
+        """Open (and if needed, create) the database."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="remindme-sqlite"
+        )
+
+        def connect() -> None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                for statement in self.SCHEMA:
+                    self._connection.execute(statement)
+
+        await self._run(connect)
+
+    async def close(self) -> None:
+        """Close the database."""
+        if not self._executor:
+            return
+        if self._connection:
+            await self._run(self._connection.close)
+            self._connection = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    async def get(self, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        """Get a reminder, or None if it doesn't exist."""
+        rows = await self._run(
+            self._query,
+            f"SELECT {self.COLUMNS} FROM reminders WHERE user_id = ? AND user_reminder_id = ?",  # noqa: S608
+            user_id,
+            user_reminder_id,
+        )
+        return self._row_to_reminder(rows[0]) if rows else None
+
+    async def get_user(self, user_id: int) -> dict[int, dict[str, Any]]:
+        """Get all of a users reminders (user_reminder_id -> reminder), in the order they were created."""
+        rows = await self._run(
+            self._query,
+            f"SELECT user_reminder_id, {self.COLUMNS} FROM reminders WHERE user_id = ? ORDER BY rowid",  # noqa: S608
+            user_id,
+        )
+        return {row[0]: self._row_to_reminder(row[1:]) for row in rows}
+
+    async def get_all(self) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get every reminder (user_id -> user_reminder_id -> reminder)."""
+        rows = await self._run(
+            self._query,
+            f"SELECT user_id, user_reminder_id, {self.COLUMNS} FROM reminders ORDER BY rowid",  # noqa: S608
+        )
+        result: dict[int, dict[int, dict[str, Any]]] = {}
+        for row in rows:
+            result.setdefault(row[0], {})[row[1]] = self._row_to_reminder(row[2:])
+        return result
+
+    async def due_before(self, timestamp: int) -> list[tuple[int, int, dict[str, Any]]]:
+        """Get the (user_id, user_reminder_id, reminder) of every reminder expiring at or before timestamp, soonest first."""
+        rows = await self._run(
+            self._query,
+            f"SELECT user_id, user_reminder_id, {self.COLUMNS} FROM reminders WHERE expires <= ? ORDER BY expires, user_id, user_reminder_id",  # noqa: S608
+            timestamp,
+        )
+        return [(row[0], row[1], self._row_to_reminder(row[2:])) for row in rows]
+
+    async def schedule_entries(self) -> list[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, in the order they were created."""
+        return await self._run(
+            self._query,
+            "SELECT expires, user_id, user_reminder_id FROM reminders WHERE expires IS NOT NULL ORDER BY rowid",
+        )
+
+    async def count(self) -> tuple[int, int]:
+        """Count how many reminders there are, and how many of those are repeating."""
+        rows = await self._run(
+            self._query, "SELECT COUNT(*), COUNT(repeat) FROM reminders"
+        )
+        return rows[0]
+
+    async def generation(self) -> int:
+        """Get the storage generation."""
+        rows = await self._run(
+            self._query, "SELECT value FROM meta WHERE key = 'generation'"
+        )
+        return rows[0][0] if rows else 0
+
+    async def bump_generation(self) -> None:
+        """Move the storage generation on."""
+        await self._run(
+            self._execute,
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) ON CONFLICT (key) DO UPDATE SET value = value + 1",
+        )
+
+    async def set(
+        self, user_id: int, user_reminder_id: int, reminder: dict[str, Any]
+    ) -> None:
+        """Save a reminder, replacing it if it exists."""
+        await self._run(
+            self._execute,
+            self.UPSERT,
+            *self._reminder_to_row(user_id, user_reminder_id, reminder),
+        )
+
+    async def set_many(self, reminders: list[tuple[int, int, dict[str, Any]]]) -> None:
+        """Save many (user_id, user_reminder_id, reminder) at once, replacing any that exist."""
+        rows = [
+            self._reminder_to_row(user_id, user_reminder_id, reminder)
+            for user_id, user_reminder_id, reminder in reminders
+        ]
+        await self._run(self._execute_many, self.UPSERT, rows)
+
+    def _apply(self, changes: list[ReminderChanges]) -> None:
+        with self._connection:
+            for reminder_changes in changes:
+                if reminder_changes.deleted:
+                    self._connection.execute(
+                        "DELETE FROM reminders WHERE user_id = ? AND user_reminder_id = ?",
+                        reminder_changes.key,
+                    )
+                    continue
+                if not reminder_changes.fields:
+                    continue
+                columns = []
+                values = []
+                for field, value in reminder_changes.fields.items():
+                    columns.append(f"{field} = ?")
+                    values.append(
+                        (json.dumps(value) if value else None)
+                        if field == "repeat"
+                        else value
+                    )
+                self._connection.execute(
+                    f"UPDATE reminders SET {', '.join(columns)} WHERE user_id = ? AND user_reminder_id = ?",  # noqa: S608
+                    (*values, *reminder_changes.key),
+                )
+
+    async def apply(self, changes: list[ReminderChanges]) -> None:
+        """Save some units of work in a single transaction."""
+        await self._run(self._apply, changes)
+
+    async def delete(self, user_id: int, user_reminder_id: int) -> None:
+        """Delete a reminder."""
+        await self._run(
+            self._execute,
+            "DELETE FROM reminders WHERE user_id = ? AND user_reminder_id = ?",
+            user_id,
+            user_reminder_id,
+        )
+
+    async def delete_user(self, user_id: int) -> None:
+        """Delete all of a users reminders."""
+        await self._run(
+            self._execute, "DELETE FROM reminders WHERE user_id = ?", user_id
+        )
+
+    async def clear(self) -> None:
+        """Delete every reminder."""
+        await self._run(self._execute, "DELETE FROM reminders")
+
+
+class BufferedReminderStore(ReminderStore):
+    """Wraps another store so that units of work can be group committed.
+
+    Changes passed to stage() are merged per reminder and held for up to GROUP_COMMIT_SECONDS,
+    then saved to the wrapped store all at once. Everything else goes straight through to the
+    wrapped store (after saving anything staged), and reads always see staged changes.
+
+    The first write after a checkpoint() (or after opening the store) moves the storage generation
+    on before writing anything, so the generation a checkpoint returns only stays current for as
+    long as the stored reminders stay exactly as they were.
+
+    The wrapped store can be switched for another one with switch_to(), while the cog is running.
+    """
+
+    GROUP_COMMIT_SECONDS = 1.0
+
+    def __init__(self, store: ReminderStore) -> None:
+        """Init."""
+        super().__init__(store.defaults)
+        self.store = store
+        self._pending: dict[tuple[int, int], ReminderChanges] = {}
+        self._flushing: dict[tuple[int, int], ReminderChanges] = {}
+        # Moves on with every stage(), so reads can tell if something was staged while they waited
+        self._staged_generation = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._generation_lock = asyncio.Lock()
+        self._checkpointed = True
+        self._writing = 0
+        # Switching to another store waits for everything using the current one, and everything else waits for the switch
+        self._switch_lock = asyncio.Lock()
+        self._not_switching = asyncio.Event()
+        self._not_switching.set()
+        self._store_users = 0
+        self._store_idle = asyncio.Event()
+        self._store_idle.set()
+
+    @asynccontextmanager
+    async def _using_store(self) -> AsyncIterator[ReminderStore]:
+        """Use the wrapped store, waiting for any switch to another store to finish first."""
+        while not self._not_switching.is_set():
+            await self._not_switching.wait()
+        self._store_users += 1
+        self._store_idle.clear()
+        try:
+            yield self.store
+        finally:
+            self._store_users -= 1
+            if not self._store_users:
+                self._store_idle.set()
+
+    async def switch_to(self, store: ReminderStore) -> int:
+        """Move every reminder over to another (initialized) store and carry on with that one, returning how many were moved.
+
+        Everything staged so far is saved first. Then the move waits for everything already using
+        the current store, and everything else that needs a store waits for the move, so nothing
+        written in the meantime is lost (anything staged while moving is saved to the new store).
+        Closing the old store is up to the caller.
+        """
+        async with self._switch_lock:
+            await self.flush()
+            self._not_switching.clear()
+            try:
+                while self._store_users:
+                    await self._store_idle.wait()
+                # Whatever the new store held before is about to be replaced
+                await store.bump_generation()
+                moved = await migrate_reminders(self.store, store)
+                self.store = store
+            finally:
+                self._not_switching.set()
+        return moved
+
+    def stage(self, changes: ReminderChanges) -> None:
+        """Queue up a unit of work to be saved with the next group commit."""
+        self._staged_generation += 1
+        pending_changes = self._pending.get(changes.key)
+        if pending_changes:
+            pending_changes.merge(changes)
+        else:
+            self._pending[changes.key] = changes
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.GROUP_COMMIT_SECONDS)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            log.exception(
+                "Failed to save reminder changes, will try again with the next group commit: "
+            )
+            if not self._flush_task:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Save everything that has been staged."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                await self._write("apply", list(self._flushing.values()))
+            except Exception:
+                # Put everything back, keeping anything staged since then on top
+                for key, later_changes in self._pending.items():
+                    if key in self._flushing:
+                        self._flushing[key].merge(later_changes)
+                    else:
+                        self._flushing[key] = later_changes
+                self._pending = self._flushing
+                raise
+            finally:
+                self._flushing = {}
+
+    async def _write(self, method: str, *args: Any) -> None:  # noqa: ANN401
+        """Write to the wrapped store (with its method of that name), moving the generation on first if there was a checkpoint since the last write."""
+        async with self._using_store() as store:
+            async with self._generation_lock:
+                if self._checkpointed:
+                    await store.bump_generation()
+                    self._checkpointed = False
+                self._writing += 1
+            try:
+                await getattr(store, method)(*args)
+            finally:
+                self._writing -= 1
+
+    async def checkpoint(self) -> int | None:
+        """Save everything that has been staged, and get the generation of what is now stored.
+
+        Returns None if there are writes in progress (or staged changes that haven't been saved yet),
+        as then there is no generation that matches what is stored. Nothing else runs between this
+        returning and the caller carrying on, so whatever the caller reads from memory right away
+        matches the returned generation.
+        """
+        await self.flush()
+        async with self._using_store() as store, self._generation_lock:
+            if self._writing or self._pending:
+                return None
+            generation = await store.generation()
+            if self._pending:
+                return None
+            self._checkpointed = True
+            return generation
+
+    async def initialize(self) -> None:
+        """Get the wrapped store ready for use."""
+        await self.store.initialize()
+
+    async def close(self) -> None:
+        """Save everything that has been staged and close the wrapped store."""
+        flush_task, self._flush_task = self._flush_task, None
+        await self.flush()
+        if flush_task:
+            # Only cancel after our flush, so a group commit that is already in progress isn't interrupted
+            flush_task.cancel()
+        async with self._using_store() as store:
+            await store.close()
+
+    def _staged_changes(self, user_id: int, user_reminder_id: int) -> ReminderChanges:
+        """Get a copy of everything staged for a reminder (including anything being saved right now)."""
+        staged_changes = ReminderChanges(user_id, user_reminder_id)
+        for batch in (self._flushing, self._pending):
+            changes = batch.get(staged_changes.key)
+            if changes:
+                staged_changes.merge(changes)
+        return staged_changes
+
+    async def get(self, user_id: int, user_reminder_id: int) -> dict[str, Any] | None:
+        """Get a reminder, or None if it doesn't exist."""
+        while True:
+            # Taken before reading, as a group commit can save (and forget) them while we wait
+            staged_generation = self._staged_generation
+            staged_changes = self._staged_changes(user_id, user_reminder_id)
+            async with self._using_store() as store:
+                reminder = await store.get(user_id, user_reminder_id)
+            # Anything staged since could already be saved, and would be undone by the older copy
+            if staged_generation == self._staged_generation:
+                break
+        if reminder:
+            reminder = staged_changes.apply_to(reminder)
+        return reminder
+
+    async def get_user(self, user_id: int) -> dict[int, dict[str, Any]]:
+        """Get all of a users reminders (user_reminder_id -> reminder), in the order they were created."""
+        await self.flush()
+        async with self._using_store() as store:
+            return await store.get_user(user_id)
+
+    async def get_all(self) -> dict[int, dict[int, dict[str, Any]]]:
+        """Get every reminder (user_id -> user_reminder_id -> reminder)."""
+        await self.flush()
+        async with self._using_store() as store:
+            return await store.get_all()
+
+    async def due_before(self, timestamp: int) -> list[tuple[int, int, dict[str, Any]]]:
+        """Get the (user_id, user_reminder_id, reminder) of every reminder expiring at or before timestamp, soonest first."""
+        await self.flush()
+        async with self._using_store() as store:
+            return await store.due_before(timestamp)
+
+    async def schedule_entries(self) -> list[tuple[int, int, int]]:
+        """Get the (expires, user_id, user_reminder_id) of every reminder, in the order they were created."""
+        await self.flush()
+        async with self._using_store() as store:
+            return await store.schedule_entries()
+
+    async def count(self) -> tuple[int, int]:
+        """Count how many reminders there are, and how many of those are repeating."""
+        await self.flush()
+        async with self._using_store() as store:
+            return await store.count()
+
+    async def generation(self) -> int:
+        """Get the storage generation."""
+        async with self._using_store() as store:
+            return await store.generation()
+
+    async def bump_generation(self) -> None:
+        """Move the storage generation on."""
+        async with self._using_store() as store, self._generation_lock:
+            await store.bump_generation()
+            self._checkpointed = False
+
+    async def set(
+        self, user_id: int, user_reminder_id: int, reminder: dict[str, Any]
+    ) -> None:
+        """Save a reminder, replacing it if it exists."""
+        await self.flush()
+        await self._write("set", user_id, user_reminder_id, reminder)
+
+    async def set_many(self, reminders: list[tuple[int, int, dict[str, Any]]]) -> None:
+        """Save many (user_id, user_reminder_id, reminder) at once, replacing any that exist."""
+        await self.flush()
+        await self._write("set_many", reminders)
+
+    async def apply(self, changes: list[ReminderChanges]) -> None:
+        """Save some units of work right now, with one write per reminder."""
+        await self.flush()
+        await self._write("apply", changes)
+
+    async def delete(self, user_id: int, user_reminder_id: int) -> None:
+        """Delete a reminder."""
+        await self.flush()
+        await self._write("delete", user_id, user_reminder_id)
+
+    async def delete_user(self, user_id: int) -> None:
+        """Delete all of a users reminders."""
+        await self.flush()
+        await self._write("delete_user", user_id)
+
+    async def clear(self) -> None:
+        """Delete every reminder."""
+        await self.flush()
+        await self._write("clear")
+
+
+async def migrate_reminders(
+    source: ReminderStore, destination: ReminderStore, batch_size: int = 1000
+) -> int:
+    """Move every reminder from one store to another, returning how many were moved.
+
+    Anything already in the destination is replaced, and the source is cleared afterwards,
+    so that deleted user data can't come back by switching stores again later.
+    """
+    all_reminders = await source.get_all()
+    await destination.clear()
+    batch: list[tuple[int, int, dict[str, Any]]] = []
+    moved = 0
+    for user_id, users_reminders in all_reminders.items():
+        for user_reminder_id, reminder in users_reminders.items():
+            batch.append((user_id, user_reminder_id, reminder))
+            if len(batch) >= batch_size:
+                await destination.set_many(batch)
+                moved += len(batch)
+                batch = []
+    if batch:
+        await destination.set_many(batch)
+        moved += len(batch)
+    await source.clear()
+    return moved
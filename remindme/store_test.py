@@ -0,0 +1,208 @@
+"""Unit tests for the reminder stores."""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import store
+
+DEFAULTS = {
+    "text": "",
+    "created": None,
+    "expires": None,
+    "jump_link": None,
+    "repeat": {},
+}
+
+
+class TestSqliteReminderStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = store.SqliteReminderStore(
+            Path(self.directory.name) / "reminders.db", DEFAULTS
+        )
+        await self.store.initialize()
+
+    async def asyncTearDown(self):
+        await self.store.close()
+        self.directory.cleanup()
+
+    async def test_set_get(self):
+        await self.store.set(1, 1, {"text": "hi", "created": 10, "expires": 20})
+        assert await self.store.get(1, 1) == {
+            "text": "hi",
+            "created": 10,
+            "expires": 20,
+            "jump_link": None,
+            "repeat": {},
+        }
+        assert await self.store.get(1, 2) is None
+
+    async def test_update(self):
+        await self.store.set(1, 1, {"text": "hi", "created": 10, "expires": 20})
+        await self.store.update(1, 1, expires=30, repeat={"days": 1})
+        reminder = await self.store.get(1, 1)
+        assert reminder["expires"] == 30
+        assert reminder["repeat"] == {"days": 1}
+        await self.store.update(1, 1, repeat={})
+        assert (await self.store.get(1, 1))["repeat"] == {}
+
+    async def test_get_user_keeps_creation_order(self):
+        await self.store.set(1, 3, {"expires": 10})
+        await self.store.set(1, 1, {"expires": 30})
+        await self.store.set(2, 2, {"expires": 20})
+        await self.store.update(1, 3, text="changed")
+        assert list(await self.store.get_user(1)) == [3, 1]
+
+    async def test_due_before(self):
+        await self.store.set_many(
+            [(1, 1, {"expires": 30}), (2, 1, {"expires": 10}), (1, 2, {"expires": 20})]
+        )
+        due = await self.store.due_before(20)
+        assert [
+            (user_id, user_reminder_id) for user_id, user_reminder_id, _ in due
+        ] == [(2, 1), (1, 2)]
+
+    async def test_schedule_entries_and_count(self):
+        await self.store.set_many(
+            [(1, 1, {"expires": 30, "repeat": {"days": 1}}), (2, 1, {"expires": 10})]
+        )
+        assert sorted(await self.store.schedule_entries()) == [(10, 2, 1), (30, 1, 1)]
+        assert tuple(await self.store.count()) == (2, 1)
+
+    async def test_delete(self):
+        await self.store.set_many(
+            [(1, 1, {"expires": 30}), (1, 2, {"expires": 10}), (2, 1, {"expires": 10})]
+        )
+        await self.store.delete(1, 1)
+        assert list(await self.store.get_user(1)) == [2]
+        await self.store.delete_user(1)
+        assert await self.store.get_user(1) == {}
+        await self.store.clear()
+        assert tuple(await self.store.count()) == (0, 0)
+
+
+class TestBufferedReminderStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.backend = store.SqliteReminderStore(
+            Path(self.directory.name) / "reminders.db", DEFAULTS
+        )
+        self.store = store.BufferedReminderStore(self.backend)
+        await self.store.initialize()
+
+    async def asyncTearDown(self):
+        await self.store.close()
+        self.directory.cleanup()
+
+    async def test_reads_see_staged_changes(self):
+        await self.store.set(1, 1, {"text": "hi", "created": 10, "expires": 20})
+        self.store.stage(store.ReminderChanges(1, 1).set(created=20))
+        self.store.stage(store.ReminderChanges(1, 1).set(expires=30))
+        assert (await self.backend.get(1, 1))["expires"] == 20
+        reminder = await self.store.get(1, 1)
+        assert (reminder["created"], reminder["expires"]) == (20, 30)
+        self.store.stage(store.ReminderChanges(1, 1).delete())
+        assert await self.store.get(1, 1) is None
+        assert await self.backend.get(1, 1) is not None
+
+    async def test_reads_see_changes_saved_while_reading(self):
+        await self.store.set(1, 1, {"text": "hi", "expires": 10})
+        self.store.stage(store.ReminderChanges(1, 1).set(expires=20))
+        backend_get = self.backend.get
+        read = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_get(user_id: int, user_reminder_id: int) -> dict | None:
+            reminder = await backend_get(user_id, user_reminder_id)
+            read.set()
+            await release.wait()
+            return reminder
+
+        self.backend.get = slow_get
+        get = asyncio.create_task(self.store.get(1, 1))
+        await read.wait()
+        # A group commit saves the staged change after it was read, but before get() returns
+        await self.store.flush()
+        release.set()
+        assert (await get)["expires"] == 20
+
+        read.clear()
+        release.clear()
+        get = asyncio.create_task(self.store.get(1, 1))
+        await read.wait()
+        self.store.stage(store.ReminderChanges(1, 1).set(text="bye"))
+        await self.store.flush()
+        release.set()
+        reminder = await get
+        assert (reminder["text"], reminder["expires"]) == ("bye", 20)
+
+    async def test_group_commit(self):
+        self.store.GROUP_COMMIT_SECONDS = 0.01
+        await self.store.set_many([(1, 1, {"expires": 10}), (2, 1, {"expires": 10})])
+        self.store.stage(store.ReminderChanges(1, 1).set(expires=20))
+        self.store.stage(store.ReminderChanges(2, 1).delete())
+        await asyncio.sleep(0.1)
+        assert (await self.backend.get(1, 1))["expires"] == 20
+        assert await self.backend.get(2, 1) is None
+
+    async def test_generation_moves_on_after_checkpoint(self):
+        assert await self.store.generation() == 0
+        await self.store.set(1, 1, {"expires": 10})
+        await self.store.set(1, 2, {"expires": 10})
+        generation = await self.store.checkpoint()
+        assert generation == 1
+        assert await self.store.checkpoint() == generation
+        self.store.stage(store.ReminderChanges(1, 1).set(expires=20))
+        assert await self.store.generation() == generation
+        assert await self.store.checkpoint() == generation + 1
+        await self.store.delete(1, 2)
+        assert await self.backend.generation() == generation + 2
+
+    async def test_bulk_reads_flush_first(self):
+        await self.store.set(1, 1, {"expires": 10})
+        self.store.stage(
+            store.ReminderChanges(1, 1).set(expires=20, repeat={"days": 1})
+        )
+        assert await self.store.schedule_entries() == [(20, 1, 1)]
+        assert tuple(await self.store.count()) == (1, 1)
+
+    async def test_switch_keeps_concurrent_writes(self):
+        await self.store.set_many(
+            [(1, number, {"expires": 10}) for number in range(100)]
+        )
+        self.store.stage(store.ReminderChanges(1, 0).set(expires=20))
+        other_backend = store.SqliteReminderStore(
+            Path(self.directory.name) / "other.db", DEFAULTS
+        )
+        await other_backend.initialize()
+        await other_backend.set(3, 1, {"expires": 10})
+        switching = asyncio.Event()
+
+        async def write_while_switching() -> None:
+            switching.set()
+            for number in range(100):
+                await self.store.set(2, number, {"expires": 10})
+                self.store.stage(store.ReminderChanges(1, number).set(text="changed"))
+            await self.store.delete(1, 99)
+
+        writer = asyncio.create_task(write_while_switching())
+        await switching.wait()
+        assert await self.store.switch_to(other_backend) >= 100
+        await writer
+        await self.store.flush()
+        assert self.store.store is other_backend
+        assert tuple(await self.backend.count()) == (0, 0)
+        await self.backend.close()
+        reminders = await other_backend.get_all()
+        assert sorted(reminders) == [1, 2]
+        assert len(reminders[1]) == 99
+        assert len(reminders[2]) == 100
+        assert reminders[1][0]["expires"] == 20
+        assert all(reminder["text"] == "changed" for reminder in reminders[1].values())
+
+
+# Run unit tests from command line
+if __name__ == "__main__":
+    unittest.main()
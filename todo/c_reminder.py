@@ -109,8 +109,7 @@ class ReminderCommands():
             note = todo_list
             todo_list = "main"
         await self._create_reminder(ctx, todo_list, note)
-        total = await self.config.total()
-        await self.config.total.set(total + 1)
+        self.total.increment()
 
     @todo.command()
     async def edit(self, ctx, todo_list: str = "", reminder_id: str = None, *, text: str = ""):
@@ -186,6 +185,7 @@ class ReminderCommands():
                 f"If anyone else would like to add this to their todo lists, "
                 "click the notepad!"
             )
+            self.trace.record("me_too", m=self.trace.pseudonym(query.id), g=self.trace.pseudonym(ctx.guild.id))
             self.me_too_reminders[query.id] = new_reminder
             self.clicked_me_too_reminder[query.id] = set([author.id])
             await query.add_reaction(self.reminder_emoji)
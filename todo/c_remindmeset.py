@@ -1,5 +1,6 @@
 """Commands for [p]remindmeset."""
 from redbot.core import checks, commands
+from redbot.core.data_manager import cog_data_path
 
 from .pcx_lib import SettingDisplay, checkmark
 
@@ -22,8 +23,10 @@ class RemindMeSetCommands():
         if await ctx.bot.is_owner(ctx.author):
             global_section = SettingDisplay("Global Settings")
             global_section.add("Maximum todo items per user", await self.config.max_user_reminders())
+            if self.trace.recording:
+                global_section.add("Recording trace", f"{self.trace.events} events to {self.trace.path}")
             stats_section = SettingDisplay("Stats")
-            stats_section.add("Total todo items ever", await self.config.total())
+            stats_section.add("Total todo items ever", await self.total.get())
             await ctx.send(server_section.display(global_section, stats_section))
         else:
             await ctx.send(str(server_section))
@@ -44,4 +47,44 @@ class RemindMeSetCommands():
     async def set_max(self, ctx: commands.Context, maximum: int) -> None:
         """Global: Set the maximum number of reminders a user can create at one time."""
         await self.config.max_user_reminders.set(maximum)
-        await ctx.send(checkmark(f"Maximum reminders per user is now set to {await self.config.max_user_reminders()}"))
\ No newline at end of file
+        await ctx.send(checkmark(f"Maximum reminders per user is now set to {await self.config.max_user_reminders()}"))
+
+    @todoset.command(name="trace")
+    @checks.is_owner()
+    async def set_trace(self, ctx: commands.Context, enabled: bool) -> None:  # noqa: FBT001
+        """Global: Start or stop recording a trace of commands and reactions.
+
+        The trace can be replayed offline (see the `devtools` folder in the repository) to profile real traffic.
+        Nothing users type is recorded: user IDs and todo list names are swapped out for pseudonyms, and todo text is left out.
+        A new trace file is started every time recording is turned on.
+        """
+        if enabled:
+            path = self.trace.start(cog_data_path(self) / "traces", self)
+            await ctx.send(checkmark(f"Recording a trace to `{path}`."))
+            return
+        if not self.trace.recording:
+            await ctx.send("I am not recording a trace.")
+            return
+        self.trace.stop()
+        await ctx.send(checkmark(f"Stopped recording. The trace ({self.trace.events} events) is at `{self.trace.path}`."))
+
+    @todoset.command(name="configstats")
+    @checks.is_owner()
+    async def config_stats(self, ctx: commands.Context, enabled: bool | None = None) -> None:
+        """Global: Show which commands read and write the most Config data.
+
+        `[p]todoset configstats on` starts counting (from zero), and `off` stops.
+        Without either, shows the ones making the most reads and writes each time they run.
+        Counting costs a little, since everything read and written has to be measured.
+        """
+        if enabled is None:
+            if not self.config_access.totals:
+                await ctx.send("Nothing has been counted. Start counting with `[p]todoset configstats on`.")
+                return
+            await ctx.send(str(self.config_access.report()))
+        elif enabled:
+            self.config_access.start()
+            await ctx.send(checkmark("Counting Config reads and writes."))
+        else:
+            self.config_access.stop()
+            await ctx.send(checkmark("Stopped counting Config reads and writes."))
@@ -1,14 +1,26 @@
 """Shared code across multiple cogs."""
+import asyncio
 import discord
+import hmac
+import json
+import logging
+import secrets
+import time
 
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
 from reactionmenu import ViewMenu, ViewButton
 from redbot.core import __version__ as redbot_version
-from redbot.core import commands
+from redbot.core import Config, commands
+from redbot.core.config import Value
 from redbot.core.utils import common_filters
 from redbot.core.utils.chat_formatting import box
-from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from typing import Any, Dict, List, Mapping, Optional, TextIO, Tuple, Union
 
 headers = {"user-agent": "Red-DiscordBot/" + redbot_version}
+log = logging.getLogger("red.pcxcogs.pcx_lib")
 
 def checkmark(text: str) -> str:
     """Get text prefixed with a checkmark emoji."""
@@ -27,6 +39,24 @@ async def delete(message: discord.Message, *, delay: float | None = None) -> boo
         return False
     return True
 
+def invokes_subcommand(ctx: commands.Context) -> bool:
+    """Check if the command being invoked is a group that is about to hand off to one of its subcommands.
+
+    discord.py runs the cog's before and after invoke hooks for the group and then again for the
+    subcommand. The subcommand is only looked up once the group's before hooks have run, so until
+    then this peeks at the next word of the message, the same way the group will.
+    """
+    if not isinstance(ctx.command, commands.Group):
+        return False
+    if ctx.invoked_subcommand is not None:
+        return True
+    view = ctx.view
+    index, previous = view.index, view.previous
+    view.skip_ws()
+    trigger = view.get_word()
+    view.index, view.previous = index, previous
+    return bool(trigger) and trigger in ctx.command.all_commands
+
 async def embed_splitter(ctx, embed: discord.Embed) -> list[discord.Embed]:
     """Take an embed and split it so that each embed has at most 20 fields and a length of 5900.
 
@@ -165,4 +195,351 @@ class Perms:
     @property
     def overwrites(self) -> Optional[dict[Union[discord.Role, discord.Member], discord.PermissionOverwrite]]:
         """Get current overwrites."""
-        return self.__overwrites
\ No newline at end of file
+        return self.__overwrites
+
+
+class BufferedCounter:
+    """A counter stored in Config, where increments are batched up in memory.
+
+    Increments are only saved every flush_interval seconds (or when flush() is called),
+    so that a busy counter doesn't cost a Config read and write on every single increment.
+    """
+
+    def __init__(self, value: Value, flush_interval: float = 60.0) -> None:
+        """Init."""
+        self.value = value
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._flush_task: asyncio.Task | None = None
+
+    async def get(self) -> int:
+        """Get the current value, including any increments that haven't been saved yet."""
+        return await self.value() + self._pending
+
+    def increment(self, amount: int = 1) -> None:
+        """Increment the counter."""
+        self._pending += amount
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("Failed to save a counter, will try again in %g seconds: ", self.flush_interval)
+            if not self._flush_task:
+                self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Save any pending increments."""
+        pending, self._pending = self._pending, 0
+        if not pending:
+            return
+        try:
+            async with self.value.get_lock():
+                await self.value.set(await self.value() + pending)
+        except Exception:
+            self._pending += pending
+            raise
+
+    async def close(self) -> None:
+        """Save any pending increments and stop the flush timer."""
+        flush_task, self._flush_task = self._flush_task, None
+        await self.flush()
+        if flush_task:
+            flush_task.cancel()
+
+
+class TraceRecorder:
+    """An opt-in, append-only trace of what a cog was asked to do, for replaying offline.
+
+    Every event is a line of JSON: {"t": seconds since recording started, "e": event type, ...}.
+    The first line describes the trace itself. Nothing users typed is ever written: IDs are
+    replaced with pseudonyms (a keyed hash, with a key made up fresh every time recording
+    starts and never written down), names with pseudonym tokens, and any other text with its
+    length. Lines are buffered, and flushed out once FLUSH_INTERVAL seconds have passed since the
+    last flush (and when recording stops). Recording stops by itself once the trace reaches MAX_BYTES.
+    """
+
+    FORMAT_VERSION = 1
+    FLUSH_INTERVAL = 1.0
+    MAX_BYTES = 100 * 1024 * 1024
+
+    def __init__(self) -> None:
+        """Init."""
+        self.path: Path | None = None
+        self.events = 0
+        self._file: TextIO | None = None
+        self._key = b""
+        self._started = 0.0
+        self._flushed = 0.0
+        self._bytes = 0
+
+    @property
+    def recording(self) -> bool:
+        """Check if we are recording."""
+        return self._file is not None
+
+    def start(self, folder: Path, cog: commands.Cog) -> Path:
+        """Start recording a new trace into folder, returning its path."""
+        self.stop()
+        self._started = self._flushed = time.time()
+        folder.mkdir(parents=True, exist_ok=True)
+        self.path = folder / f"trace-{int(self._started)}.jsonl"
+        self._file = self.path.open("a", encoding="utf-8")
+        self._key = secrets.token_bytes(32)
+        self._bytes = self.events = 0
+        self.record("trace", format=self.FORMAT_VERSION, cog=cog.qualified_name, version=getattr(cog, "__version__", None), start=self._started)
+        return self.path
+
+    def stop(self) -> None:
+        """Stop recording, writing out anything buffered."""
+        trace_file, self._file = self._file, None
+        if trace_file:
+            trace_file.close()
+
+    def pseudonym(self, snowflake: int | None) -> int | None:
+        """Get the pseudonym for a Discord ID (the same for the whole trace, but meaningless outside of it)."""
+        if snowflake is None:
+            return None
+        return int.from_bytes(hmac.digest(self._key, str(snowflake).encode(), "sha256")[:6], "big")
+
+    def name(self, text: str) -> str:
+        """Get the pseudonym token for a name (of a todo list, say)."""
+        return "n" + hmac.digest(self._key, text.encode(), "sha256")[:4].hex()
+
+    def relative(self, timestamp: float) -> float:
+        """Convert a wall clock timestamp to seconds since recording started."""
+        return round(timestamp - self._started, 3)
+
+    def scrub(self, arguments: Mapping[str, Any], *, choices: Mapping[str, Collection[str]] | None = None, names: Collection[str] = ()) -> dict[str, Any]:
+        """Make command arguments safe to write down.
+
+        Anything that isn't a string is kept. Strings are kept if they are a number, or one of the
+        choices for that argument. Arguments in names are replaced with their pseudonym token.
+        Everything else is replaced with {"len": its length}.
+        """
+        scrubbed: dict[str, Any] = {}
+        for argument, value in arguments.items():
+            if not isinstance(value, str):
+                scrubbed[argument] = value if value is None or isinstance(value, int | float | bool) else repr(type(value))
+            elif value.isdigit() or value in (choices or {}).get(argument, ()):
+                scrubbed[argument] = value
+            elif argument in names:
+                scrubbed[argument] = self.name(value)
+            else:
+                scrubbed[argument] = {"len": len(value)}
+        return scrubbed
+
+    @staticmethod
+    def command_arguments(ctx: commands.Context) -> dict[str, Any]:
+        """Get the arguments a command was invoked with, by name."""
+        arguments = dict(zip(ctx.command.clean_params, ctx.args[2:] if ctx.cog else ctx.args[1:], strict=False))
+        arguments.update(ctx.kwargs)
+        return arguments
+
+    def record(self, event: str, **fields: Any) -> None:  # noqa: ANN401
+        """Record an event (if we are recording). Fields that are None are left out."""
+        if not self._file:
+            return
+        now = time.time()
+        line = json.dumps({"t": self.relative(now), "e": event, **{key: value for key, value in fields.items() if value is not None}}, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self.events += 1
+        self._bytes += len(line)
+        if self._bytes >= self.MAX_BYTES:
+            log.warning("Trace %s reached %d bytes, recording stopped.", self.path, self.MAX_BYTES)
+            self.stop()
+        elif now - self._flushed >= self.FLUSH_INTERVAL:
+            self._flushed = now
+            self._file.flush()
+
+
+class ConfigAccessCounts:
+    """How many Config reads and writes were made, and roughly how many bytes (of JSON) they moved."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def accesses(self) -> int:
+        """Get how many reads and writes were made."""
+        return self.reads + self.writes
+
+    @property
+    def bytes(self) -> int:
+        """Get how many bytes were read and written."""
+        return self.bytes_read + self.bytes_written
+
+
+class ConfigAccessTotals(ConfigAccessCounts):
+    """Config access counts, added up over every run of a command (or background task)."""
+
+    def __init__(self) -> None:
+        """Init."""
+        super().__init__()
+        self.runs = 0
+        self.most_accesses = 0
+
+    def per_run(self, count: int) -> float:
+        """Get the average of a count per run."""
+        return count / self.runs if self.runs else 0.0
+
+
+class ConfigAccessStats:
+    """Counts the Config reads and writes made by every command and background task, to find the ones making too many.
+
+    instrument() wraps a Config's driver so that every read and write goes through here. Each one
+    is counted against whatever is running at the time: a command between begin() and end(), or
+    a background task iteration inside measure(). Anything else is counted against OTHER.
+    Counting is off until start() is called, since measuring bytes means serializing everything
+    that is read and written.
+    """
+
+    OTHER = "(other)"
+
+    def __init__(self) -> None:
+        """Init."""
+        self.counting = False
+        self.started = 0.0
+        self.totals: dict[str, ConfigAccessTotals] = {}
+        # (totals for the label, counts for just this run) of whatever is running
+        self._current: ContextVar[tuple[ConfigAccessTotals, ConfigAccessCounts] | None] = ContextVar("config_access", default=None)
+
+    def instrument(self, config: Config) -> None:
+        """Count every read and write made through a Config (and every Group and Value it hands out from now on)."""
+        if isinstance(config._driver, _CountingDriver):  # noqa: SLF001
+            config._driver.stats = self  # noqa: SLF001
+        else:
+            config._driver = _CountingDriver(config._driver, self)  # noqa: SLF001
+
+    def start(self) -> None:
+        """Start counting (from zero)."""
+        self.counting = True
+        self.started = time.time()
+        self.totals = {}
+
+    def stop(self) -> None:
+        """Stop counting (keeping the counts so far)."""
+        self.counting = False
+
+    def begin(self, label: str) -> None:
+        """Count reads and writes from here on (in this task, and any it starts) against a run of label."""
+        if not self.counting:
+            return
+        totals = self.totals.setdefault(label, ConfigAccessTotals())
+        totals.runs += 1
+        self._current.set((totals, ConfigAccessCounts()))
+
+    def end(self) -> None:
+        """Finish the run started by begin()."""
+        current = self._current.get()
+        if current is None:
+            return
+        self._current.set(None)
+        totals, run = current
+        totals.most_accesses = max(totals.most_accesses, run.accesses)
+
+    @contextmanager
+    def measure(self, label: str) -> Iterator[None]:
+        """Count the reads and writes made inside this block against a run of label."""
+        self.begin(label)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def count_read(self, value: Any = None) -> None:  # noqa: ANN401
+        """Count a read (of value, None if nothing was stored)."""
+        size = self._size(value) if self.counting else 0
+        for counts in self._counts():
+            counts.reads += 1
+            counts.bytes_read += size
+
+    def count_write(self, value: Any = None) -> None:  # noqa: ANN401
+        """Count a write (of value, None for a clear)."""
+        size = self._size(value) if self.counting else 0
+        for counts in self._counts():
+            counts.writes += 1
+            counts.bytes_written += size
+
+    def top(self, limit: int = 10) -> list[tuple[str, ConfigAccessTotals]]:
+        """Get the labels with the most reads and writes per run (and then in total), most first. OTHER is left out."""
+        ranked = sorted(
+            ((label, totals) for label, totals in self.totals.items() if label != self.OTHER),
+            key=lambda item: (item[1].per_run(item[1].accesses), item[1].accesses),
+            reverse=True,
+        )
+        return ranked[:limit]
+
+    def report(self, limit: int = 10) -> SettingDisplay:
+        """Get the labels with the most reads and writes per run, ready to display."""
+        section = SettingDisplay("Config Access")
+        section.add("Counting", f"for {(time.time() - self.started) / 60:.0f} minutes" if self.counting else "Stopped")
+        for label, totals in self.top(limit):
+            section.add(label, self.describe(totals))
+        if self.OTHER in self.totals:
+            section.add(self.OTHER, self.describe(self.totals[self.OTHER]))
+        return section
+
+    @staticmethod
+    def describe(totals: ConfigAccessTotals) -> str:
+        """Describe the totals for a label in a line, for humans."""
+        if not totals.runs:
+            return f"{totals.reads} reads and {totals.writes} writes ({totals.bytes / 1024:.1f} KiB)"
+        return (
+            f"{totals.runs} run{'' if totals.runs == 1 else 's'}, "
+            f"{totals.per_run(totals.reads):.1f} reads and {totals.per_run(totals.writes):.1f} writes per run "
+            f"({totals.per_run(totals.bytes) / 1024:.1f} KiB per run, most in one run {totals.most_accesses})"
+        )
+
+    def _counts(self) -> tuple[ConfigAccessCounts, ...]:
+        """Get the counts to count an access against right now (none if we aren't counting).
+
+        Tasks started during a run keep counting against it after it ends (like a buffered write
+        being flushed), which still adds to the totals for its label.
+        """
+        if not self.counting:
+            return ()
+        return self._current.get() or (self.totals.setdefault(self.OTHER, ConfigAccessTotals()),)
+
+    @staticmethod
+    def _size(value: Any) -> int:  # noqa: ANN401
+        if value is None:
+            return 0
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class _CountingDriver:
+    """Stands in for a Config driver, counting every read and write that goes through it."""
+
+    def __init__(self, driver: Any, stats: ConfigAccessStats) -> None:  # noqa: ANN401
+        self.driver = driver
+        self.stats = stats
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        return getattr(self.driver, name)
+
+    async def get(self, identifier_data: Any) -> Any:  # noqa: ANN401
+        try:
+            value = await self.driver.get(identifier_data)
+        except KeyError:
+            # Nothing stored, the caller falls back to the default
+            self.stats.count_read()
+            raise
+        self.stats.count_read(value)
+        return value
+
+    async def set(self, identifier_data: Any, value: Any = None) -> None:  # noqa: ANN401
+        await self.driver.set(identifier_data, value=value)
+        self.stats.count_write(value)
+
+    async def clear(self, identifier_data: Any) -> None:  # noqa: ANN401
+        await self.driver.clear(identifier_data)
+        self.stats.count_write()
@@ -2,13 +2,15 @@
 import asyncio
 import discord
 import logging
-from typing import Any
+import re
+from typing import Any, ClassVar
 
 from abc import ABC
 from redbot.core import Config, commands
 
 from .c_reminder import ReminderCommands
 from .c_remindmeset import RemindMeSetCommands
+from .pcx_lib import BufferedCounter, ConfigAccessStats, TraceRecorder, invokes_subcommand
 
 log = logging.getLogger("red.pcxcogs.todo")
 
@@ -41,25 +43,54 @@ class Todo(
         "jump_link": None,  # str
     }
     SEND_DELAY_SECONDS = 30
+    # Command arguments that are safe to write down as is in a trace
+    TRACE_CHOICES: ClassVar[dict[str, tuple[str, ...]]] = {
+        "todo_list": ("main",),
+        "sort": ("id", "added"),
+        "index": ("last", "all"),
+    }
 
     def __init__(self, bot):
         """Set up the cog."""
         super().__init__()
         self.bot = bot
         self.config = Config.get_conf(self, identifier=1224364860, force_registration=True)
+        self.config_access = ConfigAccessStats()
+        self.config_access.instrument(self.config)
         self.config.register_global(**self.default_global_settings)
         self.config.register_guild(**self.default_guild_settings)
         # user id -> user reminder id
         self.config.init_custom("REMINDER", 3)
         self.config.register_custom("REMINDER", **self.default_reminder_settings)
+        self.total = BufferedCounter(self.config.total)
         self.me_too_reminders = {}
         self.clicked_me_too_reminder = {}
         self.reminder_emoji = "\N{Spiral Note Pad}"
+        self.trace = TraceRecorder()
 
     #
     # Red methods
     #
 
+    async def cog_unload(self) -> None:
+        """Clean up when cog shuts down."""
+        await self.total.close()
+        self.trace.stop()
+
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        """Trace the command, if we are recording (and count its Config reads and writes, if we are counting)."""
+        if invokes_subcommand(ctx):
+            # The hook runs again for the subcommand, which is what gets counted and traced
+            return
+        self.config_access.begin(ctx.command.qualified_name)
+        if self.trace.recording:
+            self._trace_command(ctx)
+
+    async def cog_after_invoke(self, ctx: commands.Context) -> None:
+        """Finish counting the Config reads and writes the command made."""
+        if not invokes_subcommand(ctx):
+            self.config_access.end()
+
     def format_help_for_context(self, ctx: commands.Context) -> str:
         """Show version in help."""
         pre_processed = super().format_help_for_context(ctx)
@@ -90,32 +121,35 @@ class Todo(
         """Watches for bell reactions on reminder messages."""
         if str(payload.emoji) != self.reminder_emoji:
             return
-        if not payload.guild_id or await self.bot.cog_disabled_in_guild_raw(self.qualified_name, payload.guild_id):
-            return
-        guild = self.bot.get_guild(payload.guild_id)
-        if not guild:
-            return
-        if not await self.config.guild(guild).me_too():
-            return
-        member = guild.get_member(payload.user_id)
-        if not member:
-            return
-        if member.bot:
-            return
-
-        try:
-            reminder = self.me_too_reminders[payload.message_id]
-            clicked_set = self.clicked_me_too_reminder[payload.message_id]
-            if member.id in clicked_set:
-                return  # User clicked the bell again, not going to add a duplicate reminder
-            clicked_set.add(member.id)
-            if await self.insert_reminder(member.id, reminder):
-                message = "hey! just letting you know i've added that to your todo list."
-                await member.send(message)
-            else:
-                await self.send_too_many_message(member)
-        except KeyError:
-            return
+        with self.config_access.measure("me too reaction"):
+            if not payload.guild_id or await self.bot.cog_disabled_in_guild_raw(self.qualified_name, payload.guild_id):
+                return
+            guild = self.bot.get_guild(payload.guild_id)
+            if not guild:
+                return
+            if not await self.config.guild(guild).me_too():
+                return
+            member = guild.get_member(payload.user_id)
+            if not member:
+                return
+            if member.bot:
+                return
+            if self.trace.recording:
+                self.trace.record("react", u=self.trace.pseudonym(member.id), m=self.trace.pseudonym(payload.message_id), g=self.trace.pseudonym(guild.id))
+
+            try:
+                reminder = self.me_too_reminders[payload.message_id]
+                clicked_set = self.clicked_me_too_reminder[payload.message_id]
+                if member.id in clicked_set:
+                    return  # User clicked the bell again, not going to add a duplicate reminder
+                clicked_set.add(member.id)
+                if await self.insert_reminder(member.id, reminder):
+                    message = "hey! just letting you know i've added that to your todo list."
+                    await member.send(message)
+                else:
+                    await self.send_too_many_message(member)
+            except KeyError:
+                return
 
     #
     # Public methods
@@ -147,4 +181,25 @@ class Todo(
             maximum = await self.config.max_user_reminders()
         plural = "todo item" if maximum == 1 else "todo items"
         message = (f"you have too many todo items! i can only keep track of {maximum} {plural} for you at a time.")
-        await ctx.reply(message)
\ No newline at end of file
+        await ctx.reply(message)
+
+    #
+    # Private methods
+    #
+
+    def _trace_command(self, ctx: commands.Context) -> None:
+        """Record a command in the trace, with todo list names swapped for pseudonyms (and none of the text)."""
+        arguments = self.trace.command_arguments(ctx)
+        if ctx.command.qualified_name == "todo create":
+            # The todo list name (if any) is quoted somewhere in the todo item
+            text = arguments.get("todo_list", "")
+            match = re.search(r'"(.*?)"', text)
+            arguments["todo_list"] = (match.group(1) or "main") if match else "main"
+            arguments["note"] = text.replace(match.group(0), "", 1).strip() if match else text
+        self.trace.record(
+            "command",
+            c=ctx.command.qualified_name,
+            u=self.trace.pseudonym(ctx.author.id),
+            g=self.trace.pseudonym(ctx.guild.id) if ctx.guild else None,
+            a=self.trace.scrub(arguments, choices=self.TRACE_CHOICES, names=("todo_list",)) or None,
+        )